@@ -0,0 +1,24 @@
+-- Миграция для фоновых задач пересчета (переклассификация отзывов)
+-- Выполняется под пользователем arenadata_admin
+
+-- Состояние задачи и контрольная точка для продолжения после остановки
+CREATE TABLE backfill_jobs (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(50) NOT NULL UNIQUE, -- 'reclassify'
+    rules_version VARCHAR(100),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending', -- 'running', 'stopping', 'paused', 'completed', 'failed'
+    last_id INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    updated INTEGER NOT NULL DEFAULT 0,
+    total_estimate INTEGER,
+    error TEXT,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Комментарии
+COMMENT ON TABLE backfill_jobs IS 'Фоновые задачи пересчета данных отзывов';
+COMMENT ON COLUMN backfill_jobs.rules_version IS 'Версия правил срочности/классификатора, с которой идет пересчет';
+COMMENT ON COLUMN backfill_jobs.last_id IS 'Контрольная точка: последний обработанный feedbacks.id';
+COMMENT ON COLUMN backfill_jobs.updated IS 'Количество строк, у которых изменилась классификация';
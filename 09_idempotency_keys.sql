@@ -0,0 +1,21 @@
+-- Миграция для поддержки заголовка Idempotency-Key
+-- Выполняется под пользователем arenadata_admin
+
+-- Сохраненные ответы: повтор запроса с тем же ключом возвращает исходный ответ
+CREATE TABLE idempotency_keys (
+    key VARCHAR(255) PRIMARY KEY,
+    endpoint VARCHAR(100) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    status_code INTEGER NOT NULL,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Индекс для удаления истекших ключей
+CREATE INDEX idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+-- Комментарии
+COMMENT ON TABLE idempotency_keys IS 'Ответы на запросы с Idempotency-Key (защита от дублей при повторах)';
+COMMENT ON COLUMN idempotency_keys.request_hash IS 'Отпечаток тела запроса: тот же ключ с другим телом отклоняется';
+COMMENT ON COLUMN idempotency_keys.expires_at IS 'После этого времени ключ можно использовать заново';
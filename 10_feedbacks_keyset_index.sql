@@ -0,0 +1,11 @@
+-- Миграция для постраничного вывода отзывов по курсору
+-- Выполняется под пользователем arenadata_admin (вне транзакции: CONCURRENTLY)
+
+-- Составной индекс под ORDER BY created_at DESC, id DESC и условие
+-- (created_at, id) < (:created_at, :id): страница читается с позиции курсора
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_created_at_id ON feedbacks(created_at, id);
+
+-- Одиночный индекс по created_at покрывается составным
+DROP INDEX CONCURRENTLY IF EXISTS idx_feedbacks_created_at;
+
+COMMENT ON INDEX idx_feedbacks_created_at_id IS 'Keyset-пагинация отзывов: курсор (created_at, id)';
@@ -0,0 +1,17 @@
+-- Миграция для полнотекстового поиска GET /api/admin/feedbacks/search
+-- Выполняется под пользователем arenadata_admin (вне транзакции: CONCURRENTLY)
+
+-- Индекс из 05_views_and_materialized.sql не покрывал message. Новое выражение
+-- должно в точности совпадать с crud.SEARCH_VECTOR, иначе индекс не используется
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_admin_search_v2 ON feedbacks USING GIN(
+    to_tsvector('russian', COALESCE(problem_text, '') || ' ' || COALESCE(message, '') || ' ' || COALESCE(client_name, '') || ' ' || COALESCE(category, ''))
+);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_feedbacks_admin_search;
+ALTER INDEX idx_feedbacks_admin_search_v2 RENAME TO idx_feedbacks_admin_search;
+
+-- Статистика по выражению индекса: без нее планировщик оценивает число
+-- совпадений наугад и выбирает обход по created_at с фильтром
+ANALYZE feedbacks;
+
+COMMENT ON INDEX idx_feedbacks_admin_search IS 'Полнотекстовый поиск (russian) по problem_text, message, client_name, category';
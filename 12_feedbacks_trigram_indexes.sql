@@ -0,0 +1,17 @@
+-- Миграция для нечеткого поиска клиентов (GET /api/admin/clients/search,
+-- /api/admin/clients/autocomplete, поиск на странице /admin/clients)
+-- Выполняется под пользователем arenadata_admin (вне транзакции: CONCURRENTLY)
+
+-- pg_trgm входит в contrib; создание расширения требует прав владельца БД
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- GIN trigram-индексы: поддерживают %> / <% (word_similarity), % и ILIKE '%...%'.
+-- pg_trgm сам приводит строки к нижнему регистру, LOWER() в выражении не нужен
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_client_name_trgm
+    ON feedbacks USING GIN (client_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_client_email_trgm
+    ON feedbacks USING GIN (client_email gin_trgm_ops);
+
+COMMENT ON INDEX idx_feedbacks_client_name_trgm IS 'Нечеткий поиск клиентов по имени (pg_trgm)';
+COMMENT ON INDEX idx_feedbacks_client_email_trgm IS 'Нечеткий поиск клиентов по email (pg_trgm)';
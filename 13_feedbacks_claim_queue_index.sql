@@ -0,0 +1,11 @@
+-- Миграция для очереди разбора отзывов POST /api/admin/queue/claim
+-- Выполняется под пользователем arenadata_admin (вне транзакции: CONCURRENTLY)
+
+-- Частичный индекс только по открытым отзывам без ответственного: под
+-- ORDER BY priority_score DESC NULLS LAST, created_at LIMIT n ... FOR UPDATE SKIP LOCKED.
+-- Взятые в работу и закрытые отзывы из индекса уходят, он остается маленьким
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_claim_queue
+    ON feedbacks(priority_score DESC NULLS LAST, created_at)
+    WHERE assigned_to IS NULL AND status IN ('new', 'in_progress');
+
+COMMENT ON INDEX idx_feedbacks_claim_queue IS 'Очередь разбора: открытые отзывы без ответственного';
@@ -0,0 +1,14 @@
+-- Миграция для фильтров по полям форм (form_field в GET /api/admin/feedbacks)
+-- Выполняется под пользователем arenadata_admin (вне транзакции: CONCURRENTLY)
+
+-- GIN-индекс из 03_create_tables.sql: поддерживает form_data @> '{...}' и
+-- jsonpath form_data @@ '...'. В базах, созданных через create_all, вместо него
+-- был btree по form_data, бесполезный для этих операторов
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_form_data ON feedbacks USING GIN(form_data);
+DROP INDEX CONCURRENTLY IF EXISTS ix_feedbacks_form_data;
+
+COMMENT ON INDEX idx_feedbacks_form_data IS 'Фильтры по полям форм: form_data @> и @@';
+
+-- Индексы по отдельным частым полям (form_data ->> 'name') создаются командой
+--     python -m app.services.form_filters --promote <field>
+-- после чего поле добавляется в FORM_DATA_INDEXED_FIELDS
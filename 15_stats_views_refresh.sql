@@ -0,0 +1,77 @@
+-- Миграция для чтения дашбордов и аналитики из материализованных представлений
+-- (05_views_and_materialized.sql) и их обновления планировщиком приложения
+-- (app/services/stats_views.py)
+-- Выполняется под пользователем arenadata_admin
+
+-- daily_stats_materialized пересоздается с колонками, из которых
+-- собирается статистика дашбордов: количества по статусам и срочности,
+-- суммы и количества для средних (AVG по дням и типам форм не сложить).
+-- Прежние колонки сохранены
+DROP MATERIALIZED VIEW IF EXISTS daily_stats_materialized;
+
+CREATE MATERIALIZED VIEW daily_stats_materialized AS
+SELECT
+    DATE(created_at) as date,
+    form_type,
+    COUNT(*) as total_feedbacks,
+    COUNT(CASE WHEN urgency = 'critical' THEN 1 END) as critical_feedbacks,
+    COUNT(CASE WHEN urgency = 'high' THEN 1 END) as high_feedbacks,
+    COUNT(CASE WHEN urgency = 'medium' THEN 1 END) as medium_feedbacks,
+    COUNT(CASE WHEN urgency = 'low' THEN 1 END) as low_feedbacks,
+    COUNT(CASE WHEN urgency = 'normal' THEN 1 END) as normal_feedbacks,
+    COUNT(CASE WHEN status = 'new' THEN 1 END) as new_feedbacks,
+    COUNT(CASE WHEN status = 'in_progress' THEN 1 END) as in_progress_feedbacks,
+    COUNT(CASE WHEN status = 'resolved' THEN 1 END) as resolved_feedbacks,
+    COUNT(CASE WHEN status = 'rejected' THEN 1 END) as rejected_feedbacks,
+    AVG(response_time_seconds) as avg_response_time_seconds,
+    AVG(CASE WHEN satisfaction_score IS NOT NULL THEN satisfaction_score END) as avg_satisfaction,
+    COUNT(DISTINCT client_email) as unique_clients,
+    SUM(response_time_seconds) FILTER (WHERE status = 'resolved') as resolved_response_time_sum,
+    COUNT(response_time_seconds) FILTER (WHERE status = 'resolved') as resolved_response_time_count,
+    SUM(satisfaction_score) FILTER (WHERE satisfaction_score > 0) as satisfaction_sum,
+    COUNT(satisfaction_score) FILTER (WHERE satisfaction_score > 0) as satisfaction_count
+FROM feedbacks
+GROUP BY DATE(created_at), form_type
+ORDER BY date DESC, form_type;
+
+COMMENT ON MATERIALIZED VIEW daily_stats_materialized IS 'Ежедневная статистика по отзывам (материализованное представление)';
+
+CREATE UNIQUE INDEX idx_daily_stats_date_form ON daily_stats_materialized(date, form_type);
+CREATE INDEX idx_daily_stats_date ON daily_stats_materialized(date);
+
+-- REFRESH ... CONCURRENTLY требует уникальный индекс без условия
+CREATE UNIQUE INDEX IF NOT EXISTS idx_category_stats_category_form
+    ON category_stats_materialized(category, form_type);
+
+-- Когда представление обновлено последний раз: свежесть данных в ответах API
+-- и расписание обновления для всех воркеров
+CREATE TABLE IF NOT EXISTS stats_view_refreshes (
+    view_name VARCHAR(63) PRIMARY KEY,
+    refreshed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    duration_ms INTEGER NOT NULL
+);
+
+COMMENT ON TABLE stats_view_refreshes IS 'Последнее обновление материализованных представлений статистики';
+
+-- Обновить представление может только владелец: приложение (arenadata_app)
+-- вызывает функцию с правами владельца, только для представлений из списка.
+-- Еще не заполненное представление (WITH NO DATA) обновляется без CONCURRENTLY
+CREATE OR REPLACE FUNCTION refresh_stats_view(view_name TEXT)
+RETURNS void AS $$
+BEGIN
+    IF view_name NOT IN ('daily_stats_materialized', 'weekly_stats_materialized', 'category_stats_materialized') THEN
+        RAISE EXCEPTION 'Unknown stats view: %', view_name;
+    END IF;
+    IF (SELECT ispopulated FROM pg_matviews WHERE schemaname = 'public' AND matviewname = view_name) THEN
+        EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY public.%I', view_name);
+    ELSE
+        EXECUTE format('REFRESH MATERIALIZED VIEW public.%I', view_name);
+    END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+COMMENT ON FUNCTION refresh_stats_view(TEXT) IS 'Обновление материализованного представления статистики от имени владельца';
+
+REVOKE ALL ON FUNCTION refresh_stats_view(TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION refresh_stats_view(TEXT) TO arenadata_app;
+GRANT SELECT ON daily_stats_materialized, weekly_stats_materialized, category_stats_materialized TO arenadata_app;
@@ -0,0 +1,180 @@
+-- Миграция для инкрементальных агрегатов отзывов в analytics (app/services/rollups.py)
+-- Выполняется под пользователем arenadata_admin
+--
+-- Триггеры на feedbacks записывают изменения счетчиков по (день, тип формы)
+-- в analytics_deltas: только INSERT, одна строка на день и тип формы за
+-- оператор, поэтому запись отзывов не ждет на общей строке сегодняшнего дня.
+-- Приложение пакетами сворачивает дельты в analytics (metric_type =
+-- 'daily_stats') и периодически сверяет агрегаты с feedbacks.
+-- День - дата created_at в UTC: (created_at::timestamptz AT TIME ZONE 'UTC')::date
+-- верно и для TIMESTAMP (03_create_tables.sql, время в часовом поясе сессии),
+-- и для TIMESTAMP WITH TIME ZONE (app/models.py).
+--
+-- Агрегаты за прошлые дни заполняет полный пересчет: планировщик приложения
+-- запускает его сам при первом старте после миграции, или вручную:
+--     python -m app.services.rollups --reconcile-all
+-- До его завершения дашборды читают статистику не из analytics.
+
+-- Счетчики для дашбордов в analytics: статусы, срочность, суммы для средних
+ALTER TABLE analytics
+    ADD COLUMN IF NOT EXISTS new_feedbacks INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS in_progress_feedbacks INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS rejected_feedbacks INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS medium_feedbacks INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS low_feedbacks INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS normal_feedbacks INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS response_time_sum BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS response_time_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS satisfaction_sum BIGINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS satisfaction_count INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+COMMENT ON COLUMN analytics.critical_feedbacks IS 'Отзывы со срочностью high (critical_feedbacks дашборда)';
+COMMENT ON COLUMN analytics.response_time_sum IS 'Сумма response_time_seconds решенных отзывов';
+COMMENT ON COLUMN analytics.satisfaction_sum IS 'Сумма оценок satisfaction_score > 0';
+
+-- Несвернутые изменения счетчиков
+CREATE TABLE IF NOT EXISTS analytics_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    metric_date DATE NOT NULL,
+    form_type VARCHAR(20) NOT NULL,
+    total_feedbacks INTEGER NOT NULL,
+    critical_feedbacks INTEGER NOT NULL,
+    resolved_feedbacks INTEGER NOT NULL,
+    new_feedbacks INTEGER NOT NULL,
+    in_progress_feedbacks INTEGER NOT NULL,
+    rejected_feedbacks INTEGER NOT NULL,
+    medium_feedbacks INTEGER NOT NULL,
+    low_feedbacks INTEGER NOT NULL,
+    normal_feedbacks INTEGER NOT NULL,
+    response_time_sum BIGINT NOT NULL,
+    response_time_count INTEGER NOT NULL,
+    satisfaction_sum BIGINT NOT NULL,
+    satisfaction_count INTEGER NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE analytics_deltas IS 'Изменения счетчиков analytics от записи отзывов, еще не свернутые в analytics';
+
+-- Когда завершен полный пересчет агрегатов по feedbacks: без него в analytics
+-- только дни после миграции, и дашборды читают другой источник
+CREATE TABLE IF NOT EXISTS analytics_backfills (
+    metric_type VARCHAR(50) PRIMARY KEY,
+    completed_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+COMMENT ON TABLE analytics_backfills IS 'Завершенные полные пересчеты агрегатов analytics';
+
+-- Дельта оператора: новые строки со знаком +1, старые - со знаком -1.
+-- Из UPDATE берутся только строки, у которых изменилось что-то, что
+-- входит в счетчики (назначение, текст и т. п. дельт не дают).
+-- Запросы статические (не EXECUTE): план кэшируется на сессию, а вставка
+-- одного отзыва - основной путь POST /api/feedback
+CREATE OR REPLACE FUNCTION feedbacks_analytics_delta()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO analytics_deltas (
+            metric_date, form_type, total_feedbacks, critical_feedbacks, resolved_feedbacks,
+            new_feedbacks, in_progress_feedbacks, rejected_feedbacks,
+            medium_feedbacks, low_feedbacks, normal_feedbacks,
+            response_time_sum, response_time_count, satisfaction_sum, satisfaction_count
+        )
+        SELECT
+            (created_at::timestamptz AT TIME ZONE 'UTC')::date,
+            form_type,
+            SUM(sign),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'high'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'resolved'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'new'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'in_progress'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'rejected'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'medium'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'low'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'normal'), 0),
+            COALESCE(SUM(sign * response_time_seconds) FILTER (WHERE status = 'resolved'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'resolved' AND response_time_seconds IS NOT NULL), 0),
+            COALESCE(SUM(sign * satisfaction_score) FILTER (WHERE satisfaction_score > 0), 0),
+            COALESCE(SUM(sign) FILTER (WHERE satisfaction_score > 0), 0)
+        FROM (SELECT n.*, 1 AS sign FROM new_rows n) changes
+        GROUP BY 1, 2;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO analytics_deltas (
+            metric_date, form_type, total_feedbacks, critical_feedbacks, resolved_feedbacks,
+            new_feedbacks, in_progress_feedbacks, rejected_feedbacks,
+            medium_feedbacks, low_feedbacks, normal_feedbacks,
+            response_time_sum, response_time_count, satisfaction_sum, satisfaction_count
+        )
+        SELECT
+            (created_at::timestamptz AT TIME ZONE 'UTC')::date,
+            form_type,
+            SUM(sign),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'high'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'resolved'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'new'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'in_progress'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'rejected'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'medium'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'low'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'normal'), 0),
+            COALESCE(SUM(sign * response_time_seconds) FILTER (WHERE status = 'resolved'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'resolved' AND response_time_seconds IS NOT NULL), 0),
+            COALESCE(SUM(sign * satisfaction_score) FILTER (WHERE satisfaction_score > 0), 0),
+            COALESCE(SUM(sign) FILTER (WHERE satisfaction_score > 0), 0)
+        FROM (SELECT o.*, -1 AS sign FROM old_rows o) changes
+        GROUP BY 1, 2;
+    ELSE
+        INSERT INTO analytics_deltas (
+            metric_date, form_type, total_feedbacks, critical_feedbacks, resolved_feedbacks,
+            new_feedbacks, in_progress_feedbacks, rejected_feedbacks,
+            medium_feedbacks, low_feedbacks, normal_feedbacks,
+            response_time_sum, response_time_count, satisfaction_sum, satisfaction_count
+        )
+        SELECT
+            (created_at::timestamptz AT TIME ZONE 'UTC')::date,
+            form_type,
+            SUM(sign),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'high'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'resolved'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'new'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'in_progress'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'rejected'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'medium'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'low'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE urgency = 'normal'), 0),
+            COALESCE(SUM(sign * response_time_seconds) FILTER (WHERE status = 'resolved'), 0),
+            COALESCE(SUM(sign) FILTER (WHERE status = 'resolved' AND response_time_seconds IS NOT NULL), 0),
+            COALESCE(SUM(sign * satisfaction_score) FILTER (WHERE satisfaction_score > 0), 0),
+            COALESCE(SUM(sign) FILTER (WHERE satisfaction_score > 0), 0)
+        FROM (
+            SELECT n.*, 1 AS sign FROM new_rows n JOIN old_rows o USING (id)
+            WHERE (o.created_at, o.form_type, o.status, o.urgency, o.response_time_seconds, o.satisfaction_score)
+                IS DISTINCT FROM (n.created_at, n.form_type, n.status, n.urgency, n.response_time_seconds, n.satisfaction_score)
+            UNION ALL
+            SELECT o.*, -1 AS sign FROM old_rows o JOIN new_rows n USING (id)
+            WHERE (o.created_at, o.form_type, o.status, o.urgency, o.response_time_seconds, o.satisfaction_score)
+                IS DISTINCT FROM (n.created_at, n.form_type, n.status, n.urgency, n.response_time_seconds, n.satisfaction_score)
+        ) changes
+        GROUP BY 1, 2;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION feedbacks_analytics_delta() IS 'Запись изменений счетчиков analytics в analytics_deltas';
+
+-- Переходные таблицы можно задать только у триггера на одно событие
+DROP TRIGGER IF EXISTS feedbacks_analytics_insert ON feedbacks;
+CREATE TRIGGER feedbacks_analytics_insert AFTER INSERT ON feedbacks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedbacks_analytics_delta();
+
+DROP TRIGGER IF EXISTS feedbacks_analytics_update ON feedbacks;
+CREATE TRIGGER feedbacks_analytics_update AFTER UPDATE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedbacks_analytics_delta();
+
+DROP TRIGGER IF EXISTS feedbacks_analytics_delete ON feedbacks;
+CREATE TRIGGER feedbacks_analytics_delete AFTER DELETE ON feedbacks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feedbacks_analytics_delta();
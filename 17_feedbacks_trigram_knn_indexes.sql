@@ -0,0 +1,17 @@
+-- Миграция для ранжирования нечеткого поиска клиентов по индексу
+-- (GET /api/admin/clients/search, /api/admin/clients/autocomplete)
+-- Выполняется под пользователем arenadata_admin (вне транзакции: CONCURRENTLY)
+
+-- Поиск берет не больше CLIENT_SEARCH_SCAN_ROWS совпадений. GIN-индексы из
+-- 12_feedbacks_trigram_indexes.sql отдают их в произвольном порядке, и на
+-- широком запросе (общий домен, частое имя) лучшие совпадения могли не попасть
+-- в выборку. GiST-индекс отдает строки по возрастанию расстояния
+-- q <<-> column (1 - word_similarity), и в выборку попадают ближайшие
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_client_name_trgm_gist
+    ON feedbacks USING GIST (client_name gist_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_feedbacks_client_email_trgm_gist
+    ON feedbacks USING GIST (client_email gist_trgm_ops);
+
+COMMENT ON INDEX idx_feedbacks_client_name_trgm_gist IS 'Ближайшие по сходству имена клиентов (pg_trgm, KNN)';
+COMMENT ON INDEX idx_feedbacks_client_email_trgm_gist IS 'Ближайшие по сходству email клиентов (pg_trgm, KNN)';
@@ -3,12 +3,49 @@ CRUD operations for Arenadata Feedback System
 Базовые операции с базой данных
 """
 
-from typing import List, Optional, Dict, Any
+import os
+from decimal import Decimal
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, desc
+from sqlalchemy import and_, cast, func, desc, insert, literal, literal_column, select, tuple_, union, update
+from sqlalchemy.types import REAL
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Feedback, FormConfig
 from app.schemas import FeedbackCreate, FeedbackUpdate
+from app.services.pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+# Списки отзывов: до скольких строк total считается точно, дальше - оценка планировщика
+COUNT_EXACT_LIMIT = int(os.getenv("COUNT_EXACT_LIMIT", "10000"))
+
+# Облегченные строки списков: колонки таблицы админки, длинный текст
+# обрезается в SQL до SUMMARY_TEXT_CHARS символов
+SUMMARY_TEXT_CHARS = int(os.getenv("SUMMARY_TEXT_CHARS", "200"))
+FEEDBACK_SUMMARY_COLUMNS = [
+    Feedback.id, Feedback.uuid, Feedback.form_type, Feedback.client_name, Feedback.client_email,
+    func.left(Feedback.problem_text, SUMMARY_TEXT_CHARS).label("problem_text"),
+    Feedback.urgency, Feedback.category, Feedback.status, Feedback.priority_score,
+    Feedback.assigned_to, Feedback.created_at
+]
+
+# Полнотекстовый поиск: выражение должно в точности совпадать с выражением
+# индекса idx_feedbacks_admin_search (11_feedbacks_search_index.sql),
+# иначе планировщик не использует индекс
+SEARCH_VECTOR = literal_column(
+    "to_tsvector('russian', COALESCE(problem_text, '') || ' ' || COALESCE(message, '') || ' ' "
+    "|| COALESCE(client_name, '') || ' ' || COALESCE(category, ''))"
+)
+SEARCH_HEADLINE_TEXT = literal_column("COALESCE(problem_text, '') || ' ' || COALESCE(message, '')")
+SEARCH_HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5, StartSel=<mark>, StopSel=</mark>"
+# ts_rank пересчитывает tsvector по тексту каждой строки: по релевантности
+# сортируются только столько самых новых совпадений (0 - все совпадения)
+SEARCH_RANK_CANDIDATES = int(os.getenv("SEARCH_RANK_CANDIDATES", "1000"))
+
+# Нечеткий поиск клиентов (pg_trgm, 12_feedbacks_trigram_indexes.sql, 17_feedbacks_trigram_knn_indexes.sql):
+# порог word_similarity и сколько самых похожих отзывов группируется в клиентов
+CLIENT_SEARCH_THRESHOLD = float(os.getenv("CLIENT_SEARCH_THRESHOLD", "0.5"))
+CLIENT_SEARCH_SCAN_ROWS = int(os.getenv("CLIENT_SEARCH_SCAN_ROWS", "5000"))
 
 
 # Feedback CRUD operations
@@ -22,18 +59,17 @@ def get_feedback_by_uuid(db: Session, feedback_uuid: str) -> Optional[Feedback]:
     return db.query(Feedback).filter(Feedback.uuid == feedback_uuid).first()
 
 
-def get_feedbacks(
-    db: Session, 
-    skip: int = 0, 
-    limit: int = 100,
+def _filter_feedbacks(
+    query,
     form_type: Optional[str] = None,
     status: Optional[str] = None,
     urgency: Optional[str] = None,
-    client_email: Optional[str] = None
-) -> List[Feedback]:
-    """Получить список отзывов с фильтрами"""
-    query = db.query(Feedback)
-    
+    client_email: Optional[str] = None,
+    form_fields: Optional[list] = None
+):
+    if form_fields:
+        # Условия на form_data (form_filters.form_data_conditions)
+        query = query.filter(*form_fields)
     if form_type:
         query = query.filter(Feedback.form_type == form_type)
     if status:
@@ -42,10 +78,257 @@ def get_feedbacks(
         query = query.filter(Feedback.urgency == urgency)
     if client_email:
         query = query.filter(Feedback.client_email == client_email)
+    return query
+
+
+def get_feedbacks(
+    db: Session, 
+    skip: int = 0, 
+    limit: int = 100,
+    form_type: Optional[str] = None,
+    status: Optional[str] = None,
+    urgency: Optional[str] = None,
+    client_email: Optional[str] = None,
+    summary: bool = False,
+    form_fields: Optional[list] = None
+) -> List[Feedback]:
+    """
+    Получить список отзывов с фильтрами
     
+    summary=True: строки-кортежи только с FEEDBACK_SUMMARY_COLUMNS
+    (схема FeedbackSummary) вместо ORM-объектов
+    form_fields: условия на form_data из form_filters.form_data_conditions
+    """
+    query = _filter_feedbacks(_feedback_rows(db, summary), form_type, status, urgency, client_email, form_fields)
     return query.order_by(desc(Feedback.created_at)).offset(skip).limit(limit).all()
 
 
+def _feedback_rows(db: Session, summary: bool):
+    """Запрос полных ORM-объектов или облегченных строк списка"""
+    if summary:
+        # Строки Row не попадают в identity map сессии и не отслеживаются
+        return db.query(*FEEDBACK_SUMMARY_COLUMNS)
+    return db.query(Feedback)
+
+
+def get_feedbacks_keyset(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    form_type: Optional[str] = None,
+    status: Optional[str] = None,
+    urgency: Optional[str] = None,
+    client_email: Optional[str] = None,
+    summary: bool = False,
+    form_fields: Optional[list] = None
+) -> Tuple[List[Feedback], Optional[str], Optional[str]]:
+    """
+    Страница отзывов по курсору (сортировка created_at DESC, id DESC)
+    
+    Args:
+        cursor: Курсор из предыдущего ответа (None - первая страница)
+        summary: Облегченные строки списка, как в get_feedbacks
+        form_fields: Условия на form_data, как в get_feedbacks
+    
+    Returns:
+        (отзывы, курсор следующей страницы, курсор предыдущей страницы);
+        курсор None - в эту сторону страниц больше нет
+    
+    Raises:
+        InvalidCursorError: Некорректный курсор
+    """
+    query = _filter_feedbacks(_feedback_rows(db, summary), form_type, status, urgency, client_email, form_fields)
+    position = decode_cursor(cursor) if cursor else None
+    keys = [Feedback.created_at, Feedback.id]
+    values = (position.created_at, position.id) if position else None
+    rows, has_next, has_prev = _keyset_page(query, keys, values, position, limit)
+    
+    if not rows:
+        return rows, None, None
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id, "next") if has_next else None
+    prev_cursor = encode_cursor(rows[0].created_at, rows[0].id, "prev") if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def search_feedbacks(
+    db: Session,
+    q: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    sort: str = "rank",
+    form_type: Optional[str] = None,
+    status: Optional[str] = None,
+    urgency: Optional[str] = None,
+    client_email: Optional[str] = None,
+    category: Optional[str] = None
+) -> Tuple[List[Tuple[Feedback, float, str]], Optional[str], Optional[str]]:
+    """
+    Полнотекстовый поиск по problem_text, message, client_name и category
+    
+    Запрос в синтаксисе websearch_to_tsquery ("фраза", -исключить, or).
+    Строки отбираются по GIN-индексу, сортируются по ts_rank (sort='rank',
+    среди SEARCH_RANK_CANDIDATES самых новых совпадений) или по дате
+    (sort='date'), фрагменты ts_headline строятся только для строк страницы.
+    
+    Returns:
+        ([(отзыв, релевантность, фрагмент)], курсор следующей страницы, курсор предыдущей)
+    
+    Raises:
+        InvalidCursorError: Некорректный курсор
+    """
+    tsquery = func.websearch_to_tsquery(literal_column("'russian'"), q)
+    rank = func.ts_rank(SEARCH_VECTOR, tsquery)
+    
+    matches = db.query(Feedback.id, Feedback.created_at).filter(SEARCH_VECTOR.op("@@")(tsquery))
+    matches = _filter_feedbacks(matches, form_type, status, urgency, client_email)
+    if category:
+        matches = matches.filter(Feedback.category == category)
+    # MATERIALIZED: совпадения всегда берутся по GIN-индексу. Иначе при ORDER BY
+    # created_at LIMIT планировщик обходит индекс по дате с фильтром, и для
+    # редкого слова это пересчет tsvector по всей таблице
+    matches = matches.cte("search_matches").prefix_with("MATERIALIZED")
+    
+    position = decode_cursor(cursor) if cursor else None
+    if sort == "rank":
+        if position is not None and position.rank is None:
+            raise InvalidCursorError("Курсор не от поиска по релевантности")
+        candidates = matches
+        if SEARCH_RANK_CANDIDATES > 0:
+            candidates = select(matches.c.id, matches.c.created_at).order_by(
+                desc(matches.c.created_at), desc(matches.c.id)
+            ).limit(SEARCH_RANK_CANDIDATES).subquery()
+        query = db.query(candidates.c.id, candidates.c.created_at, rank.label("rank")).join(
+            Feedback, Feedback.id == candidates.c.id
+        )
+        keys = [rank, candidates.c.created_at, candidates.c.id]
+        # Курсор хранит ts_rank (real): сравниваем в том же типе, без потери точности
+        values = (cast(position.rank, REAL), position.created_at, position.id) if position else None
+    else:
+        query = db.query(matches.c.id, matches.c.created_at)
+        keys = [matches.c.created_at, matches.c.id]
+        values = (position.created_at, position.id) if position else None
+    page, has_next, has_prev = _keyset_page(query, keys, values, position, limit)
+    if not page:
+        return [], None, None
+    
+    headline = func.ts_headline(literal_column("'russian'"), SEARCH_HEADLINE_TEXT, tsquery, SEARCH_HEADLINE_OPTIONS)
+    found = {
+        feedback.id: (feedback, row_rank, snippet)
+        for feedback, row_rank, snippet in db.query(Feedback, rank, headline).filter(
+            Feedback.id.in_([row.id for row in page])
+        )
+    }
+    items = [found[row.id] for row in page if row.id in found]
+    
+    def page_cursor(row, direction: str) -> str:
+        return encode_cursor(row.created_at, row.id, direction, row.rank if sort == "rank" else None)
+    
+    next_cursor = page_cursor(page[-1], "next") if has_next else None
+    prev_cursor = page_cursor(page[0], "prev") if has_prev else None
+    return items, next_cursor, prev_cursor
+
+
+def _trigram_score(db: Session, q: str, columns: list):
+    """
+    Оценка нечеткого совпадения q с колонками: word_similarity(q, column)
+    
+    column %> q - это word_similarity(q, column) >= порога: запрос похож
+    на часть значения (начало email, фамилия из ФИО). Порог задается на
+    транзакцию.
+    """
+    db.execute(
+        select(func.set_config("pg_trgm.word_similarity_threshold", str(CLIENT_SEARCH_THRESHOLD), True))
+    )
+    scores = [func.coalesce(func.word_similarity(q, column), 0) for column in columns]
+    return func.greatest(*scores) if len(scores) > 1 else scores[0]
+
+
+def _nearest(q: str, column, *entities, where: tuple = ()):
+    """
+    Не больше CLIENT_SEARCH_SCAN_ROWS строк, похожих на q по column, начиная с самых похожих
+    
+    ORDER BY q <<-> column (1 - word_similarity) идет по GiST-индексу
+    gist_trgm_ops (17_feedbacks_trigram_knn_indexes.sql): на широком запросе
+    ограничение отсекает наименее похожие строки, а не случайные.
+    """
+    return select(*entities).where(column.op("%>")(q), *where).order_by(
+        literal(q).op("<<->")(column)
+    ).limit(CLIENT_SEARCH_SCAN_ROWS)
+
+
+def search_clients(db: Session, q: str, limit: int = 20, form_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Нечеткий поиск клиентов по имени и email (опечатки, часть строки)
+    
+    По каждой колонке берутся не больше CLIENT_SEARCH_SCAN_ROWS самых похожих
+    отзывов, они группируются по client_email. Клиенты сортируются по сходству,
+    затем по числу отзывов. На широком запросе total_feedbacks и
+    last_feedback_at считаются только по отобранным отзывам.
+    
+    Returns:
+        [{client_email, client_name, client_type, total_feedbacks, last_feedback_at, score}]
+    """
+    score = _trigram_score(db, q, [Feedback.client_name, Feedback.client_email])
+    entities = (
+        Feedback.id, Feedback.client_email, Feedback.client_name, Feedback.form_type, Feedback.created_at,
+        score.label("score")
+    )
+    where = (Feedback.form_type == form_type,) if form_type else ()
+    # UNION без ALL: отзыв, похожий и по имени, и по email, считается один раз
+    matched = union(
+        _nearest(q, Feedback.client_name, *entities, where=where),
+        _nearest(q, Feedback.client_email, *entities, where=where)
+    ).subquery()
+    
+    best = func.max(matched.c.score)
+    total = func.count()
+    rows = db.query(
+        matched.c.client_email,
+        func.max(matched.c.client_name).label("client_name"),
+        func.max(matched.c.form_type).label("client_type"),
+        total.label("total_feedbacks"),
+        func.max(matched.c.created_at).label("last_feedback_at"),
+        best.label("score")
+    ).group_by(matched.c.client_email).order_by(desc(best), desc(total)).limit(limit).all()
+    return [row._asdict() for row in rows]
+
+
+def autocomplete_clients(db: Session, q: str, field: str = "email", limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Подсказки для ввода: различные значения client_email или client_name,
+    похожие на q, по убыванию сходства (из CLIENT_SEARCH_SCAN_ROWS самых похожих отзывов)
+    
+    Returns:
+        [{value, score}]
+    """
+    column = Feedback.client_email if field == "email" else Feedback.client_name
+    score = _trigram_score(db, q, [column])
+    matched = _nearest(q, column, column.label("value"), score.label("score")).subquery()
+    rows = db.query(matched.c.value, func.max(matched.c.score).label("score")).group_by(
+        matched.c.value
+    ).order_by(desc(func.max(matched.c.score)), matched.c.value).limit(limit).all()
+    return [row._asdict() for row in rows]
+
+
+def _keyset_page(query, keys: list, values: Optional[tuple], position, limit: int) -> Tuple[list, bool, bool]:
+    """
+    Страница по курсору для сортировки keys DESC
+    
+    Returns:
+        (строки в порядке сортировки, есть ли следующая страница, есть ли предыдущая)
+    """
+    key = tuple_(*keys)
+    if position is None or position.direction == "next":
+        if position is not None:
+            query = query.filter(key < tuple_(*values))
+        rows = query.order_by(*[desc(k) for k in keys]).limit(limit + 1).all()
+        return rows[:limit], len(rows) > limit, position is not None
+    
+    # Строки ближе к началу: идем по индексу в обратную сторону и разворачиваем
+    rows = query.filter(key > tuple_(*values)).order_by(*keys).limit(limit + 1).all()
+    return rows[:limit][::-1], True, len(rows) > limit
+
+
 def get_feedbacks_count(
     db: Session,
     form_type: Optional[str] = None,
@@ -65,6 +348,49 @@ def get_feedbacks_count(
     return query.count()
 
 
+def count_feedbacks(
+    db: Session,
+    form_type: Optional[str] = None,
+    status: Optional[str] = None,
+    urgency: Optional[str] = None,
+    client_email: Optional[str] = None,
+    form_fields: Optional[list] = None
+) -> Tuple[int, bool]:
+    """
+    Количество отзывов с фильтрами для списков: точное для небольших выборок
+    
+    Сначала берется оценка планировщика (EXPLAIN, без выполнения): полный
+    count() по частым фильтрам дороже самой страницы. Если по оценке строк
+    не больше COUNT_EXACT_LIMIT, они считаются точно, но не дальше
+    COUNT_EXACT_LIMIT + 1 строки (оценка могла оказаться заниженной).
+    
+    Returns:
+        (количество, True если количество точное)
+    """
+    query = _filter_feedbacks(db.query(Feedback.id), form_type, status, urgency, client_email, form_fields)
+    if COUNT_EXACT_LIMIT <= 0:
+        return query.count(), True
+    
+    estimate = _planner_rows(db, query)
+    if estimate > COUNT_EXACT_LIMIT:
+        return estimate, False
+    
+    bounded = db.query(func.count()).select_from(query.limit(COUNT_EXACT_LIMIT + 1).subquery()).scalar()
+    if bounded <= COUNT_EXACT_LIMIT:
+        return bounded, True
+    return max(estimate, bounded), False
+
+
+def _planner_rows(db: Session, query) -> int:
+    """Оценка числа строк запроса по плану (без выполнения)"""
+    # render_postcompile: списки IN (...) подставляются в текст запроса
+    compiled = query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+    plan = db.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+    ).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 def create_feedback(db: Session, feedback: FeedbackCreate) -> Feedback:
     """Создать новый отзыв"""
     db_feedback = Feedback(**feedback.dict())
@@ -74,9 +400,54 @@ def create_feedback(db: Session, feedback: FeedbackCreate) -> Feedback:
     return db_feedback
 
 
+async def create_feedback_async(db: AsyncSession, feedback: FeedbackCreate) -> Feedback:
+    """Создать новый отзыв (асинхронная сессия)"""
+    db_feedback = Feedback(**feedback.dict())
+    db.add(db_feedback)
+    await db.commit()
+    await db.refresh(db_feedback)
+    return db_feedback
+
+
+def bulk_create_feedbacks(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Массово создать отзывы одним многострочным INSERT ... RETURNING id, uuid
+    
+    Если пакет не вставился целиком, строки вставляются по одной,
+    чтобы сохранить корректные и найти ошибочные. Все строки должны
+    содержать одинаковый набор ключей.
+    
+    Returns:
+        Для каждой строки {"id", "uuid"} или {"error"} в порядке rows
+    """
+    if not rows:
+        return []
+    
+    stmt = insert(Feedback).returning(Feedback.id, Feedback.uuid, sort_by_parameter_order=True)
+    
+    try:
+        with db.begin_nested():
+            inserted = db.execute(stmt, rows).all()
+        results = [{"id": row.id, "uuid": str(row.uuid)} for row in inserted]
+    except SQLAlchemyError:
+        results = []
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    inserted_row = db.execute(stmt, [row]).one()
+                results.append({"id": inserted_row.id, "uuid": str(inserted_row.uuid)})
+            except SQLAlchemyError as e:
+                results.append({"error": str(getattr(e, "orig", None) or e).strip()})
+    
+    db.commit()
+    return results
+
+
 def update_feedback(db: Session, feedback_id: int, feedback: FeedbackUpdate, update_data: Optional[Dict] = None) -> Optional[Feedback]:
     """Обновить отзыв"""
-    db_feedback = db.query(Feedback).filter(Feedback.id == feedback_id).first()
+    # FOR UPDATE: параллельное обновление того же отзыва ждет этой транзакции
+    # и читает уже новые значения, а не перезаписывает их старыми
+    db_feedback = db.query(Feedback).filter(Feedback.id == feedback_id).with_for_update().first()
     if not db_feedback:
         return None
     
@@ -91,6 +462,48 @@ def update_feedback(db: Session, feedback_id: int, feedback: FeedbackUpdate, upd
     return db_feedback
 
 
+# Отзывы, которые можно взять в работу: без ответственного и не закрытые.
+# Условие совпадает с предикатом частичного индекса idx_feedbacks_claim_queue
+CLAIMABLE_STATUSES = ("new", "in_progress")
+
+
+def claim_feedbacks(db: Session, assigned_to: str, n: int = 1, form_type: Optional[str] = None) -> List[Feedback]:
+    """
+    Атомарно взять в работу следующие n отзывов из очереди
+    
+    Отзывы без ответственного выбираются по priority_score DESC NULLS LAST,
+    created_at (как в индексе idx_feedbacks_claim_queue) с FOR UPDATE SKIP LOCKED и назначаются одним UPDATE. Параллельные вызовы
+    пропускают строки, уже заблокированные другими, поэтому не ждут друг
+    друга и не получают один и тот же отзыв.
+    
+    Returns:
+        Назначенные отзывы в порядке очереди (меньше n, если очередь короче)
+    """
+    queue = select(Feedback.id).where(
+        Feedback.assigned_to.is_(None), Feedback.status.in_(CLAIMABLE_STATUSES)
+    )
+    if form_type:
+        queue = queue.where(Feedback.form_type == form_type)
+    queue = queue.order_by(desc(Feedback.priority_score).nulls_last(), Feedback.created_at).limit(n).with_for_update(
+        skip_locked=True
+    )
+    
+    claimed = db.execute(
+        update(Feedback)
+        .where(Feedback.id.in_(queue.scalar_subquery()))
+        .values(assigned_to=assigned_to, status="in_progress", updated_at=func.now())
+        .returning(Feedback),
+        execution_options={"synchronize_session": False}
+    ).scalars().all()
+    claimed = sorted(claimed, key=lambda f: (f.priority_score is None, -(f.priority_score or 0), f.created_at))
+    # commit помечает объекты сессии устаревшими, и каждый перечитывался бы
+    # отдельным SELECT: RETURNING уже вернул все колонки, отсоединяем объекты до commit
+    for feedback in claimed:
+        db.expunge(feedback)
+    db.commit()
+    return claimed
+
+
 def delete_feedback(db: Session, feedback_id: int) -> bool:
     """Удалить отзыв"""
     db_feedback = db.query(Feedback).filter(Feedback.id == feedback_id).first()
@@ -142,63 +555,162 @@ def update_form_config(db: Session, config_id: int, config: Dict[str, Any]) -> O
 
 
 # Analytics CRUD operations
+STATS_FORM_TYPES = ("tech", "business", "exec")
+STATS_STATUSES = ("new", "in_progress", "resolved", "rejected")
+STATS_DAYS = 7
+
+
 def get_stats(db: Session, form_type: Optional[str] = None) -> Dict[str, Any]:
-    """Получить статистику по отзывам"""
-    query = db.query(Feedback)
+    """
+    Получить статистику по отзывам
     
-    if form_type:
-        query = query.filter(Feedback.form_type == form_type)
+    Два запроса вместо отдельного на каждую цифру: матрица (form_type, status)
+    с условными агрегатами (COUNT(*) FILTER ...) за один проход по таблице
+    и число отзывов по дням за последние STATS_DAYS дней по индексу created_at.
+    Итоги, распределения и средние собираются из строк матрицы.
+    
+    form_type ограничивает total, critical, resolved и feedbacks_by_status;
+    средние и отзывы по дням считаются по всем отзывам.
+    """
+    from datetime import datetime, timedelta
+    days = [(datetime.utcnow() - timedelta(days=i)).date() for i in range(STATS_DAYS - 1, -1, -1)]
     
-    total = query.count()
-    critical = query.filter(Feedback.urgency == 'high').count()
-    resolved = query.filter(Feedback.status == 'resolved').count()
+    resolved_time = Feedback.response_time_seconds
+    is_resolved = Feedback.status == 'resolved'
+    has_satisfaction = Feedback.satisfaction_score > 0
+    cells = db.execute(
+        select(
+            Feedback.form_type,
+            Feedback.status,
+            func.count().label("total"),
+            func.count().filter(Feedback.urgency == 'high').label("critical"),
+            func.sum(resolved_time).filter(is_resolved).label("response_sum"),
+            func.count(resolved_time).filter(is_resolved).label("response_count"),
+            func.sum(Feedback.satisfaction_score).filter(has_satisfaction).label("satisfaction_sum"),
+            func.count(Feedback.satisfaction_score).filter(has_satisfaction).label("satisfaction_count"),
+        ).group_by(Feedback.form_type, Feedback.status)
+    ).all()
     
-    # Среднее время ответа
-    avg_response = db.query(func.avg(Feedback.response_time_seconds)).filter(
-        and_(Feedback.response_time_seconds.isnot(None), Feedback.status == 'resolved')
-    ).scalar() or 0
+    # Дата сравнивается с created_at как полночь в часовом поясе сессии -
+    # тот же день, что дает date(created_at); диапазон читается по индексу
+    created_day = func.date(Feedback.created_at)
+    by_day = dict(db.execute(
+        select(created_day, func.count()).where(Feedback.created_at >= days[0]).group_by(created_day)
+    ).all())
+    scoped = [row for row in cells if not form_type or row.form_type == form_type]
     
-    # Средняя удовлетворенность
-    avg_satisfaction = db.query(func.avg(Feedback.satisfaction_score)).filter(
-        and_(Feedback.satisfaction_score.isnot(None), Feedback.satisfaction_score > 0)
-    ).scalar() or 0
+    # Средние по суммам и количествам ячеек; Decimal, как у avg() в PostgreSQL
+    response_count = sum(row.response_count for row in cells)
+    avg_response = Decimal(sum(row.response_sum or 0 for row in cells)) / response_count if response_count else 0
+    satisfaction_count = sum(row.satisfaction_count for row in cells)
+    avg_satisfaction = (
+        Decimal(sum(row.satisfaction_sum or 0 for row in cells)) / satisfaction_count if satisfaction_count else 0
+    )
     
-    # Распределение по типам
     feedbacks_by_type = {}
     if not form_type:
-        for ft in ['tech', 'business', 'exec']:
-            feedbacks_by_type[ft] = db.query(Feedback).filter(Feedback.form_type == ft).count()
-    
-    # Распределение по статусам
-    feedbacks_by_status = {}
-    for status in ['new', 'in_progress', 'resolved', 'rejected']:
-        feedbacks_by_status[status] = query.filter(Feedback.status == status).count()
-    
-    # Статистика по последним 7 дням
-    from datetime import datetime, timedelta
-    recent_feedbacks_by_day = []
-    for i in range(6, -1, -1):  # от 6 дней назад до сегодня
-        date = datetime.utcnow() - timedelta(days=i)
-        day_count = db.query(Feedback).filter(
-            func.date(Feedback.created_at) == date.date()
-        ).count()
-        recent_feedbacks_by_day.append(day_count)
+        for ft in STATS_FORM_TYPES:
+            feedbacks_by_type[ft] = sum(row.total for row in cells if row.form_type == ft)
     
     return {
-        'total_feedbacks': total,
-        'critical_feedbacks': critical,
-        'resolved_feedbacks': resolved,
+        'total_feedbacks': sum(row.total for row in scoped),
+        'critical_feedbacks': sum(row.critical for row in scoped),
+        'resolved_feedbacks': sum(row.total for row in scoped if row.status == 'resolved'),
         'avg_response_time_minutes': round(avg_response / 60, 2) if avg_response else 0,
         'satisfaction_avg': round(float(avg_satisfaction), 2) if avg_satisfaction else 0,
         'feedbacks_by_type': feedbacks_by_type,
-        'feedbacks_by_status': feedbacks_by_status,
-        'recent_feedbacks_by_day': recent_feedbacks_by_day
+        'feedbacks_by_status': {
+            status: sum(row.total for row in scoped if row.status == status) for status in STATS_STATUSES
+        },
+        'recent_feedbacks_by_day': [by_day.get(d, 0) for d in days]
     }
 
 
-def get_recent_feedbacks(db: Session, limit: int = 5, form_type: Optional[str] = None) -> List[Feedback]:
-    """Получить последние отзывы"""
-    query = db.query(Feedback)
+SERIES_BUCKETS = ("day", "week", "month")
+
+
+def _next_bucket(current, bucket: str):
+    from datetime import timedelta
+    if bucket == "month":
+        return current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+    return current + timedelta(days=7 if bucket == "week" else 1)
+
+
+def _bucket_start(day, bucket: str):
+    """Начало интервала bucket, в который попадает day: понедельник, первое число (как date_trunc)"""
+    from datetime import timedelta
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def series_bucket_count(start, end, bucket: str) -> int:
+    """Число интервалов bucket, покрывающих даты start..end, без построения списка"""
+    first = _bucket_start(start, bucket)
+    if bucket == "month":
+        return (end.year - first.year) * 12 + end.month - first.month + 1
+    return (end - first).days // (7 if bucket == "week" else 1) + 1
+
+
+def series_buckets(start, end, bucket: str) -> list:
+    """
+    Начала интервалов bucket, покрывающих даты start..end включительно
+    
+    Неделя начинается с понедельника, месяц - с первого числа (как date_trunc).
+    Следующий интервал после последнего не вычисляется: end может быть date.max.
+    """
+    buckets = [_bucket_start(start, bucket)]
+    for _ in range(series_bucket_count(start, end, bucket) - 1):
+        buckets.append(_next_bucket(buckets[-1], bucket))
+    return buckets
+
+
+def get_feedback_series(db: Session, start, end, bucket: str = "day") -> Dict[str, Any]:
+    """
+    Число отзывов по интервалам (day/week/month) за даты start..end
+    
+    Один запрос с условными агрегатами (COUNT(*) FILTER ...) по диапазону
+    created_at вместо отдельного запроса на каждый интервал. Крайние
+    интервалы берутся целиком; интервалы без отзывов заполняются нулями.
+    Даты - в часовом поясе сессии, как date(created_at).
+    
+    Returns:
+        {'buckets': [date, ...], 'total': [...], 'critical': [...],
+         'form_types': {form_type: число за весь диапазон}}
+    """
+    buckets = series_buckets(start, end, bucket)
+    if not buckets:
+        return {'buckets': [], 'total': [], 'critical': [], 'form_types': {ft: 0 for ft in STATS_FORM_TYPES}}
+    
+    bucket_start = func.date(func.date_trunc(bucket, Feedback.created_at))
+    rows = db.execute(
+        select(
+            bucket_start.label("bucket"),
+            func.count().label("total"),
+            func.count().filter(Feedback.urgency == 'high').label("critical"),
+            *[func.count().filter(Feedback.form_type == ft).label(ft) for ft in STATS_FORM_TYPES]
+        ).where(
+            Feedback.created_at >= buckets[0],
+            Feedback.created_at < _next_bucket(buckets[-1], bucket)
+        ).group_by(bucket_start)
+    ).all()
+    
+    by_bucket = {row.bucket: row for row in rows}
+    return {
+        'buckets': buckets,
+        'total': [by_bucket[b].total if b in by_bucket else 0 for b in buckets],
+        'critical': [by_bucket[b].critical if b in by_bucket else 0 for b in buckets],
+        'form_types': {ft: sum(getattr(row, ft) for row in rows) for ft in STATS_FORM_TYPES}
+    }
+
+
+def get_recent_feedbacks(
+    db: Session, limit: int = 5, form_type: Optional[str] = None, summary: bool = False
+) -> List[Feedback]:
+    """Получить последние отзывы (summary=True - облегченные строки, как в get_feedbacks)"""
+    query = _feedback_rows(db, summary)
     
     if form_type:
         query = query.filter(Feedback.form_type == form_type)
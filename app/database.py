@@ -5,6 +5,7 @@ Database configuration for Arenadata Feedback System
 
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -26,6 +27,26 @@ engine = create_engine(
 # Создание сессии
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок (asyncpg) для горячих путей: не блокирует event loop
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=int(os.getenv("ASYNC_DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10")),
+    echo=False
+)
+
+# expire_on_commit=False: после commit атрибуты (id, uuid) доступны без запроса в БД
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # Базовый класс для моделей
 Base = declarative_base()
 
@@ -42,6 +63,15 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency для получения асинхронной сессии БД
+    Используется в async endpoints на горячем пути
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def create_tables():
     """Создание всех таблиц в БД"""
     Base.metadata.create_all(bind=engine)
@@ -3,23 +3,37 @@ Arenadata Feedback System - FastAPI Main Application
 MVP система сбора обратной связи за 2 недели
 """
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, HTTPException, Depends, Header
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+import uuid
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 import pytz
 import httpx
 
-from app.database import engine, Base, SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine, Base, SessionLocal, async_engine, get_async_db
 from app.routers import feedback as feedback_router, forms, admin, admin_panel
 from app.admin import create_admin_app
+from app.services.urgency import get_urgency_rules, urgency_cache
+from app.services.classifier import classification_cache
+from app.services.batch import classify_batch, iter_classify_batch, shutdown_pool
+from app.services.offload import MessageTooLargeError, analyze_urgency_sized, check_message_size, offload_stats
+from app.services.bulk_ingest import parse_bulk_body, ingest_feedbacks
+from app.services.json_body import BULK_MAX_BODY_BYTES, BodyTooLargeError, LimitedJSONRoute, dumps, read_body
+from app.services.form_filters import submitted_form_data
+from app.services.ingest_queue import INGEST_MODE, QueueFullError, ingest_queue
+from app.services import idempotency, rollups, stats_cache, stats_views
+from app.services.idempotency import IdempotencyKeyError, IdempotencyKeyMismatchError
+from app.schemas import UrgencyBatchRequest
 from app import models
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 # Создание таблиц в БД
 Base.metadata.create_all(bind=engine)
@@ -27,8 +41,11 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="Arenadata Feedback System",
     description="MVP система сбора обратной связи для клиентов Arenadata",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
+# Тела запросов: лимит размера при чтении и разбор через orjson
+app.router.route_class = LimitedJSONRoute
 
 # CORS для работы с фронтендом
 app.add_middleware(
@@ -82,8 +99,12 @@ templates.env.filters['datetime_msk'] = format_datetime_msk
 
 # Pydantic модели
 class FeedbackCreate(BaseModel):
+    # Ответы на поля динамической формы приходят на верхнем уровне и сохраняются в form_data
+    model_config = ConfigDict(extra="allow")
+    
     form_type: str
     message: str
+    form_data: Optional[Dict[str, Any]] = None
 
 # Dependency для получения сессии БД
 def get_db():
@@ -110,161 +131,197 @@ async def test_urgency_analysis(request: dict):
     text = request.get('text', '')
     if not text:
         raise HTTPException(status_code=400, detail="Текст не может быть пустым")
+    try:
+        check_message_size(text)
+    except MessageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    
+    rules = get_urgency_rules()
+    result = await analyze_urgency_sized(text, rules)
+    return {**result, "rules": rules.metadata()}
+
+@app.post("/api/analyze-urgency/batch")
+async def batch_urgency_analysis(batch: UrgencyBatchRequest, stream: bool = False):
+    """
+    Пакетный анализ срочности текстов
+    
+    - **mode**: urgency (analyze_urgency) или classify (classify_feedback)
+    - **form_type**: Тип формы для режима classify
+    - **stream**: Отдавать результаты построчно в NDJSON по мере готовности
     
-    result = analyze_urgency(text)
-    return result
+    Результаты возвращаются в порядке переданных текстов
+    """
+    rules = get_urgency_rules()
+    
+    if stream:
+        async def ndjson_lines():
+            index = 0
+            async for result in iter_classify_batch(batch.texts, batch.mode, batch.form_type):
+                yield dumps({"index": index, **result}) + b"\n"
+                index += 1
+        
+        return StreamingResponse(
+            ndjson_lines(),
+            media_type="application/x-ndjson",
+            headers={"X-Rules-Version": rules.version}
+        )
+    
+    results = await classify_batch(batch.texts, batch.mode, batch.form_type)
+    return {"count": len(results), "results": results, "rules": rules.metadata()}
 
 @app.post("/api/feedback")
-async def create_feedback(feedback: FeedbackCreate):
+async def create_feedback(
+    feedback: FeedbackCreate,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_HEADER)
+):
     """
     Создание нового отзыва с автоматическим определением срочности
+    
+    С заголовком Idempotency-Key повтор запроса возвращает исходный ответ
+    (заголовок Idempotent-Replayed: true) без повторной записи.
     """
+    try:
+        check_message_size(feedback.message)
+    except MessageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    
+    endpoint = "POST /api/feedback"
+    key = fingerprint = None
+    if idempotency_key is not None:
+        try:
+            key = idempotency.validate_key(idempotency_key)
+        except IdempotencyKeyError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        fingerprint = idempotency.request_fingerprint(feedback.model_dump())
+    
+    # Одновременный повтор с тем же ключом ждет первый запрос и получает его ответ
+    async with idempotency.in_flight(key, endpoint):
+        return await _create_feedback(feedback, db, endpoint, key, fingerprint)
+
+async def _create_feedback(feedback: FeedbackCreate, db: AsyncSession, endpoint: str,
+                           key: Optional[str], fingerprint: Optional[str]):
+    if key is not None:
+        try:
+            stored = idempotency.cached_response(key, endpoint, fingerprint)
+            if stored is None and INGEST_MODE == "queue":
+                # В режиме очереди ключ проверяется до постановки в очередь
+                stored = await idempotency.stored_response(db, key, endpoint, fingerprint)
+        except IdempotencyKeyMismatchError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
+        if stored is not None:
+            return idempotency.replay_response(stored)
+    
     # Автоматически определяем срочность на основе текста
-    urgency_analysis = analyze_urgency(feedback.message)
+    # (длинные тексты - в пуле процессов, не блокируя event loop)
+    rules = get_urgency_rules()
+    urgency_analysis = await analyze_urgency_sized(feedback.message, rules)
     
-    # Создаем запись в базе данных
-    db = SessionLocal()
-    try:
-        db_feedback = models.Feedback(
-            form_type=feedback.form_type,
-            message=feedback.message,
-            urgency=urgency_analysis['urgency'],
-            urgency_confidence=urgency_analysis['confidence'],
-            urgency_reason=urgency_analysis['reason'],
-            created_at=datetime.utcnow()
-        )
-        
-        db.add(db_feedback)
-        db.commit()
-        db.refresh(db_feedback)
-        
-        return {
-            "id": db_feedback.id,
+    if INGEST_MODE == "queue":
+        # Write-behind: подтверждаем прием, запись в БД - групповым commit
+        row = {
+            "form_type": feedback.form_type,
+            "message": feedback.message,
+            "form_data": submitted_form_data(feedback.model_extra, feedback.form_data),
+            "urgency": urgency_analysis['urgency'],
+            "urgency_confidence": urgency_analysis['confidence'],
+            "urgency_reason": urgency_analysis['reason']
+        }
+        feedback_uuid = uuid.uuid4()
+        body = {
+            "uuid": str(feedback_uuid),
             "urgency": urgency_analysis['urgency'],
             "confidence": urgency_analysis['confidence'],
             "reason": urgency_analysis['reason'],
-            "message": "Отзыв успешно сохранен"
+            "rules": rules.metadata(),
+            "message": "Отзыв принят в обработку"
         }
-    finally:
-        db.close()
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "service": "arenadata-feedback"}
-
-def analyze_urgency(text: str) -> dict:
-    """
-    Анализирует текст и определяет уровень срочности
-    
-    Args:
-        text: Текст сообщения от клиента
+        record = idempotency.key_record(key, endpoint, fingerprint, 202, body) if key else None
+        try:
+            ingest_queue.submit({**row, "uuid": feedback_uuid}, idempotency=record)
+        except QueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"}) from e
         
-    Returns:
-        dict: Уровень срочности и уверенность
-    """
-    # Словарь ключевых слов для определения срочности
-    urgency_keywords = {
-        'high': [
-            'не работает', 'ошибка', 'сбой', 'упал', 'завис', 'критично',
-            'не открывается', 'не запускается', 'не загружается', 'пропал',
-            'потерял', 'сломался', 'вылетает', 'крашится', 'блокирует',
-            'нет доступа', 'запрещен', 'отказывает', 'не отвечает',
-            '500', '404', '403', 'connection', 'failed', 'crash',
-            # Дополнительные критические слова
-            'авария', 'катастрофа', 'проблема', 'баг', 'неисправность',
-            'отказ', 'поломка', 'поврежден', 'испорчен', 'неработающий',
-            'недоступен', 'сломан', 'не функционален', 'деактивирован',
-            'перестал', 'прекратил', 'остановился', 'замерз', 'застыл',
-            'corrupted', 'broken', 'down', 'unavailable', 'timeout',
-            'exception', 'fatal', 'critical', 'emergency', 'urgent',
-            'не загружается', 'не отображается', 'не появляется',
-            'пустой экран', 'белый экран', 'черный экран', 'зависает'
-        ],
-        'medium': [
-            'медленно', 'тормозит', 'глючит', 'неудобно', 'проблема',
-            'долго', 'медленно', 'задержка', 'подвисает', 'тупит',
-            'не получается', 'не могу', 'сложно', 'проблемный',
-            'странно', 'неожиданно', 'иногда', 'периодически',
-            'часть функций', 'некоторые', 'отдельные',
-            # Дополнительные слова средней срочности
-            'плохо', 'неудобно', 'сложно', 'затруднительно', 'проблематично',
-            'нестабильно', 'непостоянно', 'рванно', 'рывками', 'прыгает',
-            'медленная загрузка', 'долгое ожидание', 'задерживается',
-            'подвисает', 'замирает', 'останавливается', 'прерывается',
-            'некорректно', 'неправильно', 'не так', 'не работает как надо',
-            'требует перезагрузки', 'нужно перезапустить', 'слетел',
-            'пропали настройки', 'сбросились настройки', 'исчезли данные',
-            'slow', 'lag', 'delay', 'unstable', 'inconsistent', 'buggy'
-        ],
-        'low': [
-            'хотелось бы', 'можно добавить', 'было бы хорошо', 'предлагаю',
-            'желаю', 'нужно', 'требуется', 'предложение', 'пожелание',
-            'удобно было бы', 'отлично было бы', 'супер было бы',
-            'новая функция', 'улучшить', 'оптимизировать', 'развитие',
-            'статистика', 'отчет', 'фильтр', 'сортировка', 'поиск',
-            # Дополнительные слова низкой срочности
-            'пожелание', 'идея', 'мысль', 'предложение', 'рекомендация',
-            'улучшение', 'оптимизация', 'модернизация', 'доработка',
-            'дополнение', 'расширение', 'усиление', 'усилить',
-            'интересно', 'любопытно', 'замечательно', 'прекрасно',
-            'отличная идея', 'хорошая мысль', 'полезно', 'удобно',
-            'красиво', 'эстетично', 'профессионально', 'качественно',
-            'feature', 'enhancement', 'improvement', 'suggestion', 'idea',
-            'request', 'wishlist', 'nice to have', 'would be great'
-        ]
-    }
+        if key:
+            idempotency.remember_local(key, endpoint, fingerprint, 202, body)
+        return JSONResponse(status_code=202, content=body)
     
-    # Приводим текст к нижнему регистру для анализа
-    text_lower = text.lower()
-    
-    # Считаем совпадения для каждого уровня срочности
-    urgency_scores = {
-        'high': 0,
-        'medium': 0,
-        'low': 0
-    }
+    # Создаем запись в базе данных (асинхронно, без блокировки event loop)
+    db_feedback = models.Feedback(
+        form_type=feedback.form_type,
+        message=feedback.message,
+        form_data=submitted_form_data(feedback.model_extra, feedback.form_data),
+        urgency=urgency_analysis['urgency'],
+        urgency_confidence=urgency_analysis['confidence'],
+        urgency_reason=urgency_analysis['reason'],
+        created_at=datetime.utcnow()
+    )
     
-    # Анализируем ключевые слова
-    for urgency_level, keywords in urgency_keywords.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                urgency_scores[urgency_level] += 1
+    db.add(db_feedback)
+    await db.flush()
     
-    # Определяем уровень срочности
-    total_score = sum(urgency_scores.values())
+    body = {
+        "id": db_feedback.id,
+        "urgency": urgency_analysis['urgency'],
+        "confidence": urgency_analysis['confidence'],
+        "reason": urgency_analysis['reason'],
+        "rules": rules.metadata(),
+        "message": "Отзыв успешно сохранен"
+    }
     
-    if total_score == 0:
-        # Если ключевых слов нет, определяем по длине и общим признакам
-        if len(text) > 200:  # Длинные сообщения обычно более срочные
-            return {'urgency': 'medium', 'confidence': 0.3, 'reason': 'Длинное сообщение'}
-        else:
-            return {'urgency': 'low', 'confidence': 0.2, 'reason': 'Нет явных признаков срочности'}
+    if key and not await idempotency.remember(db, key, endpoint, fingerprint, 200, body):
+        # Ключ успел сохранить параллельный повтор: отменяем вставку и отдаем его ответ
+        await db.rollback()
+        try:
+            stored = await idempotency.stored_response(db, key, endpoint, fingerprint)
+        except IdempotencyKeyMismatchError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
+        return idempotency.replay_response(stored)
     
-    # Находим уровень с максимальным счетом
-    max_urgency = max(urgency_scores, key=urgency_scores.get)
-    max_score = urgency_scores[max_urgency]
-    confidence = max_score / total_score
+    await db.commit()
+    if key:
+        idempotency.remember_local(key, endpoint, fingerprint, 200, body)
+    return body
+
+@app.post("/api/feedback/bulk")
+async def bulk_create_feedback(request: Request):
+    """
+    Массовая загрузка отзывов (миграция тикетов из других систем)
     
-    # Дополнительные правила для уточнения
-    if max_urgency == 'high' and confidence > 0.4:
-        return {
-            'urgency': 'high', 
-            'confidence': confidence,
-            'reason': f'Найдены {max_score} критичных признаков'
-        }
-    elif max_urgency == 'medium' and confidence > 0.3:
-        return {
-            'urgency': 'medium', 
-            'confidence': confidence,
-            'reason': f'Найдены {max_score} признаков проблем'
-        }
-    else:
-        return {
-            'urgency': 'low', 
-            'confidence': confidence,
-            'reason': f'Найдены {max_score} признаков улучшений'
-        }
+    Тело: JSON массив объектов или NDJSON (Content-Type: application/x-ndjson).
+    Записи классифицируются пакетами и вставляются многострочным INSERT.
+    Ошибки отдельных записей возвращаются в errors и не прерывают загрузку.
+    """
+    try:
+        body = await read_body(request, BULK_MAX_BODY_BYTES)
+    except BodyTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    try:
+        records = parse_bulk_body(body, request.headers.get("content-type", ""))
+        return await ingest_feedbacks(records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if INGEST_MODE == "queue":
+        await ingest_queue.start()
+    idempotency.start_purger()
+    stats_views.start_scheduler()
+    rollups.start_scheduler()
+
+@app.on_event("shutdown")
+async def shutdown_resources():
+    await idempotency.stop_purger()
+    await stats_views.stop_scheduler()
+    await rollups.stop_scheduler()
+    await ingest_queue.stop()
+    shutdown_pool()
+    await async_engine.dispose()
 
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "service": "arenadata-feedback"}
 
 @app.get("/metrics")
 async def metrics():
@@ -277,6 +334,16 @@ async def metrics():
         "memory_percent": psutil.virtual_memory().percent,
         "cpu_percent": psutil.cpu_percent(interval=1),
         "disk_usage_percent": psutil.disk_usage('/').percent,
+        "classification_cache": {
+            "urgency": urgency_cache.stats(),
+            "classify": classification_cache.stats()
+        },
+        "classification_offload": offload_stats.stats(),
+        "ingest_queue": ingest_queue.stats(),
+        "idempotency_cache": idempotency.idempotency_cache.stats(),
+        "stats_cache": stats_cache.stats_cache.stats(),
+        "stats_views": stats_views.refresh_stats.stats(),
+        "analytics_rollups": rollups.rollup_stats.stats(),
         "service": "arenadata-feedback"
     }
 
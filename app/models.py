@@ -3,7 +3,10 @@ SQLAlchemy models for Arenadata Feedback System
 Модели данных соответствуют таблицам в PostgreSQL
 """
 
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, DECIMAL, Float
+from sqlalchemy import (
+    BigInteger, Column, Date, Integer, String, Text, Boolean, DateTime, ForeignKey, DECIMAL, Float, Index,
+    UniqueConstraint, text
+)
 from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -36,6 +39,17 @@ class FormConfig(Base):
 class Feedback(Base):
     """Все отзывы клиентов"""
     __tablename__ = "feedbacks"
+    __table_args__ = (
+        # Постраничный вывод по курсору: ORDER BY created_at DESC, id DESC
+        Index("idx_feedbacks_created_at_id", "created_at", "id"),
+        # Фильтры по полям форм: form_data @> и @@ (app/services/form_filters.py)
+        Index("idx_feedbacks_form_data", "form_data", postgresql_using="gin"),
+        # Очередь разбора: открытые отзывы без ответственного по приоритету и возрасту
+        Index(
+            "idx_feedbacks_claim_queue", text("priority_score DESC NULLS LAST"), "created_at",
+            postgresql_where=text("assigned_to IS NULL AND status IN ('new', 'in_progress')")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     uuid = Column(UUID(as_uuid=True), default=lambda: str(uuid.uuid4()), unique=True, nullable=False, index=True)
@@ -63,7 +77,7 @@ class Feedback(Base):
     priority_score = Column(Integer, default=0)
     
     # Данные формы (JSON для гибкости)
-    form_data = Column(JSONB, index=True)
+    form_data = Column(JSONB)
     
     # Временные метки
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -75,6 +89,97 @@ class Feedback(Base):
     satisfaction_score = Column(Integer)  # 1-5
 
 
+class BackfillJob(Base):
+    """Фоновые задачи пересчета данных (контрольная точка для продолжения)"""
+    __tablename__ = "backfill_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(50), nullable=False, unique=True)  # 'reclassify'
+    rules_version = Column(String(100))  # Версия правил, с которыми идет пересчет
+    status = Column(String(20), nullable=False, default='pending')  # 'running', 'stopping', 'paused', 'completed', 'failed'
+    last_id = Column(Integer, nullable=False, default=0)  # Последний обработанный feedbacks.id
+    processed = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)  # Строки, у которых изменилась классификация
+    total_estimate = Column(Integer)
+    error = Column(Text)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class IdempotencyKey(Base):
+    """Ответы на запросы с заголовком Idempotency-Key (повторы не создают дубли)"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String(100), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # Отпечаток тела запроса
+    status_code = Column(Integer, nullable=False)
+    response = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class Analytics(Base):
+    """Агрегированная статистика: metric_type 'daily_stats' - счетчики отзывов за день (UTC) по типу формы"""
+    __tablename__ = "analytics"
+    __table_args__ = (
+        UniqueConstraint("metric_type", "metric_date", "form_type"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    metric_type = Column(String(50), nullable=False)  # 'daily_stats', 'weekly_stats', 'category_stats'
+    metric_date = Column(Date, nullable=False, index=True)
+    form_type = Column(String(20), index=True)
+    
+    # Счетчики (инкрементальные агрегаты, app/services/rollups.py)
+    total_feedbacks = Column(Integer, default=0)
+    critical_feedbacks = Column(Integer, default=0)  # urgency = 'high'
+    resolved_feedbacks = Column(Integer, default=0)
+    new_feedbacks = Column(Integer, nullable=False, default=0)
+    in_progress_feedbacks = Column(Integer, nullable=False, default=0)
+    rejected_feedbacks = Column(Integer, nullable=False, default=0)
+    medium_feedbacks = Column(Integer, nullable=False, default=0)
+    low_feedbacks = Column(Integer, nullable=False, default=0)
+    normal_feedbacks = Column(Integer, nullable=False, default=0)
+    # Суммы и количества для средних: среднее за период из средних за дни не сложить
+    response_time_sum = Column(BigInteger, nullable=False, default=0)  # Решенные отзывы
+    response_time_count = Column(Integer, nullable=False, default=0)
+    satisfaction_sum = Column(BigInteger, nullable=False, default=0)  # Оценки > 0
+    satisfaction_count = Column(Integer, nullable=False, default=0)
+    avg_response_time_minutes = Column(DECIMAL(10, 2))
+    satisfaction_avg = Column(DECIMAL(3, 2))
+    
+    # Дополнительные метрики (JSON для гибкости)
+    additional_metrics = Column(JSONB)
+    
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class AnalyticsDelta(Base):
+    """Изменения счетчиков analytics от записи отзывов (пишет триггер, сворачивает rollups)"""
+    __tablename__ = "analytics_deltas"
+    
+    id = Column(BigInteger, primary_key=True)
+    metric_date = Column(Date, nullable=False)
+    form_type = Column(String(20), nullable=False)
+    total_feedbacks = Column(Integer, nullable=False)
+    critical_feedbacks = Column(Integer, nullable=False)
+    resolved_feedbacks = Column(Integer, nullable=False)
+    new_feedbacks = Column(Integer, nullable=False)
+    in_progress_feedbacks = Column(Integer, nullable=False)
+    rejected_feedbacks = Column(Integer, nullable=False)
+    medium_feedbacks = Column(Integer, nullable=False)
+    low_feedbacks = Column(Integer, nullable=False)
+    normal_feedbacks = Column(Integer, nullable=False)
+    response_time_sum = Column(BigInteger, nullable=False)
+    response_time_count = Column(Integer, nullable=False)
+    satisfaction_sum = Column(BigInteger, nullable=False)
+    satisfaction_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+
 class FeedbackAttachment(Base):
     """Вложения к отзывам"""
     __tablename__ = "feedback_attachments"
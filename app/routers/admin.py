@@ -5,38 +5,64 @@ Endpoints для административных функций
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.crud import (
-    get_feedbacks, get_feedbacks_count, get_stats, get_recent_feedbacks
+    count_feedbacks, get_feedbacks, get_feedbacks_count, get_feedbacks_keyset,
+    get_recent_feedbacks, search_feedbacks, search_clients, autocomplete_clients, claim_feedbacks
 )
+from app.models import Feedback as FeedbackModel
 from app.schemas import (
-    Feedback, FeedbackListResponse, StatsResponse
+    ClientAutocompleteResponse, ClientMatch, ClientSearchResponse, ClientSuggestion,
+    Feedback, FeedbackListResponse, FeedbackSearchHit, FeedbackSearchResponse, FeedbackSummary,
+    QueueClaimResponse, StatsResponse
 )
+from app.services import stats_cache, stats_views
 from app.services.telegram import test_telegram_connection
+from app.services.urgency import get_urgency_rules, reload_urgency_rules
+from app.services.reclassify import (
+    JobAlreadyRunningError, get_job_status, request_stop, start_in_background
+)
+from app.services.form_filters import InvalidFormFilterError, form_data_conditions
+from app.services.json_body import LimitedJSONRoute
+from app.services.pagination import InvalidCursorError
+
+router = APIRouter(route_class=LimitedJSONRoute)
+
 
-router = APIRouter()
+def _list_items(rows: list, view: str) -> list:
+    """Строки списка в схеме, соответствующей view"""
+    schema = FeedbackSummary if view == "summary" else Feedback
+    return [schema.model_validate(row) for row in rows]
 
 
 @router.get("/admin/dashboard", response_model=StatsResponse, summary="Дашборд администратора")
-async def get_admin_dashboard(
+def get_admin_dashboard(
     form_type: Optional[str] = Query(None, regex="^(tech|business|exec)$"),
+    view: str = Query("full", regex="^(full|summary)$"),
     db: Session = Depends(get_db)
 ):
     """
     Получить данные для дашборда администратора
     
     - **form_type**: Фильтр по типу формы (опционально)
+    - **view**: full (отзывы целиком) или summary (FeedbackSummary)
     
-    Возвращает полную статистику и последние отзывы
+    Возвращает полную статистику и последние отзывы. Статистика читается
+    из дневных агрегатов STATS_SOURCE (stats_views, источник и время
+    данных - в freshness) и кэшируется (STATS_CACHE_TTL, сбрасывается записью
+    отзывов), последние отзывы читаются на каждый запрос. Обработчик
+    синхронный: пересчет идет в пуле потоков, остальные запросы на это
+    время получают прежнюю статистику.
     """
-    stats = get_stats(db=db, form_type=form_type)
-    recent = get_recent_feedbacks(db=db, limit=10, form_type=form_type)
+    stats = stats_cache.cached(("api", form_type), lambda: stats_views.dashboard_stats(db, form_type))
+    recent = get_recent_feedbacks(db=db, limit=10, form_type=form_type, summary=view == "summary")
     
     return StatsResponse(
-        recent_feedbacks=recent,
-        **stats
+        recent_feedbacks=_list_items(recent, view),
+        **{**stats, "freshness": stats_views.freshness_report(stats["freshness"])}
     )
 
 
@@ -48,33 +74,158 @@ async def admin_list_feedbacks(
     status: Optional[str] = Query(None, regex="^(new|in_progress|resolved|rejected)$"),
     urgency: Optional[str] = Query(None, regex="^(high|medium|low|normal)$"),
     client_email: Optional[str] = Query(None),
+    pagination: str = Query("offset", regex="^(offset|keyset)$"),
+    cursor: Optional[str] = Query(None),
+    view: str = Query("full", regex="^(full|summary)$"),
+    form_field: List[str] = Query([]),
     db: Session = Depends(get_db)
 ):
     """
     Получить список отзывов для администрирования
     
     Поддерживает все фильтры для управления отзывами
+    
+    - **pagination**: offset (skip/limit, номер страницы) или keyset (курсоры)
+    - **cursor**: next_cursor/prev_cursor из предыдущего ответа (включает режим keyset)
+    - **view**: full (отзывы целиком) или summary (FeedbackSummary: колонки
+      таблицы, problem_text обрезан; без message и form_data)
+    - **form_field**: Условие на поле формы (form_data), можно несколько:
+      product=ADB, product=ADB|ADH, rating>=8, severity!=Low. Поля
+      проверяются по конфигурации форм (с учетом form_type)
+    
+    В режиме keyset глубина страницы не влияет на время ответа,
+    page и pages не возвращаются.
+    
+    total_exact=false: total - оценка (выборка больше COUNT_EXACT_LIMIT строк)
     """
+    try:
+        form_fields = form_data_conditions(db, form_field, form_type)
+    except InvalidFormFilterError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    total, total_exact = count_feedbacks(
+        db=db, form_type=form_type, status=status, urgency=urgency,
+        client_email=client_email, form_fields=form_fields
+    )
+    if pagination == "keyset" or cursor:
+        try:
+            feedbacks, next_cursor, prev_cursor = get_feedbacks_keyset(
+                db=db, cursor=cursor, limit=limit,
+                form_type=form_type, status=status, urgency=urgency,
+                client_email=client_email, summary=view == "summary", form_fields=form_fields
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        return FeedbackListResponse(
+            items=_list_items(feedbacks, view),
+            total=total,
+            total_exact=total_exact,
+            size=limit,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor
+        )
+    
     feedbacks = get_feedbacks(
         db=db, skip=skip, limit=limit,
         form_type=form_type, status=status, urgency=urgency,
-        client_email=client_email
-    )
-    total = get_feedbacks_count(
-        db=db, form_type=form_type, status=status, urgency=urgency
+        client_email=client_email, summary=view == "summary", form_fields=form_fields
     )
     
     pages = (total + limit - 1) // limit
     
     return FeedbackListResponse(
-        items=feedbacks,
+        items=_list_items(feedbacks, view),
         total=total,
+        total_exact=total_exact,
         page=skip // limit + 1,
         size=limit,
         pages=pages
     )
 
 
+@router.get("/admin/feedbacks/search", response_model=FeedbackSearchResponse, summary="Полнотекстовый поиск отзывов")
+async def admin_search_feedbacks(
+    q: str = Query(..., min_length=1, max_length=500),
+    sort: str = Query("rank", regex="^(rank|date)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    form_type: Optional[str] = Query(None, regex="^(tech|business|exec)$"),
+    status: Optional[str] = Query(None, regex="^(new|in_progress|resolved|rejected)$"),
+    urgency: Optional[str] = Query(None, regex="^(high|medium|low|normal)$"),
+    category: Optional[str] = Query(None),
+    client_email: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Найти отзывы по тексту (problem_text, message, имя клиента, категория)
+    
+    - **q**: Запрос: слова, "точная фраза", -исключить, or
+    - **sort**: rank (по релевантности) или date (сначала новые)
+    - **cursor**: next_cursor/prev_cursor из предыдущего ответа (с теми же q и sort)
+    
+    Фильтры комбинируются с поиском. snippet - фрагменты текста
+    с совпадениями в <mark>.
+    """
+    try:
+        hits, next_cursor, prev_cursor = search_feedbacks(
+            db=db, q=q, cursor=cursor, limit=limit, sort=sort,
+            form_type=form_type, status=status, urgency=urgency,
+            client_email=client_email, category=category
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    
+    return FeedbackSearchResponse(
+        items=[
+            FeedbackSearchHit(**Feedback.model_validate(feedback).model_dump(), rank=rank, snippet=snippet)
+            for feedback, rank, snippet in hits
+        ],
+        query=q,
+        size=limit,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor
+    )
+
+
+@router.get("/admin/clients/search", response_model=ClientSearchResponse, summary="Нечеткий поиск клиентов")
+async def admin_search_clients(
+    q: str = Query(..., min_length=2, max_length=255),
+    limit: int = Query(20, ge=1, le=100),
+    form_type: Optional[str] = Query(None, regex="^(tech|business|exec)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Найти клиентов по части имени или email, в том числе с опечатками
+    
+    - **q**: Имя, email или их часть
+    - **form_type**: Учитывать только отзывы этого типа формы
+    
+    Клиенты отсортированы по сходству (score), затем по числу отзывов.
+    """
+    matches = search_clients(db=db, q=q, limit=limit, form_type=form_type)
+    return ClientSearchResponse(items=[ClientMatch(**match) for match in matches], query=q)
+
+
+@router.get("/admin/clients/autocomplete", response_model=ClientAutocompleteResponse, summary="Автодополнение клиентов")
+async def admin_autocomplete_clients(
+    q: str = Query(..., min_length=2, max_length=255),
+    field: str = Query("email", regex="^(email|name)$"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Подсказки для поля ввода клиента
+    
+    - **q**: Введенная часть значения
+    - **field**: email или name
+    """
+    suggestions = autocomplete_clients(db=db, q=q, field=field, limit=limit)
+    return ClientAutocompleteResponse(
+        suggestions=[ClientSuggestion(**suggestion) for suggestion in suggestions],
+        query=q,
+        field=field
+    )
+
+
 @router.get("/admin/feedbacks/critical", response_model=List[Feedback], summary="Критические отзывы")
 async def get_critical_feedbacks(
     limit: int = Query(20, ge=1, le=100),
@@ -112,6 +263,29 @@ async def get_unassigned_feedbacks(
     return feedbacks
 
 
+@router.post("/admin/queue/claim", response_model=QueueClaimResponse, summary="Взять отзывы из очереди")
+def claim_from_queue(
+    assigned_to: str = Query(..., min_length=1, max_length=100),
+    n: int = Query(1, ge=1, le=100),
+    form_type: Optional[str] = Query(None, regex="^(tech|business|exec)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Взять в работу следующие n отзывов без ответственного
+    
+    - **assigned_to**: Email или имя ответственного
+    - **n**: Сколько отзывов взять
+    - **form_type**: Только отзывы этого типа формы (опционально)
+    
+    Очередь упорядочена по priority_score (сначала высокий, без приоритета -
+    в конце), затем по возрасту. Отзывы назначаются атомарно (статус
+    in_progress): параллельные запросы не получают один и тот же отзыв.
+    Обработчик синхронный: UPDATE идет в пуле потоков и не держит цикл событий.
+    """
+    claimed = claim_feedbacks(db=db, assigned_to=assigned_to, n=n, form_type=form_type)
+    return QueueClaimResponse(items=claimed, claimed=len(claimed), assigned_to=assigned_to)
+
+
 @router.post("/admin/feedbacks/{feedback_id}/assign", summary="Назначить ответственного")
 async def assign_feedback(
     feedback_id: int,
@@ -190,7 +364,11 @@ async def export_feedbacks(
     )
     
     if format == "json":
-        return {"feedbacks": [feedback.__dict__ for feedback in feedbacks]}
+        # Колонки напрямую в orjson: datetime/UUID/JSONB кодируются без jsonable_encoder
+        columns = [column.key for column in FeedbackModel.__table__.columns]
+        return ORJSONResponse({
+            "feedbacks": [{name: getattr(feedback, name) for name in columns} for feedback in feedbacks]
+        })
     
     # Для CSV возвращаем простой текст
     csv_lines = [
@@ -238,3 +416,73 @@ async def telegram_test():
         "ok": ok,
         "message": "Telegram connection successful" if ok else "Telegram connection failed"
     }
+
+
+@router.get("/admin/urgency-rules", summary="Активные правила срочности")
+async def urgency_rules_info():
+    """Версия и время компиляции активных правил определения срочности"""
+    rules = get_urgency_rules()
+    return {
+        **rules.metadata(),
+        "keywords_count": {level: len(keywords) for level, keywords in rules.keywords.items()}
+    }
+
+
+@router.post("/admin/urgency-rules/reload", summary="Перезагрузить правила срочности")
+async def urgency_rules_reload():
+    """
+    Перечитать файл правил и атомарно подменить активный набор
+    
+    Запросы, которые уже выполняются, дорабатывают на прежних правилах
+    """
+    try:
+        rules = reload_urgency_rules()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Ошибка в правилах срочности: {e}") from e
+    
+    return {"message": "Правила срочности перезагружены", **rules.metadata()}
+
+
+@router.get("/admin/reclassify", summary="Состояние пересчета классификации")
+async def reclassify_status():
+    """Прогресс и контрольная точка задачи пересчета urgency/category/tags/priority_score"""
+    status = get_job_status()
+    if status is None:
+        return {"status": "never_run"}
+    return status
+
+
+@router.post("/admin/reclassify", summary="Запустить пересчет классификации")
+async def reclassify_start(
+    batch_size: Optional[int] = Query(None, ge=10, le=10000),
+    workers: Optional[int] = Query(None, ge=1, le=32),
+    pause_ms: Optional[float] = Query(None, ge=0),
+    max_rows_per_sec: Optional[float] = Query(None, ge=0),
+    restart: bool = Query(False, description="Начать заново, игнорируя контрольную точку")
+):
+    """
+    Пересчитать классификацию сохраненных отзывов по текущим правилам
+    
+    Задача выполняется в фоне и продолжается с контрольной точки,
+    если прошлый запуск был остановлен с теми же правилами.
+    """
+    options = {
+        name: value for name, value in {
+            "batch_size": batch_size, "workers": workers,
+            "pause_ms": pause_ms, "max_rows_per_sec": max_rows_per_sec
+        }.items() if value is not None
+    }
+    try:
+        start_in_background(restart=restart, **options)
+    except JobAlreadyRunningError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    
+    return {"message": "Пересчет запущен"}
+
+
+@router.post("/admin/reclassify/stop", summary="Остановить пересчет классификации")
+async def reclassify_stop():
+    """Остановить задачу после текущей пачки (прогресс сохраняется)"""
+    if not request_stop():
+        raise HTTPException(status_code=409, detail="Пересчет не выполняется")
+    return {"message": "Пересчет будет остановлен после текущей пачки"}
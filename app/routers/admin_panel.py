@@ -5,26 +5,31 @@ Admin Panel router for Arenadata Feedback System
 Полноценная админ-панель с управлением отзывами, клиентами, аналитикой
 """
 
-from fastapi import APIRouter, Request, Depends, HTTPException, Form
+from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from typing import Optional
+from urllib.parse import urlencode
 import os
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 from app.database import get_db
 from app.crud import (
-    get_feedbacks, get_feedbacks_count, get_stats, get_recent_feedbacks,
-    get_form_configs, get_all_form_configs, update_feedback
+    count_feedbacks, get_feedbacks, get_feedbacks_keyset, get_stats, get_recent_feedbacks,
+    get_form_configs, get_all_form_configs, search_clients, series_bucket_count, series_buckets, update_feedback
 )
 from app.models import Feedback, FormConfig
+from app.services import stats_cache, stats_views
+from app.services.pagination import InvalidCursorError
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
 
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
+# Аналитика: сколько интервалов можно запросить в одном графике
+ANALYTICS_MAX_BUCKETS = int(os.getenv("ANALYTICS_MAX_BUCKETS", "1000"))
 
 def check_auth(request: Request):
     session = request.session
@@ -72,15 +77,17 @@ def get_stats(db: Session):
         "resolved_feedbacks": resolved_feedbacks
     }
 
-@router.get("/admin", response_class=HTMLResponse)
-async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
-    if not check_auth(request):
-        return RedirectResponse(url="/admin/login", status_code=302)
+def _dashboard_data(db: Session) -> dict:
+    """
+    Счетчики и данные графиков дашборда (кэшируются в stats_cache)
     
-    stats = get_stats(db=db)
-    recent_feedbacks = get_recent_feedbacks(db=db, limit=10)
+    Из дневных агрегатов STATS_SOURCE (stats_views.panel_data: rollups,
+    пока они не готовы - представления), иначе по feedbacks.
+    """
+    from_views = stats_views.panel_data(db)
+    if from_views is not None:
+        return from_views
     
-    # Получаем данные для графиков
     from sqlalchemy import func
     from datetime import datetime, timedelta
     
@@ -114,14 +121,30 @@ async def admin_dashboard(request: Request, db: Session = Depends(get_db)):
     # Сортируем данные по дням
     daily_sorted = sorted([{"date": str(d.date), "count": d.count} for d in daily_feedbacks], key=lambda x: x["date"])
     
-    return templates.TemplateResponse("admin/dashboard.html", {
-        "request": request,
-        "stats": stats,
-        "recent_feedbacks": recent_feedbacks,
+    return {
+        "stats": get_stats(db=db),
         "daily_feedbacks": daily_sorted,
         "urgency_data": [{"urgency": u.urgency or "unknown", "count": u.count} for u in urgency_data],
         "form_types": [{"type": f.form_type, "count": f.count} for f in form_types],
-        "status_data": [{"status": s.status or "unknown", "count": s.count} for s in status_data]
+        "status_data": [{"status": s.status or "unknown", "count": s.count} for s in status_data],
+        "freshness": stats_views.live_freshness()
+    }
+
+@router.get("/admin", response_class=HTMLResponse)
+def admin_dashboard(request: Request, db: Session = Depends(get_db)):
+    if not check_auth(request):
+        return RedirectResponse(url="/admin/login", status_code=302)
+    
+    # Синхронный обработчик: пересчет статистики идет в пуле потоков,
+    # остальные вкладки на это время получают прежние данные
+    dashboard = stats_cache.cached(("panel", None), lambda: _dashboard_data(db))
+    recent_feedbacks = get_recent_feedbacks(db=db, limit=10, summary=True)
+    
+    return templates.TemplateResponse("admin/dashboard.html", {
+        "request": request,
+        "recent_feedbacks": recent_feedbacks,
+        **dashboard,
+        "freshness": stats_views.freshness_report(dashboard["freshness"])
     })
 
 @router.get("/admin/clients", response_class=HTMLResponse)
@@ -130,11 +153,26 @@ async def admin_clients(
     skip: int = 0,
     limit: int = 100,
     client_type: Optional[str] = None,
+    q: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     if not check_auth(request):
         return RedirectResponse(url="/admin/login", status_code=302)
     
+    q = (q or "").strip()
+    if q:
+        # Нечеткий поиск по имени и email (trigram-индексы)
+        clients = [
+            {**match, "id": number, "company_name": match["client_name"] or "Не указано", "is_active": True}
+            for number, match in enumerate(search_clients(db=db, q=q, limit=limit, form_type=client_type), start=1)
+        ]
+        return templates.TemplateResponse("admin/clients.html", {
+            "request": request,
+            "clients": clients,
+            "total": len(clients),
+            "filters": {"client_type": client_type, "q": q}
+        })
+    
     # Возвращаем список клиентов из отзывов с фильтрацией
     feedbacks = get_feedbacks(db=db, skip=skip, limit=limit, form_type=client_type)
     
@@ -165,7 +203,8 @@ async def admin_clients(
         "clients": clients,
         "total": len(clients),
         "filters": {
-            "client_type": client_type
+            "client_type": client_type,
+            "q": None
         }
     })
 
@@ -178,95 +217,120 @@ async def admin_analytics(request: Request, db: Session = Depends(get_db)):
         "request": request
     })
 
+ANALYTICS_PERIOD_DAYS = {"week": 7, "month": 30, "year": 365}
+# Допустимые start/end графиков аналитики
+ANALYTICS_MIN_DATE = date(1970, 1, 1)
+ANALYTICS_MAX_DATE = date(2099, 12, 31)
+
 @router.get("/api/admin/analytics/data")
-async def get_analytics_data(
-    period: str = "week",
+def get_analytics_data(
+    request: Request,
+    period: str = Query("week", regex="^(week|month|year)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: str = Query("day", regex="^(day|week|month)$"),
     db: Session = Depends(get_db)
 ):
-    from datetime import datetime, timedelta
-    from sqlalchemy import func
-    
-    # Определяем период
-    if period == "week":
-        start_date = datetime.utcnow() - timedelta(days=7)
-    elif period == "month":
-        start_date = datetime.utcnow() - timedelta(days=30)
-    else:  # year
-        start_date = datetime.utcnow() - timedelta(days=365)
-    
-    print(f"Period: {period}, Start date: {start_date}")  # Отладка
-    
-    # Динамика отзывов по дням
-    daily_data = db.query(
-        func.date(Feedback.created_at).label('date'),
-        func.count(Feedback.id).label('count')
-    ).filter(
-        Feedback.created_at >= start_date
-    ).group_by(
-        func.date(Feedback.created_at)
-    ).order_by('date').all()
+    """
+    Динамика отзывов для графиков аналитики
+    
+    Диапазон - start..end (даты включительно) или последние дни period,
+    заканчивая сегодняшним. Отзывы считаются по интервалам bucket одним
+    запросом к дневным агрегатам STATS_SOURCE (stats_views.feedback_series)
+    или, если их нет, к feedbacks; интервалы без отзывов - нули.
+    Результат кэшируется вместе со статистикой дашбордов (stats_cache),
+    время данных - в freshness.
+    """
+    if not check_auth(request):
+        raise HTTPException(status_code=401, detail="Требуется вход в админку")
     
-    # Формируем данные для графика
-    labels = []
-    total_counts = []
-    high_counts = []
+    end = end or datetime.utcnow().date()
+    if not ANALYTICS_MIN_DATE <= end <= ANALYTICS_MAX_DATE:
+        raise HTTPException(
+            status_code=400, detail=f"end вне диапазона {ANALYTICS_MIN_DATE}..{ANALYTICS_MAX_DATE}"
+        )
+    start = start or end - timedelta(days=ANALYTICS_PERIOD_DAYS[period] - 1)
+    if not ANALYTICS_MIN_DATE <= start <= ANALYTICS_MAX_DATE:
+        raise HTTPException(
+            status_code=400, detail=f"start вне диапазона {ANALYTICS_MIN_DATE}..{ANALYTICS_MAX_DATE}"
+        )
+    if start > end:
+        raise HTTPException(status_code=400, detail="start позже end")
+    # Число интервалов считается до построения списка дат
+    if series_bucket_count(start, end, bucket) > ANALYTICS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Не больше {ANALYTICS_MAX_BUCKETS} интервалов, выберите интервал крупнее"
+        )
+    buckets = series_buckets(start, end, bucket)
     
-    for date, count in daily_data:
-        labels.append(date.strftime('%d.%m'))
-        total_counts.append(count)
-        
-        # Считаем высокие за этот день
-        high_count = db.query(Feedback).filter(
-            func.date(Feedback.created_at) == date,
-            Feedback.urgency == 'high'
-        ).count()
-        high_counts.append(high_count)
-    
-    # Распределение по типам форм
-    form_types = db.query(
-        Feedback.form_type,
-        func.count(Feedback.id).label('count')
-    ).filter(
-        Feedback.created_at >= start_date
-    ).group_by(Feedback.form_type).all()
+    series = stats_cache.cached(
+        ("analytics", start, end, bucket), lambda: stats_views.feedback_series(db, start, end, bucket)
+    )
     
-    form_type_data = {'tech': 0, 'business': 0, 'exec': 0}
-    for form_type, count in form_types:
-        if form_type in form_type_data:
-            form_type_data[form_type] = count
+    # Месяц подписывается месяцем и годом, день и неделя (по понедельнику) - днем;
+    # год добавляется, если диапазон захватывает несколько лет
+    if bucket == "month":
+        label_format = '%m.%Y'
+    elif buckets[0].year != buckets[-1].year:
+        label_format = '%d.%m.%Y'
+    else:
+        label_format = '%d.%m'
     
     return {
-        "labels": labels,
-        "total": total_counts,
-        "critical": high_counts,
-        "form_types": form_type_data
+        "labels": [b.strftime(label_format) for b in series["buckets"]],
+        "buckets": [b.isoformat() for b in series["buckets"]],
+        "bucket": bucket,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "total": series["total"],
+        "critical": series["critical"],
+        "form_types": series["form_types"],
+        "freshness": stats_views.freshness_report(series["freshness"])
     }
 
 @router.get("/admin/feedbacks", response_class=HTMLResponse)
 async def admin_feedbacks(
     request: Request,
-    skip: int = 0,
+    skip: Optional[int] = None,
     limit: int = 50,
     form_type: Optional[str] = None,
     status: Optional[str] = None,
     urgency: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     if not check_auth(request):
         return RedirectResponse(url="/admin/login", status_code=302)
     
-    feedbacks = get_feedbacks(
-        db=db, skip=skip, limit=limit,
-        form_type=form_type, status=status, urgency=urgency
-    )
-    total = get_feedbacks_count(
-        db=db, form_type=form_type, status=status, urgency=urgency
-    )
+    filters = {"form_type": form_type, "status": status, "urgency": urgency}
+    next_url = prev_url = None
+    if skip is not None:
+        # Старые ссылки со skip открываются как раньше
+        feedbacks = get_feedbacks(db=db, skip=skip, limit=limit, summary=True, **filters)
+    else:
+        try:
+            feedbacks, next_cursor, prev_cursor = get_feedbacks_keyset(
+                db=db, cursor=cursor, limit=limit, summary=True, **filters
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        params = {name: value for name, value in filters.items() if value}
+        if limit != 50:
+            params["limit"] = limit
+        if next_cursor:
+            next_url = "/admin/feedbacks?" + urlencode({**params, "cursor": next_cursor})
+        if prev_cursor:
+            prev_url = "/admin/feedbacks?" + urlencode({**params, "cursor": prev_cursor})
+    total, total_exact = count_feedbacks(db=db, **filters)
     
     return templates.TemplateResponse("admin/feedbacks.html", {
         "request": request,
         "feedbacks": feedbacks,
         "total": total,
+        "total_exact": total_exact,
+        "next_url": next_url,
+        "prev_url": prev_url,
         "filters": {
             "form_type": form_type,
             "status": status,
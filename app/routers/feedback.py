@@ -1,23 +1,58 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, Request
-from sqlalchemy.orm import Session
-from app.database import get_db
+from typing import Optional
+from fastapi import APIRouter, Depends, BackgroundTasks, Request, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import Feedback as FeedbackModel
-from app.crud import create_feedback
-from app.schemas import FeedbackCreate
+from app.crud import create_feedback_async
+from app.schemas import Feedback, FeedbackCreate
+from app.services import idempotency
+from app.services.idempotency import IdempotencyKeyError, IdempotencyKeyMismatchError
+from app.services.form_filters import submitted_form_data
+from app.services.json_body import BodyTooLargeError, LimitedJSONRoute, read_json
+from app.services.offload import MessageTooLargeError, check_message_size
 from app.services.telegram import send_critical_notification
 
-router = APIRouter()
+router = APIRouter(route_class=LimitedJSONRoute)
 
 @router.post("/feedback", summary="Создать отзыв")
 async def create_feedback_endpoint(
     request: Request,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, alias=idempotency.IDEMPOTENCY_HEADER)
 ):
     try:
-        import json
-        body = await request.body()
-        feedback_data = json.loads(body.decode("utf-8"))
+        try:
+            feedback_data = await read_json(request)
+        except BodyTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e)) from e
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Некорректный JSON: {e}") from e
+        try:
+            check_message_size(feedback_data.get("message"))
+            check_message_size(feedback_data.get("problem_text"))
+        except MessageTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e)) from e
+        
+        # Повтор с тем же Idempotency-Key: исходный ответ без вставки и уведомления
+        endpoint = "POST /api/feedback"
+        key = fingerprint = None
+        if idempotency_key is not None:
+            try:
+                key = idempotency.validate_key(idempotency_key)
+                fingerprint = idempotency.request_fingerprint(feedback_data)
+                stored = (idempotency.cached_response(key, endpoint, fingerprint)
+                          or await idempotency.stored_response(db, key, endpoint, fingerprint))
+            except IdempotencyKeyMismatchError as e:
+                raise HTTPException(status_code=422, detail=str(e)) from e
+            except IdempotencyKeyError as e:
+                raise HTTPException(status_code=400, detail=str(e)) from e
+            if stored is not None:
+                return idempotency.replay_response(stored)
+        
+        # Ответы на поля формы приходят на верхнем уровне: без колонки в feedbacks - в form_data
+        feedback_data["form_data"] = submitted_form_data(feedback_data, feedback_data.get("form_data"))
         
         message_text = feedback_data.get("message", "").lower()
         if any(word in message_text for word in ["срочно", "критический", "не работает", "сломалось", "авария", "проблема", "ошибка"]):
@@ -25,7 +60,13 @@ async def create_feedback_endpoint(
         else:
             feedback_data["urgency"] = "high"
         
-        db_feedback = create_feedback(db=db, feedback=FeedbackCreate(**feedback_data))
+        if key:
+            response = await _create_with_key(db, feedback_data, key, endpoint, fingerprint)
+            if not isinstance(response, FeedbackModel):
+                return response
+            db_feedback = response
+        else:
+            db_feedback = await create_feedback_async(db=db, feedback=FeedbackCreate(**feedback_data))
         
         if db_feedback.urgency == "high":
             background_tasks.add_task(send_critical_notification, db_feedback)
@@ -34,3 +75,21 @@ async def create_feedback_endpoint(
     except Exception as e:
         print(f"Error: {e}")
         raise e
+
+
+async def _create_with_key(db: AsyncSession, feedback_data: dict, key: str, endpoint: str, fingerprint: str):
+    """Вставка отзыва и сохранение ответа под Idempotency-Key одной транзакцией"""
+    db_feedback = FeedbackModel(**FeedbackCreate(**feedback_data).dict())
+    db.add(db_feedback)
+    await db.flush()
+    await db.refresh(db_feedback)
+    
+    body = jsonable_encoder(Feedback.model_validate(db_feedback))
+    if not await idempotency.remember(db, key, endpoint, fingerprint, 200, body):
+        # Параллельный повтор успел первым
+        await db.rollback()
+        return idempotency.replay_response(await idempotency.stored_response(db, key, endpoint, fingerprint))
+    
+    await db.commit()
+    idempotency.remember_local(key, endpoint, fingerprint, 200, body)
+    return db_feedback
@@ -11,8 +11,9 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.crud import get_form_configs, create_form_config, update_form_config
 from app.schemas import FormConfig, FormConfigCreate, FormConfigUpdate, FormResponse
+from app.services.json_body import LimitedJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=LimitedJSONRoute)
 
 
 @router.get("/forms/{form_type}", response_model=FormResponse, summary="Получить конфигурацию формы")
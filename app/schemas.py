@@ -4,7 +4,7 @@ Pydantic schemas for Arenadata Feedback System
 """
 
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Annotated, Optional, List, Dict, Any, Union
 from uuid import UUID
 import json
 from pydantic import BaseModel, EmailStr, Field, validator
@@ -79,6 +79,15 @@ class FeedbackCreate(FeedbackBase):
     """Схема для создания отзыва"""
 
 
+class FeedbackBulkItem(FeedbackBase):
+    """Схема строки массовой загрузки отзывов (миграция из других систем)"""
+    message: Optional[str] = None
+    status: str = Field(default="new", pattern="^(new|in_progress|resolved|rejected)$")
+    assigned_to: Optional[str] = None
+    created_at: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+
+
 class FeedbackUpdate(BaseSchema):
     """Схема для обновления отзыва"""
     status: Optional[str] = Field(default=None, pattern="^(new|in_progress|resolved|rejected)$")
@@ -171,13 +180,96 @@ class Analytics(AnalyticsBase):
 
 
 # Response schemas
+class FeedbackSummary(BaseSchema):
+    """Облегченная строка списка отзывов: колонки таблицы админки, текст обрезан"""
+    id: int
+    uuid: UUID
+    form_type: str
+    client_name: Optional[str] = None
+    client_email: Optional[str] = None
+    problem_text: Optional[str] = None  # Первые SUMMARY_TEXT_CHARS символов
+    urgency: str
+    category: Optional[str] = None
+    status: str
+    priority_score: int
+    assigned_to: Optional[str] = None
+    created_at: datetime
+
+
+# view=full - Feedback, view=summary - FeedbackSummary; проверяются по порядку,
+# чтобы полный отзыв не сводился к FeedbackSummary
+FeedbackListItem = Annotated[Union[Feedback, FeedbackSummary], Field(union_mode="left_to_right")]
+
+
 class FeedbackListResponse(BaseSchema):
     """Схема ответа для списка отзывов"""
-    items: List[Feedback]
+    items: List[FeedbackListItem]
     total: int
-    page: int
+    total_exact: bool = True  # False - total оценен по плану запроса
+    page: Optional[int] = None  # None в режиме курсоров
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class FeedbackSearchHit(Feedback):
+    """Найденный отзыв с релевантностью и фрагментом текста"""
+    rank: float
+    snippet: Optional[str] = None  # Совпадения в <mark>...</mark>, остальной текст не экранирован
+
+
+class FeedbackSearchResponse(BaseSchema):
+    """Схема ответа полнотекстового поиска"""
+    items: List[FeedbackSearchHit]
+    query: str
+    size: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class QueueClaimResponse(BaseSchema):
+    """Схема ответа взятия отзывов из очереди"""
+    items: List[Feedback]
+    claimed: int  # Меньше запрошенного n, если очередь короче
+    assigned_to: str
+
+
+class ClientMatch(BaseSchema):
+    """Клиент, найденный нечетким поиском (агрегат по отзывам с одним email)"""
+    client_email: Optional[str] = None
+    client_name: Optional[str] = None
+    client_type: Optional[str] = None
+    total_feedbacks: int
+    last_feedback_at: Optional[datetime] = None
+    score: float  # word_similarity запроса с именем или email, 0..1
+
+
+class ClientSearchResponse(BaseSchema):
+    """Схема ответа поиска клиентов"""
+    items: List[ClientMatch]
+    query: str
+
+
+class ClientSuggestion(BaseSchema):
+    """Подсказка автодополнения"""
+    value: str
+    score: float
+
+
+class ClientAutocompleteResponse(BaseSchema):
+    """Схема ответа автодополнения клиентов"""
+    suggestions: List[ClientSuggestion]
+    query: str
+    field: str
+
+
+class DataFreshness(BaseSchema):
+    """На какой момент посчитана статистика"""
+    source: str  # 'rollups' - агрегаты analytics, 'views' - материализованные представления, 'feedbacks' - по таблице
+    as_of: Optional[datetime] = None  # None - представления еще не обновлялись планировщиком
+    age_seconds: Optional[float] = None
+    pending: Optional[str] = None  # Источник STATS_SOURCE, который еще не готов (его заменяет source)
 
 
 class StatsResponse(BaseSchema):
@@ -189,8 +281,9 @@ class StatsResponse(BaseSchema):
     satisfaction_avg: float
     feedbacks_by_type: Dict[str, int]
     feedbacks_by_status: Dict[str, int]
-    recent_feedbacks: List[Feedback]
+    recent_feedbacks: List[FeedbackListItem]
     recent_feedbacks_by_day: List[int]
+    freshness: Optional[DataFreshness] = None
 
 
 class FormResponse(BaseSchema):
@@ -200,6 +293,14 @@ class FormResponse(BaseSchema):
     fields: List[FormConfig]
 
 
+# Batch analysis schemas
+class UrgencyBatchRequest(BaseModel):
+    """Схема пакетного анализа срочности"""
+    texts: List[str] = Field(..., min_length=1, max_length=10000)
+    mode: str = Field(default="urgency", pattern="^(urgency|classify)$")
+    form_type: str = Field(default="tech", pattern="^(tech|business|exec)$")
+
+
 # Валидаторы
 @validator('tags', pre=True)
 def validate_tags(_, v):
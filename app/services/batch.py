@@ -0,0 +1,182 @@
+"""
+Batch Classification Service for Arenadata Feedback System
+Пакетный анализ срочности и классификация с выносом в пул процессов
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from app.schemas import FeedbackCreate
+from app.services.classifier import classifier, classify_feedback
+from app.services.urgency import analyze_urgency, get_urgency_rules, reload_urgency_rules
+
+# Размер чанка, порог выноса в пул процессов и число процессов
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+BATCH_POOL_THRESHOLD = int(os.getenv("BATCH_POOL_THRESHOLD", "1000"))
+BATCH_POOL_WORKERS = int(os.getenv("BATCH_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Пул процессов создается при первом большом пакете"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=BATCH_POOL_WORKERS)
+    return _pool
+
+
+def shutdown_pool():
+    """Остановить пул процессов (при остановке приложения)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def classify_chunk(texts: List[str], mode: str, form_type: str,
+                   rules_path: Optional[str] = None, rules_version: Optional[str] = None) -> List[dict]:
+    """
+    Обработать чанк текстов (выполняется в том числе в дочерних процессах)
+
+    Args:
+        texts: Тексты
+        mode: 'urgency' (analyze_urgency) или 'classify' (classify_feedback)
+        form_type: Тип формы для classify_feedback
+        rules_path: Файл правил срочности родительского процесса
+        rules_version: Версия правил родительского процесса
+
+    Returns:
+        Результаты в порядке текстов
+    """
+    if mode == "classify":
+        return [
+            classify_feedback(FeedbackCreate(form_type=form_type, problem_text=text))
+            for text in texts
+        ]
+
+    rules = sync_rules(rules_path, rules_version)
+    return [analyze_urgency(text, rules) for text in texts]
+
+
+def enrich_chunk(rows: List[Tuple[str, str]], rules_path: Optional[str] = None,
+                 rules_version: Optional[str] = None) -> List[dict]:
+    """
+    Полная автоклассификация отзывов: срочность, категория, теги, приоритет
+
+    Args:
+        rows: Пары (текст, тип формы)
+
+    Returns:
+        Значения полей отзыва в порядке строк
+    """
+    rules = sync_rules(rules_path, rules_version)
+    results = []
+    for text, form_type in rows:
+        analysis = analyze_urgency(text, rules)
+        classification = classify_feedback(FeedbackCreate(form_type=form_type, problem_text=text))
+        results.append({
+            'urgency': analysis['urgency'],
+            'urgency_confidence': analysis['confidence'],
+            'urgency_reason': analysis['reason'],
+            'category': classification['category'],
+            'tags': classification['tags'],
+            'priority_score': classifier.calculate_priority_score(
+                analysis['urgency'], classification['category'], form_type
+            )
+        })
+    return results
+
+
+def sync_rules(rules_path: Optional[str], rules_version: Optional[str]):
+    """
+    Правила срочности версии rules_version в дочернем процессе пула
+
+    Дочерний процесс мог остаться на старой версии правил: тогда они
+    перечитываются из rules_path.
+    """
+    rules = get_urgency_rules()
+    if rules_version is not None and rules.version != rules_version:
+        rules = reload_urgency_rules(rules_path)
+    return rules
+
+
+def _chunks(items: list) -> List[list]:
+    return [items[i:i + BATCH_CHUNK_SIZE] for i in range(0, len(items), BATCH_CHUNK_SIZE)]
+
+
+def _submit(func: Callable, items: list, *args) -> List[asyncio.Future]:
+    """Отправить чанки в пул процессов, порядок futures совпадает с порядком чанков"""
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    return [loop.run_in_executor(pool, func, chunk, *args) for chunk in _chunks(items)]
+
+
+def _rules_args() -> tuple:
+    rules = get_urgency_rules()
+    return rules.path, rules.version
+
+
+async def classify_batch(texts: List[str], mode: str = "urgency", form_type: str = "tech") -> List[dict]:
+    """
+    Классифицировать пакет текстов
+
+    Небольшие пакеты обрабатываются на месте, большие — чанками
+    в пуле процессов, не блокируя event loop.
+
+    Returns:
+        Результаты в порядке исходных текстов
+    """
+    if len(texts) < BATCH_POOL_THRESHOLD:
+        return classify_chunk(texts, mode, form_type)
+
+    futures = _submit(classify_chunk, texts, mode, form_type, *_rules_args())
+    results: List[dict] = []
+    for chunk_results in await asyncio.gather(*futures):
+        results.extend(chunk_results)
+    return results
+
+
+async def enrich_batch(rows: List[Tuple[str, str]]) -> List[dict]:
+    """
+    Автоклассификация пакета отзывов (см. enrich_chunk)
+
+    Returns:
+        Значения полей в порядке исходных строк
+    """
+    if len(rows) < BATCH_POOL_THRESHOLD:
+        return enrich_chunk(rows)
+
+    futures = _submit(enrich_chunk, rows, *_rules_args())
+    results: List[dict] = []
+    for chunk_results in await asyncio.gather(*futures):
+        results.extend(chunk_results)
+    return results
+
+
+async def iter_classify_batch(texts: List[str], mode: str = "urgency",
+                              form_type: str = "tech") -> AsyncIterator[dict]:
+    """
+    Классифицировать пакет с выдачей результатов по мере готовности чанков
+
+    Чанки считаются параллельно, но отдаются строго по порядку.
+    """
+    if len(texts) < BATCH_POOL_THRESHOLD:
+        for chunk in _chunks(texts):
+            for result in classify_chunk(chunk, mode, form_type):
+                yield result
+            # Отдаем управление event loop между чанками
+            await asyncio.sleep(0)
+        return
+
+    futures = _submit(classify_chunk, texts, mode, form_type, *_rules_args())
+    try:
+        for future in futures:
+            for result in await future:
+                yield result
+    finally:
+        # Клиент отключился — не считаем оставшиеся чанки
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,157 @@
+"""
+Bulk Feedback Ingestion Service for Arenadata Feedback System
+Массовая загрузка отзывов (JSON массив или NDJSON) с пакетной вставкой
+"""
+
+import os
+import re
+import uuid
+from typing import Any, Dict, List, Tuple
+
+import orjson
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from app.crud import bulk_create_feedbacks
+from app.database import SessionLocal
+from app.schemas import FeedbackBulkItem
+from app.services.batch import enrich_batch
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "100000"))
+BULK_INSERT_BATCH = int(os.getenv("BULK_INSERT_BATCH", "1000"))
+
+# Колонки feedbacks, которые заполняются при массовой загрузке
+_COLUMNS = [
+    "uuid", "form_type", "client_id", "client_name", "client_email", "client_role",
+    "problem_text", "message", "urgency", "urgency_confidence", "urgency_reason",
+    "category", "tags", "status", "assigned_to", "priority_score", "form_data",
+    "created_at", "resolved_at"
+]
+
+_JSON_ARRAY_RE = re.compile(rb"\s*\[")
+
+
+def parse_bulk_body(body: bytes, content_type: str = "") -> List[Tuple[int, Any]]:
+    """
+    Разобрать тело запроса: JSON массив или NDJSON (одна запись на строку)
+
+    Returns:
+        Пары (номер записи, объект или исключение разбора)
+
+    Raises:
+        ValueError: Тело не является ни JSON массивом, ни NDJSON
+    """
+    # Без lstrip(): не копируем тело целиком ради первого символа
+    if "ndjson" not in content_type and _JSON_ARRAY_RE.match(body):
+        records = orjson.loads(body)
+        if not isinstance(records, list):
+            raise ValueError("Ожидается JSON массив")
+        return list(enumerate(records))
+
+    # NDJSON: ошибка в одной строке не мешает остальным
+    parsed = []
+    lines = [line for line in body.splitlines() if line.strip()]
+    for index, line in enumerate(lines):
+        try:
+            parsed.append((index, orjson.loads(line)))
+        except ValueError as e:
+            parsed.append((index, e))
+    if not parsed:
+        raise ValueError("Нет записей для загрузки")
+    return parsed
+
+
+def _validate(records: List[Tuple[int, Any]]) -> Tuple[List[Tuple[int, FeedbackBulkItem]], List[Dict[str, Any]]]:
+    """Проверить записи по схеме, ошибки собираются по номерам записей"""
+    valid, errors = [], []
+    for index, record in records:
+        if isinstance(record, Exception):
+            errors.append({"index": index, "error": f"Некорректный JSON: {record}"})
+            continue
+        if not isinstance(record, dict):
+            errors.append({"index": index, "error": "Запись должна быть JSON объектом"})
+            continue
+        try:
+            valid.append((index, FeedbackBulkItem(**record)))
+        except ValidationError as e:
+            errors.append({
+                "index": index,
+                "error": "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            })
+    return valid, errors
+
+
+def _build_row(item: FeedbackBulkItem, classification: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка для INSERT: данные клиента + результаты автоклассификации"""
+    tags = list(dict.fromkeys((item.tags or []) + classification["tags"]))
+    row = item.model_dump()
+    row.update({
+        "uuid": uuid.uuid4(),
+        "urgency": classification["urgency"],
+        "urgency_confidence": classification["urgency_confidence"],
+        "urgency_reason": classification["urgency_reason"],
+        "category": item.category or classification["category"],
+        "tags": tags or None,
+        "priority_score": classification["priority_score"]
+    })
+    if row["created_at"] is None:
+        # Одинаковый набор ключей во всех строках нужен для многострочного INSERT
+        row.pop("created_at")
+    return {column: row[column] for column in _COLUMNS if column in row}
+
+
+def _insert(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Вставка пакетами по BULK_INSERT_BATCH строк (выполняется в пуле потоков)"""
+    db = SessionLocal()
+    try:
+        results = []
+        for start in range(0, len(rows), BULK_INSERT_BATCH):
+            batch = rows[start:start + BULK_INSERT_BATCH]
+            # Строки с created_at и без него вставляются отдельными пакетами
+            with_date = [i for i, row in enumerate(batch) if "created_at" in row]
+            without_date = [i for i, row in enumerate(batch) if "created_at" not in row]
+            batch_results: List[Dict[str, Any]] = [{} for _ in batch]
+            for positions in (with_date, without_date):
+                inserted = bulk_create_feedbacks(db, [batch[i] for i in positions])
+                for position, result in zip(positions, inserted):
+                    batch_results[position] = result
+            results.extend(batch_results)
+        return results
+    finally:
+        db.close()
+
+
+async def ingest_feedbacks(records: List[Tuple[int, Any]]) -> Dict[str, Any]:
+    """
+    Проверить, классифицировать и сохранить записи
+
+    Ошибки отдельных записей не прерывают загрузку остальных.
+
+    Returns:
+        Сводка: сколько принято/вставлено, id и uuid созданных отзывов, ошибки
+    """
+    if len(records) > BULK_MAX_ROWS:
+        raise ValueError(f"Слишком много записей: {len(records)} (максимум {BULK_MAX_ROWS})")
+
+    valid, errors = _validate(records)
+
+    classifications = await enrich_batch([
+        (item.message or item.problem_text or "", item.form_type) for _, item in valid
+    ])
+    rows = [_build_row(item, classification) for (_, item), classification in zip(valid, classifications)]
+
+    inserted = []
+    for (index, _), result in zip(valid, await run_in_threadpool(_insert, rows)):
+        if "error" in result:
+            errors.append({"index": index, "error": result["error"]})
+        else:
+            inserted.append({"index": index, **result})
+
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "received": len(records),
+        "inserted": len(inserted),
+        "failed": len(errors),
+        "items": inserted,
+        "errors": errors
+    }
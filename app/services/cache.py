@@ -0,0 +1,210 @@
+"""
+In-memory cache for Arenadata Feedback System
+Ограниченный LRU-кэш с TTL и счетчиками попаданий, кэш вычислений с пересчетом в одном потоке
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Set
+
+
+def text_digest(text: str) -> bytes:
+    """Короткий хэш текста для ключа кэша (сам текст в кэше не хранится)"""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class TTLCache:
+    """
+    LRU-кэш с ограничением размера и временем жизни записей
+
+    Потокобезопасен: используется из event loop и из пула потоков FastAPI.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Получить значение или None (промах или истекший TTL)"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохранить значение, при переполнении вытесняется самая старая запись"""
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Очистить кэш (счетчики сохраняются)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для /metrics"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / requests, 4) if requests else 0.0
+            }
+
+
+class _Entry(NamedTuple):
+    value: Any
+    expires_at: float
+    generation: int
+
+
+class SingleFlightCache:
+    """
+    Кэш дорогих вычислений с TTL, сбросом и пересчетом в одном потоке
+
+    Значение устаревает по TTL или после invalidate(). Устаревшее значение
+    пересчитывает только первый запрос по ключу, остальные на это время
+    получают прежнее значение; если значения еще нет - ждут результат
+    первого. Результат, посчитанный во время сброса, сохраняется уже
+    устаревшим: следующий запрос посчитает заново.
+    """
+
+    def __init__(self, ttl: float = 15.0, maxsize: int = 1000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, _Entry] = {}
+        self._computing: Set[Hashable] = set()
+        self._lock = threading.Lock()
+        self._computed = threading.Condition(self._lock)
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.errors = 0
+        self.compute_count = 0
+        self.compute_total_ms = 0.0
+        self.compute_max_ms = 0.0
+        self.compute_last_ms = 0.0
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Значение по ключу; compute() вызывается, если его нужно пересчитать"""
+        if self.ttl <= 0:
+            return compute()
+
+        with self._lock:
+            while True:
+                entry = self._data.get(key)
+                if entry is not None and entry.generation == self._generation and entry.expires_at > time.monotonic():
+                    self.hits += 1
+                    return entry.value
+                if key not in self._computing:
+                    break
+                if entry is not None:
+                    self.stale_hits += 1
+                    return entry.value
+                # Значения нет, его уже считают: ждем; если пересчет упал - считаем сами
+                self.waits += 1
+                self._computed.wait()
+                entry = self._data.get(key)
+                if entry is not None and key not in self._computing:
+                    self.hits += 1
+                    return entry.value
+            self._computing.add(key)
+            self.misses += 1
+            generation = self._generation
+
+        start = time.perf_counter()
+        try:
+            value = compute()
+        except BaseException:
+            with self._lock:
+                self.errors += 1
+                self._computing.discard(key)
+                self._computed.notify_all()
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = _Entry(value, time.monotonic() + self.ttl, generation)
+            while len(self._data) > self.maxsize:
+                # Вытесняется самое давно посчитанное значение
+                del self._data[next(iter(self._data))]
+                self.evictions += 1
+            self._computing.discard(key)
+            self.compute_count += 1
+            self.compute_total_ms += elapsed_ms
+            self.compute_max_ms = max(self.compute_max_ms, elapsed_ms)
+            self.compute_last_ms = elapsed_ms
+            self._computed.notify_all()
+        return value
+
+    def invalidate(self) -> None:
+        """Пометить все значения устаревшими (они еще отдаются на время пересчета)"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Удалить значения (счетчики сохраняются)"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для /metrics"""
+        with self._lock:
+            requests = self.hits + self.stale_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "hit_ratio": round((self.hits + self.stale_hits) / requests, 4) if requests else 0.0,
+                "recompute": {
+                    "count": self.compute_count,
+                    "avg_ms": round(self.compute_total_ms / self.compute_count, 2) if self.compute_count else 0.0,
+                    "max_ms": round(self.compute_max_ms, 2),
+                    "last_ms": round(self.compute_last_ms, 2)
+                }
+            }
@@ -3,15 +3,25 @@ Feedback Classification Service for Arenadata Feedback System
 Автоматическая классификация отзывов по срочности и категории
 """
 
+import os
 import re
 from typing import Dict, Any, Optional
 from app.schemas import FeedbackCreate
+from app.services.cache import TTLCache, text_digest
+from app.services.keyword_matcher import make_matcher
 
 
 class FeedbackClassifier:
     """Классификатор отзывов на основе правил"""
     
-    def __init__(self):
+    # Меняется при любой правке ключевых слов (входит в ключ кэша результатов)
+    rules_version = "2024.1"
+    
+    def __init__(self, match_mode: Optional[str] = None):
+        """
+        Args:
+            match_mode: 'compat' или 'token' (по умолчанию CLASSIFIER_MATCH_MODE)
+        """
         # Ключевые слова для определения срочности
         self.urgency_keywords = {
 'high': [
@@ -169,6 +179,40 @@ class FeedbackClassifier:
             ],
             'other': []
         }
+        
+        # Упоминания продуктов/технологий для тегов
+        self.tech_keywords = [
+            'postgresql', 'mysql', 'redis', 'docker', 'kubernetes',
+            'python', 'javascript', 'react', 'vue', 'angular',
+            'api', 'rest', 'graphql', 'websocket', 'microservice'
+        ]
+        
+        # Единый поисковик: срочность, категории и теги ищутся за один проход
+        # (подстроки или основы токенов, см. CLASSIFIER_MATCH_MODE)
+        # Порядок групп задает приоритет: high > medium > low, категории по порядку объявления
+        self._urgency_groups = {('urgency', level) for level in ('high', 'medium', 'low')}
+        self._category_groups = {
+            ('category', category) for category in self.category_keywords if category != 'other'
+        }
+        self._matcher = make_matcher({
+            **{('urgency', level): self.urgency_keywords[level] for level in ('high', 'medium', 'low')},
+            **{('category', category): keywords for category, keywords in self.category_keywords.items()},
+            ('tag', 'tech'): self.tech_keywords
+        }, match_mode)
+    
+    def find_keywords(self, text: str) -> set:
+        """
+        Найти все ключевые слова классификатора в тексте
+        
+        Args:
+            text: Текст отзыва
+            
+        Returns:
+            Множество найденных ключевых слов
+        """
+        if not text:
+            return set()
+        return self._matcher.find(text.lower())
     
     def classify_urgency(self, text: str, form_type: str) -> str:
         """
@@ -184,22 +228,13 @@ class FeedbackClassifier:
         if not text:
             return 'normal'
         
-        text_lower = text.lower()
-        
-        # Проверка высокой срочности (включая бывшие critical слова)
-        for keyword in self.urgency_keywords['high']:
-            if keyword in text_lower:
-                return 'high'
-        
-        # Проверка средней срочности
-        for keyword in self.urgency_keywords['medium']:
-            if keyword in text_lower:
-                return 'medium'
-        
-        # Проверка низкой срочности
-        for keyword in self.urgency_keywords['low']:
-            if keyword in text_lower:
-                return 'low'
+        return self._urgency_from_hits(self.find_keywords(text), form_type)
+    
+    def _urgency_from_hits(self, hits: set, form_type: str) -> str:
+        """Срочность по найденным ключевым словам (high > medium > low)"""
+        group = self._matcher.first_group(hits, self._urgency_groups)
+        if group is not None:
+            return group[1]
         
         # Срочность по умолчанию для разных типов форм
         default_urgency = {
@@ -224,18 +259,12 @@ class FeedbackClassifier:
         if not text:
             return 'other'
         
-        text_lower = text.lower()
-        
-        # Проверка категорий по ключевым словам
-        for category, keywords in self.category_keywords.items():
-            if category == 'other':
-                continue
-                
-            for keyword in keywords:
-                if keyword in text_lower:
-                    return category
-        
-        return 'other'
+        return self._category_from_hits(self.find_keywords(text))
+    
+    def _category_from_hits(self, hits: set) -> str:
+        """Категория по найденным ключевым словам (первая по порядку объявления)"""
+        group = self._matcher.first_group(hits, self._category_groups)
+        return group[1] if group is not None else 'other'
     
     def extract_tags(self, text: str) -> list:
         """
@@ -250,26 +279,21 @@ class FeedbackClassifier:
         if not text:
             return []
         
+        return self._tags_from_hits(text, self.find_keywords(text))
+    
+    def _tags_from_hits(self, text: str, hits: set) -> list:
+        """Теги по найденным ключевым словам, хэштегам и версиям"""
         tags = []
-        text_lower = text.lower()
         
         # Поиск хэштегов
         hashtags = re.findall(r'#(\w+)', text)
         tags.extend(hashtags)
         
         # Поиск упоминаний продуктов/технологий
-        tech_keywords = [
-            'postgresql', 'mysql', 'redis', 'docker', 'kubernetes',
-            'python', 'javascript', 'react', 'vue', 'angular',
-            'api', 'rest', 'graphql', 'websocket', 'microservice'
-        ]
-        
-        for keyword in tech_keywords:
-            if keyword in text_lower:
-                tags.append(keyword)
+        tags.extend(self._matcher.group_hits(hits, ('tag', 'tech')))
         
         # Поиск упоминания версий
-        versions = re.findall(r'v\d+\.\d+(\.\d+)?', text_lower)
+        versions = re.findall(r'v\d+\.\d+(\.\d+)?', text.lower())
         tags.extend(versions)
         
         return list(set(tags))  # Уникальные теги
@@ -330,9 +354,16 @@ class FeedbackClassifier:
         """
         text = feedback_data.problem_text or ""
         
-        urgency = self.classify_urgency(text, feedback_data.form_type)
-        category = self.classify_category(text, feedback_data.form_type)
-        tags = self.extract_tags(text)
+        if text:
+            # Один проход по тексту для срочности, категории и тегов
+            hits = self.find_keywords(text)
+            urgency = self._urgency_from_hits(hits, feedback_data.form_type)
+            category = self._category_from_hits(hits)
+            tags = self._tags_from_hits(text, hits)
+        else:
+            urgency = self.classify_urgency(text, feedback_data.form_type)
+            category = self.classify_category(text, feedback_data.form_type)
+            tags = self.extract_tags(text)
         priority_score = self.calculate_priority_score(urgency, category, feedback_data.form_type)
         
         return {
@@ -347,6 +378,12 @@ class FeedbackClassifier:
 # Глобальный экземпляр классификатора
 classifier = FeedbackClassifier()
 
+# Кэш результатов классификации (теги зависят от регистра, поэтому ключ — исходный текст)
+classification_cache = TTLCache(
+    maxsize=int(os.getenv("CLASSIFY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("CLASSIFY_CACHE_TTL", "300"))
+)
+
 
 def classify_feedback(feedback_data: FeedbackCreate) -> Dict[str, Any]:
     """
@@ -358,4 +395,14 @@ def classify_feedback(feedback_data: FeedbackCreate) -> Dict[str, Any]:
     Returns:
         Результат классификации
     """
-    return classifier.classify_feedback(feedback_data)
+    cache_key = (
+        classifier.rules_version,
+        feedback_data.form_type,
+        text_digest(feedback_data.problem_text or "")
+    )
+    cached = classification_cache.get(cache_key)
+    if cached is None:
+        cached = classifier.classify_feedback(feedback_data)
+        classification_cache.set(cache_key, cached)
+    
+    return {**cached, 'tags': list(cached['tags'])}
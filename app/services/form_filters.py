@@ -0,0 +1,259 @@
+"""
+Form Data Filters for Arenadata Feedback System
+Фильтры отзывов по полям динамических форм (feedbacks.form_data JSONB)
+
+Условие на поле записывается как name=value, name!=value, name>value
+(также >=, <, <=) или name=a|b (любое из значений). Имена полей
+проверяются по form_configs. Ответы на поля формы попадают в form_data
+при приеме отзыва (submitted_form_data); поля, у которых есть своя
+колонка feedbacks (client_name, client_email, problem_text, ...),
+в form_data не хранятся и здесь отклоняются.
+
+Условия переводятся в операторы, которые поддерживает GIN-индекс
+idx_feedbacks_form_data (jsonb_ops): равенства всех полей - в один
+form_data @> '{...}', остальные - в jsonpath form_data @@ '...'.
+Частые поля можно вынести в отдельный btree-индекс по выражению
+form_data ->> 'name' и перечислить в FORM_DATA_INDEXED_FIELDS: тогда
+равенства по ним пишутся через это выражение.
+
+Создание индекса для поля (вне транзакции, CONCURRENTLY):
+    python -m app.services.form_filters --promote product
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import Text, literal, text
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import cast
+
+from app.database import engine
+from app.models import Feedback, FormConfig
+
+# Поля с btree-индексом по form_data ->> 'name' (create_field_index)
+FORM_DATA_INDEXED_FIELDS = {
+    name.strip() for name in os.getenv("FORM_DATA_INDEXED_FIELDS", "").split(",") if name.strip()
+}
+# Сколько условий на form_data можно передать в одном запросе
+FORM_DATA_MAX_FILTERS = int(os.getenv("FORM_DATA_MAX_FILTERS", "10"))
+
+_FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,62}$")
+_CONDITION_RE = re.compile(r"^([^=!<>]+)(!=|>=|<=|=|>|<)(.*)$", re.S)
+# Поля с несколькими значениями: в form_data хранится массив
+_ARRAY_FIELD_TYPES = {"checkbox"}
+# Поля форм, которые сохраняются в колонки feedbacks, а не в form_data
+COLUMN_FIELDS = frozenset(Feedback.__table__.columns.keys())
+
+
+class InvalidFormFilterError(ValueError):
+    """Условие на поле формы не разбирается или поле неизвестно"""
+
+
+class FormFieldFilter(NamedTuple):
+    """Условие на одно поле form_data"""
+    field: str
+    op: str  # '=', '!=', '>', '>=', '<', '<='
+    values: Tuple[str, ...]  # Несколько значений только для '=' (name=a|b)
+
+
+def parse_filters(conditions: List[str]) -> List[FormFieldFilter]:
+    """
+    Разобрать условия вида name=value, name>=value, name=a|b
+
+    Raises:
+        InvalidFormFilterError: Некорректное условие
+    """
+    if len(conditions) > FORM_DATA_MAX_FILTERS:
+        raise InvalidFormFilterError(f"Не больше {FORM_DATA_MAX_FILTERS} условий на поля формы")
+
+    filters = []
+    for condition in conditions:
+        match = _CONDITION_RE.match(condition)
+        if not match:
+            raise InvalidFormFilterError(f"Некорректное условие на поле формы: {condition!r}")
+        field, op, value = match.group(1).strip(), match.group(2), match.group(3)
+        if not _FIELD_NAME_RE.match(field):
+            raise InvalidFormFilterError(f"Некорректное имя поля формы: {field!r}")
+        if op not in ("=", "!=") and _is_float(value) and not _is_number(value):
+            raise InvalidFormFilterError(f"Некорректное число в условии на поле формы: {condition!r}")
+        values = tuple(value.split("|")) if op == "=" else (value,)
+        filters.append(FormFieldFilter(field, op, values))
+    return filters
+
+
+def submitted_form_data(answers: Dict[str, Any], form_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    form_data нового отзыва: ответы на поля формы без своей колонки в feedbacks
+
+    Args:
+        answers: Поля запроса верхнего уровня (так их отправляет form.html)
+        form_data: Переданный form_data (служебные поля формы), его ключи важнее
+    """
+    fields = {name: value for name, value in answers.items() if name not in COLUMN_FIELDS}
+    return {**fields, **(form_data or {})}
+
+
+def known_fields(db: Session, form_type: Optional[str] = None) -> Dict[str, str]:
+    """
+    Поля форм из form_configs (включая неактивные - они есть в старых отзывах)
+
+    Returns:
+        {field_name: field_type}
+    """
+    query = db.query(FormConfig.field_name, FormConfig.field_type)
+    if form_type:
+        query = query.filter(FormConfig.form_type == form_type)
+    return {name: field_type for name, field_type in query.distinct()}
+
+
+def _is_float(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_number(value: str) -> bool:
+    """Конечное число: nan, inf и 1e400 в jsonpath не записать"""
+    return _is_float(value) and math.isfinite(float(value))
+
+
+def _jsonpath(filter_: FormFieldFilter) -> str:
+    """Предикат jsonpath для form_data @@ (имя и значения экранированы json.dumps)"""
+    item = f"$.{json.dumps(filter_.field)}"
+    op = "==" if filter_.op == "=" else filter_.op
+    if op in ("==", "!="):
+        # Равенство строковое: так значения сохраняет форма
+        checks = [f"{item} {op} {json.dumps(value, ensure_ascii=False)}" for value in filter_.values]
+        return " || ".join(checks)
+    value = filter_.values[0]
+    if _is_number(value):
+        # Числовое сравнение: строка "10" в form_data сравнивается как 10
+        return f"{item}.double() {op} {float(value)!r}"
+    return f"{item} {op} {json.dumps(value, ensure_ascii=False)}"
+
+
+def _indexed_condition(filter_: FormFieldFilter):
+    """Равенство через form_data ->> 'name' для полей с btree-индексом"""
+    column = Feedback.form_data[filter_.field].astext
+    return column.in_(filter_.values) if len(filter_.values) > 1 else column == filter_.values[0]
+
+
+def build_conditions(filters: List[FormFieldFilter], field_types: Dict[str, str]) -> list:
+    """
+    SQL-условия для отобранных полей
+
+    Равенства полей из FORM_DATA_INDEXED_FIELDS идут через form_data ->> 'name',
+    одиночные равенства остальных полей объединяются в один form_data @> '{...}',
+    прочие условия - jsonpath (сравнения в нем числовые, а не текстовые,
+    поэтому и для индексированных полей).
+    """
+    contained = {}
+    conditions = []
+    for filter_ in filters:
+        if (filter_.op == "=" and filter_.field in FORM_DATA_INDEXED_FIELDS
+                and field_types.get(filter_.field) not in _ARRAY_FIELD_TYPES):
+            conditions.append(_indexed_condition(filter_))
+        elif filter_.op == "=" and len(filter_.values) == 1 and filter_.field not in contained:
+            value = filter_.values[0]
+            contained[filter_.field] = [value] if field_types.get(filter_.field) in _ARRAY_FIELD_TYPES else value
+        else:
+            conditions.append(Feedback.form_data.op("@@")(cast(_jsonpath(filter_), JSONPATH)))
+    if contained:
+        # Строка с приведением к jsonb, а не параметр-словарь: условие попадает
+        # и в EXPLAIN оценки количества (crud._planner_rows), где параметры
+        # передаются драйверу без обработки типами SQLAlchemy
+        document = json.dumps(contained, ensure_ascii=False)
+        conditions.insert(0, Feedback.form_data.op("@>")(cast(literal(document, Text), JSONB)))
+    return conditions
+
+
+def form_data_conditions(db: Session, conditions: List[str], form_type: Optional[str] = None) -> list:
+    """
+    Разобрать, проверить по form_configs и перевести условия в SQL
+
+    Raises:
+        InvalidFormFilterError: Некорректное условие или поле не из форм
+    """
+    if not conditions:
+        return []
+    filters = parse_filters(conditions)
+    columns = sorted({filter_.field for filter_ in filters} & COLUMN_FIELDS)
+    if columns:
+        raise InvalidFormFilterError(
+            f"Поля {', '.join(columns)} хранятся в колонках отзыва, а не в form_data: используйте их фильтры"
+        )
+    field_types = known_fields(db, form_type)
+    unknown = sorted({filter_.field for filter_ in filters} - set(field_types))
+    if unknown:
+        scope = f" формы {form_type}" if form_type else ""
+        raise InvalidFormFilterError(f"Неизвестные поля{scope}: {', '.join(unknown)}")
+    return build_conditions(filters, field_types)
+
+
+def field_index_name(field: str) -> str:
+    return f"idx_feedbacks_form_{field.lower()}"[:63]
+
+
+def create_field_index(field: str) -> str:
+    """
+    Создать btree-индекс по form_data ->> field (CONCURRENTLY) и обновить статистику
+
+    После создания поле нужно добавить в FORM_DATA_INDEXED_FIELDS.
+
+    Returns:
+        Имя индекса
+    """
+    if not _FIELD_NAME_RE.match(field):
+        raise InvalidFormFilterError(f"Некорректное имя поля формы: {field!r}")
+    name = field_index_name(field)
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON feedbacks ((form_data ->> '{field}'))"))
+        # Без статистики по выражению планировщик не оценит селективность условия
+        conn.execute(text("ANALYZE feedbacks"))
+    return name
+
+
+def drop_field_index(field: str) -> str:
+    """Удалить индекс поля (сначала уберите поле из FORM_DATA_INDEXED_FIELDS)"""
+    if not _FIELD_NAME_RE.match(field):
+        raise InvalidFormFilterError(f"Некорректное имя поля формы: {field!r}")
+    name = field_index_name(field)
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    return name
+
+
+def indexed_fields() -> Set[str]:
+    """Поля, для которых в БД есть индекс idx_feedbacks_form_<field>"""
+    with engine.connect() as conn:
+        names = conn.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = 'feedbacks' AND indexname LIKE 'idx\\_feedbacks\\_form\\_%'"
+        )).scalars().all()
+    return {name[len("idx_feedbacks_form_"):] for name in names if name != "idx_feedbacks_form_data"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Индексы по полям form_data")
+    parser.add_argument("--promote", metavar="FIELD", help="Создать индекс по form_data ->> FIELD")
+    parser.add_argument("--drop", metavar="FIELD", help="Удалить индекс поля")
+    args = parser.parse_args()
+
+    if args.promote:
+        print(f"Created {create_field_index(args.promote)}; add {args.promote} to FORM_DATA_INDEXED_FIELDS")
+    elif args.drop:
+        print(f"Dropped {drop_field_index(args.drop)}")
+    else:
+        print("Indexed fields in DB:", ", ".join(sorted(indexed_fields())) or "-")
+        print("FORM_DATA_INDEXED_FIELDS:", ", ".join(sorted(FORM_DATA_INDEXED_FIELDS)) or "-")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Idempotency Service for Arenadata Feedback System
+Поддержка заголовка Idempotency-Key: повтор запроса возвращает исходный ответ
+
+Ответы хранятся в таблице idempotency_keys (ключ - первичный ключ, TTL
+по expires_at) и в кэше в памяти. Ключ записывается в той же транзакции,
+что и отзыв, поэтому одновременные повторы не создают дублей: второй
+INSERT ждет первый и получает конфликт.
+
+В пределах процесса запрос с ключом, который уже обрабатывается, ждет
+первый (in_flight) и получает его ответ из кэша: в режиме очереди
+отзыв пишется в БД позже ответа, и без этого повтор получил бы свой uuid.
+"""
+
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import IdempotencyKey
+from app.services.cache import TTLCache, text_digest
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")) * 3600
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+_MAX_KEY_LENGTH = 255
+
+# Горячие ключи: повтор в пределах процесса не идет в БД
+idempotency_cache = TTLCache(
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl=min(IDEMPOTENCY_TTL, float(os.getenv("IDEMPOTENCY_CACHE_TTL", "600")))
+)
+
+# (status_code, тело ответа)
+StoredResponse = Tuple[int, Dict[str, Any]]
+
+
+class IdempotencyKeyError(ValueError):
+    """Некорректное значение заголовка Idempotency-Key"""
+
+
+class IdempotencyKeyMismatchError(IdempotencyKeyError):
+    """Ключ уже использован с другим телом запроса"""
+
+
+def validate_key(key: str) -> str:
+    """Проверить значение заголовка Idempotency-Key"""
+    key = key.strip()
+    if not key or len(key) > _MAX_KEY_LENGTH:
+        raise IdempotencyKeyError(f"{IDEMPOTENCY_HEADER}: от 1 до {_MAX_KEY_LENGTH} символов")
+    return key
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Отпечаток тела запроса (порядок полей не важен)"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return text_digest(canonical).hex()
+
+
+def _check(endpoint: str, fingerprint: str, stored: tuple) -> StoredResponse:
+    stored_endpoint, stored_fingerprint, status_code, body = stored
+    if stored_endpoint != endpoint or stored_fingerprint != fingerprint:
+        raise IdempotencyKeyMismatchError(f"{IDEMPOTENCY_HEADER} уже использован с другим запросом")
+    return status_code, body
+
+
+def replay_response(stored: StoredResponse) -> JSONResponse:
+    """Повтор исходного ответа"""
+    status_code, body = stored
+    return JSONResponse(status_code=status_code, content=body, headers={"Idempotent-Replayed": "true"})
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def cached_response(key: str, endpoint: str, fingerprint: str) -> Optional[StoredResponse]:
+    """
+    Ответ из кэша в памяти
+
+    Raises:
+        IdempotencyKeyMismatchError: Ключ использован с другим телом запроса
+    """
+    stored = idempotency_cache.get(key)
+    return _check(endpoint, fingerprint, stored) if stored is not None else None
+
+
+async def stored_response(db: AsyncSession, key: str, endpoint: str,
+                          fingerprint: str) -> Optional[StoredResponse]:
+    """
+    Ответ из таблицы idempotency_keys (истекшие ключи не учитываются)
+
+    Raises:
+        IdempotencyKeyMismatchError: Ключ использован с другим телом запроса
+    """
+    row = (await db.execute(
+        select(IdempotencyKey.endpoint, IdempotencyKey.request_hash,
+               IdempotencyKey.status_code, IdempotencyKey.response)
+        .where(IdempotencyKey.key == key, IdempotencyKey.expires_at > _utcnow())
+    )).first()
+    if row is None:
+        return None
+
+    stored = tuple(row)
+    idempotency_cache.set(key, stored)
+    return _check(endpoint, fingerprint, stored)
+
+
+def key_record(key: str, endpoint: str, fingerprint: str, status_code: int,
+               body: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка idempotency_keys без временных меток (можно сериализовать в JSON)"""
+    return {
+        "key": key,
+        "endpoint": endpoint,
+        "request_hash": fingerprint,
+        "status_code": status_code,
+        "response": body
+    }
+
+
+def remember_params(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Параметры для remember_statement: записи key_record с временными метками"""
+    now = _utcnow()
+    expires_at = now + timedelta(seconds=IDEMPOTENCY_TTL)
+    return [{**record, "created_at": now, "expires_at": expires_at} for record in records]
+
+
+def _remember_statement():
+    stmt = pg_insert(IdempotencyKey)
+    return stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.key],
+        set_={column: stmt.excluded[column] for column in
+              ("endpoint", "request_hash", "status_code", "response", "created_at", "expires_at")},
+        where=IdempotencyKey.expires_at <= stmt.excluded.created_at
+    ).returning(IdempotencyKey.key, sort_by_parameter_order=True)
+
+
+# INSERT ключей; истекший ключ перезаписывается, действующий - нет.
+# RETURNING key возвращает только реально записанные ключи.
+# Оператор строится один раз, чтобы не компилировать его на каждый запрос
+remember_statement = _remember_statement()
+
+
+async def remember(db: AsyncSession, key: str, endpoint: str, fingerprint: str,
+                   status_code: int, body: Dict[str, Any]) -> bool:
+    """
+    Сохранить ответ в транзакции вызывающего кода (commit делает он)
+
+    Returns:
+        False, если ключ уже занят другим запросом - транзакцию нужно
+        откатить и вернуть сохраненный ответ (см. stored_response)
+    """
+    record = key_record(key, endpoint, fingerprint, status_code, body)
+    inserted = (await db.execute(remember_statement, remember_params([record])[0])).first()
+    return inserted is not None
+
+
+def remember_local(key: str, endpoint: str, fingerprint: str, status_code: int,
+                   body: Dict[str, Any]) -> None:
+    """Положить ответ в кэш в памяти (после commit)"""
+    idempotency_cache.set(key, (endpoint, fingerprint, status_code, body))
+
+
+# (ключ, endpoint) -> future, завершается, когда первый запрос ответил
+_in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+
+@asynccontextmanager
+async def in_flight(key: Optional[str], endpoint: str) -> AsyncIterator[None]:
+    """
+    Обрабатывать запросы с одним ключом в процессе по одному
+
+    Повтор ждет, пока первый запрос выйдет из блока, и затем проверяет
+    кэш заново (cached_response): ответ первого там уже есть (remember_local).
+    Если первый запрос завершился ошибкой, повтор обрабатывается сам.
+    Без ключа (key=None) ничего не делает.
+    """
+    if key is None:
+        yield
+        return
+
+    slot = (key, endpoint)
+    while slot in _in_flight:
+        # shield: отмена ждущего запроса не отменяет future первого
+        await asyncio.shield(_in_flight[slot])
+    done = asyncio.get_running_loop().create_future()
+    _in_flight[slot] = done
+    try:
+        yield
+    finally:
+        del _in_flight[slot]
+        done.set_result(None)
+
+
+async def purge_expired() -> int:
+    """Удалить истекшие ключи"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= _utcnow()))
+        await db.commit()
+    return result.rowcount
+
+
+_purge_task: Optional[asyncio.Task] = None
+
+
+async def _purge_periodically() -> None:
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_PURGE_INTERVAL)
+        try:
+            await purge_expired()
+        except Exception as e:
+            print(f"Error purging idempotency keys: {e}")
+
+
+def start_purger() -> None:
+    """Периодическая очистка истекших ключей (при старте приложения)"""
+    global _purge_task
+    if _purge_task is None and IDEMPOTENCY_PURGE_INTERVAL > 0:
+        _purge_task = asyncio.create_task(_purge_periodically())
+
+
+async def stop_purger() -> None:
+    global _purge_task
+    if _purge_task is not None:
+        _purge_task.cancel()
+        try:
+            await _purge_task
+        except asyncio.CancelledError:
+            pass
+        _purge_task = None
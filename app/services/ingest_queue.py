@@ -0,0 +1,410 @@
+"""
+Write-behind Ingestion Queue for Arenadata Feedback System
+Прием отзывов с ответом 202 и групповой записью в БД
+
+Отзыв получает UUID сразу, записывается в локальный spool-файл
+(переживает падение процесса) и попадает в ограниченную очередь.
+Фоновая задача забирает очередь пачками и вставляет их одной
+транзакцией: пачка ограничена размером и временем ожидания.
+
+Каталог spool может быть общим для нескольких процессов (Dockerfile
+запускает два uvicorn): процесс держит flock на своих сегментах, пока
+они не сохранены в БД, и при старте дозаписывает только сегменты,
+которые никто не держит.
+"""
+
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.database import async_engine
+from app.models import Feedback
+from app.services.idempotency import remember_params, remember_statement
+from app.services import stats_cache
+
+# Режим приема: 'sync' - запись в запросе, 'queue' - через очередь
+INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_FLUSH_BATCH = int(os.getenv("INGEST_FLUSH_BATCH", "500"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL_MS", "50")) / 1000
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "spool")
+INGEST_SPOOL_SEGMENT_BYTES = int(os.getenv("INGEST_SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+# fsync после каждой записи: переживает и падение ОС, но медленнее
+INGEST_SPOOL_FSYNC = os.getenv("INGEST_SPOOL_FSYNC", "false").lower() == "true"
+
+_RETRY_MAX_DELAY = 30.0
+
+
+class QueueFullError(Exception):
+    """Очередь заполнена, клиенту нужно повторить запрос позже"""
+
+
+class IngestQueue:
+    """
+    Ограниченная очередь отзывов с групповой записью и spool-файлом
+
+    Spool разбит на сегменты: сегмент удаляется, когда он больше
+    не пишется и все его записи сохранены в БД. При старте
+    оставшиеся сегменты без блокировки дозаписываются (повторы
+    отсекаются по uuid).
+    """
+
+    def __init__(self, spool_dir: str = INGEST_SPOOL_DIR, maxsize: int = INGEST_QUEUE_SIZE,
+                 batch_size: int = INGEST_FLUSH_BATCH, flush_interval: float = INGEST_FLUSH_INTERVAL):
+        self.spool_dir = spool_dir
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Пачка, которую фоновая задача собирает или пишет сейчас
+        self._inflight: List[Tuple[str, Dict[str, Any]]] = []
+
+        # Текущий сегмент spool и число несохраненных записей по сегментам
+        self._segment_seq = 0
+        self._segment_path: Optional[str] = None
+        self._segment_file = None
+        self._outstanding: Dict[str, int] = {}
+        # Открытые файлы сегментов с flock: держатся, пока сегмент не удален
+        self._locks: Dict[str, Any] = {}
+
+        self.accepted = 0
+        self.flushed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.failed = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> int:
+        """
+        Дозаписать spool после прошлого запуска и запустить фоновую запись
+
+        Returns:
+            Сколько записей восстановлено из spool
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._queue = asyncio.Queue()
+        recovered = await self._recover()
+        self._open_segment()
+        self._task = asyncio.create_task(self._run())
+        return recovered
+
+    async def stop(self) -> None:
+        """Дописать очередь в БД и остановить фоновую задачу"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Все, что осталось в очереди, пишем напрямую; при ошибке записи остаются в spool
+        pending, self._inflight = self._inflight, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for start in range(0, len(pending), self.batch_size):
+            try:
+                await self._write(pending[start:start + self.batch_size])
+            except Exception as e:
+                print(f"Ingest queue: {len(pending) - start} items left in spool: {e}")
+                break
+        self._close_segment()
+        # Несохраненные сегменты остаются в spool для следующего запуска
+        for lock in self._locks.values():
+            lock.close()
+        self._locks.clear()
+        self._outstanding.clear()
+
+    def submit(self, row: Dict[str, Any], idempotency: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Принять отзыв: записать в spool и поставить в очередь
+
+        Вызывается из event loop; между записью в spool и постановкой
+        в очередь нет await, поэтому учет сегментов не гоняется с flush.
+
+        Args:
+            row: Колонки feedbacks без created_at (uuid создается, если не передан)
+            idempotency: Запись idempotency_keys (key_record), сохраняется
+                в той же транзакции, что и отзыв
+
+        Returns:
+            Строка с присвоенными uuid и created_at
+
+        Raises:
+            QueueFullError: Очередь заполнена
+        """
+        if self._queue is None or self.pending >= self.maxsize:
+            self.rejected += 1
+            raise QueueFullError("Очередь приема отзывов заполнена")
+
+        row = {"uuid": uuid.uuid4(), **row, "created_at": datetime.utcnow()}
+        if idempotency is not None:
+            row["_idempotency"] = idempotency
+        segment = self._spool(row)
+        self._queue.put_nowait((segment, row))
+        self.accepted += 1
+        return row
+
+    @property
+    def pending(self) -> int:
+        """Принятые, но еще не сохраненные в БД отзывы"""
+        return self._queue.qsize() + len(self._inflight) if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для /metrics"""
+        return {
+            "mode": INGEST_MODE,
+            "running": self.running,
+            "pending": self.pending,
+            "maxsize": self.maxsize,
+            "accepted": self.accepted,
+            "flushed": self.flushed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.flushed / self.batches, 1) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": self.last_flush_ms,
+            "spool_segments": len(self._outstanding)
+        }
+
+    # Фоновая запись
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            if not self._inflight:
+                await self._collect()
+            try:
+                await self._write(self._inflight)
+                self._inflight = []
+                delay = 0.5
+            except Exception as e:
+                # БД недоступна: пачка остается в памяти и в spool, повторяем позже
+                print(f"Ingest queue flush failed, retry in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _RETRY_MAX_DELAY)
+
+    async def _collect(self) -> None:
+        """Пачка: первая запись ждется без ограничения, остальные - до flush_interval"""
+        batch = self._inflight
+        batch.append(await self._queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Вставить пачку одной транзакцией и освободить сегменты spool"""
+        started = time.perf_counter()
+        rows = [row for _, row in batch]
+        try:
+            await _insert_rows(rows)
+        except OperationalError:
+            raise
+        except DBAPIError:
+            # Ошибка данных в одной из строк: пишем по одной, ошибочные - в dead-letter
+            for row in rows:
+                try:
+                    await _insert_rows([row])
+                except OperationalError:
+                    raise
+                except DBAPIError as e:
+                    self.failed += 1
+                    self._dead_letter(row, e)
+
+        self.batches += 1
+        self.flushed += len(rows)
+        self.last_batch_size = len(rows)
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        for segment, _ in batch:
+            self._release(segment)
+
+    # Spool
+
+    def _open_segment(self) -> None:
+        self._segment_seq += 1
+        self._segment_path = os.path.join(
+            self.spool_dir, f"ingest-{int(time.time() * 1000)}-{os.getpid()}-{self._segment_seq:06d}.ndjson"
+        )
+        self._segment_file = open(self._segment_path, "a", encoding="utf-8")
+        # Блокировка снимается при закрытии файла (и при падении процесса)
+        fcntl.flock(self._segment_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._locks[self._segment_path] = self._segment_file
+        self._outstanding[self._segment_path] = 0
+
+    def _close_segment(self) -> None:
+        """Закончить запись в сегмент; файл и блокировка остаются до сохранения всех записей"""
+        if self._segment_file is None:
+            return
+        path = self._segment_path
+        self._segment_file.flush()
+        self._segment_file = None
+        self._segment_path = None
+        if self._outstanding.get(path) == 0:
+            self._remove_segment(path)
+
+    def _remove_segment(self, path: str) -> None:
+        # Файл удаляется до снятия блокировки: другой процесс не дозапишет его повторно
+        self._outstanding.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        lock = self._locks.pop(path, None)
+        if lock is not None:
+            lock.close()
+
+    def _spool(self, row: Dict[str, Any]) -> str:
+        if self._segment_file.tell() >= INGEST_SPOOL_SEGMENT_BYTES:
+            self._close_segment()
+            self._open_segment()
+
+        self._segment_file.write(json.dumps(_encode(row), ensure_ascii=False) + "\n")
+        self._segment_file.flush()
+        if INGEST_SPOOL_FSYNC:
+            os.fsync(self._segment_file.fileno())
+        self._outstanding[self._segment_path] += 1
+        return self._segment_path
+
+    def _release(self, segment: str) -> None:
+        if segment not in self._outstanding:
+            return
+        self._outstanding[segment] -= 1
+        if self._outstanding[segment] == 0 and segment != self._segment_path:
+            self._remove_segment(segment)
+
+    def _adopt_segment(self, path: str, lock, rows: List[Dict[str, Any]]) -> None:
+        """Передать записи сегмента из прошлого запуска фоновой записи (повторы отсекаются по uuid)"""
+        self._locks[path] = lock
+        self._outstanding[path] = len(rows)
+        for row in rows:
+            self._queue.put_nowait((path, row))
+        if not rows:
+            self._remove_segment(path)
+
+    def _dead_letter(self, row: Dict[str, Any], error: Exception) -> None:
+        record = {**_encode(row), "error": str(getattr(error, "orig", None) or error).strip()}
+        with open(os.path.join(self.spool_dir, "dead-letter.ndjson"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    async def _recover(self) -> int:
+        """
+        Дозаписать сегменты, оставшиеся после остановки или падения
+
+        Сегменты, заблокированные работающим процессом, пропускаются.
+        Сегмент, который не удалось записать (БД недоступна, ошибка
+        данных), остается в spool под блокировкой этого процесса, а его
+        записи уходят в очередь: фоновая запись повторит их позже.
+        """
+        recovered = 0
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "ingest-*.ndjson"))):
+            try:
+                f = open(path, encoding="utf-8")
+            except FileNotFoundError:
+                # Владелец удалил сегмент между glob и open
+                continue
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            rows = []
+            for line in f:
+                try:
+                    rows.append(_decode(json.loads(line)))
+                except ValueError:
+                    # Недописанная последняя строка при падении
+                    continue
+            try:
+                for start in range(0, len(rows), self.batch_size):
+                    await _insert_rows(rows[start:start + self.batch_size])
+            except Exception as e:
+                print(f"Ingest queue: {len(rows)} items from {path} left for background flush: {e}")
+                self._adopt_segment(path, f, rows)
+                continue
+            recovered += len(rows)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            f.close()
+        if recovered:
+            print(f"Ingest queue: recovered {recovered} items from spool")
+        return recovered
+
+
+async def _insert_rows(rows: List[Dict[str, Any]]) -> None:
+    """
+    Одна транзакция на пачку; повторно записанные uuid пропускаются
+
+    Отзывы, чей Idempotency-Key уже сохранен другим запросом, не вставляются.
+    """
+    if not rows:
+        return
+    stmt = pg_insert(Feedback).on_conflict_do_nothing(index_elements=[Feedback.uuid])
+    async with async_engine.begin() as conn:
+        records: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            record = row.get("_idempotency")
+            if record is not None:
+                records.setdefault(record["key"], record)
+        if records:
+            stored = set((await conn.execute(
+                remember_statement, remember_params(list(records.values()))
+            )).scalars())
+            # С каждым ключом вставляется не больше одного отзыва
+            kept = []
+            for row in rows:
+                record = row.get("_idempotency")
+                if record is not None:
+                    if record["key"] not in stored:
+                        continue
+                    stored.discard(record["key"])
+                kept.append(row)
+            rows = kept
+        rows = [{column: value for column, value in row.items() if column != "_idempotency"} for row in rows]
+        if rows:
+            await conn.execute(stmt, rows)
+    if rows:
+        stats_cache.invalidate()
+
+
+def _encode(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **row,
+        "uuid": str(row["uuid"]),
+        "created_at": row["created_at"].isoformat()
+    }
+
+
+def _decode(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        **record,
+        "uuid": uuid.UUID(record["uuid"]),
+        "created_at": datetime.fromisoformat(record["created_at"])
+    }
+
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,95 @@
+"""
+Request Body Layer for Arenadata Feedback System
+Чтение тела запроса с лимитом размера и JSON через orjson
+
+Тело читается потоком: при Content-Length больше лимита запрос
+отклоняется до чтения, иначе чтение прерывается, как только
+прочитано больше лимита. JSON разбирается и кодируется orjson.
+"""
+
+import os
+from typing import Any, Callable
+
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+
+# Лимит тела обычных запросов API и массовой загрузки (байты)
+API_MAX_BODY_BYTES = int(os.getenv("API_MAX_BODY_BYTES", str(4 * 1024 * 1024)))
+BULK_MAX_BODY_BYTES = int(os.getenv("BULK_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+
+
+class BodyTooLargeError(ValueError):
+    """Тело запроса больше лимита"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Тело запроса больше {max_bytes} байт")
+        self.max_bytes = max_bytes
+
+
+async def read_body(request: Request, max_bytes: int = API_MAX_BODY_BYTES) -> bytes:
+    """
+    Прочитать тело запроса, не буферизуя больше max_bytes
+
+    Raises:
+        BodyTooLargeError: Content-Length или прочитанное тело больше лимита
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise BodyTooLargeError(max_bytes)
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise BodyTooLargeError(max_bytes)
+    return bytes(body)
+
+
+async def read_json(request: Request, max_bytes: int = API_MAX_BODY_BYTES) -> Any:
+    """
+    Прочитать и разобрать JSON тело запроса
+
+    Raises:
+        BodyTooLargeError: Тело больше лимита
+        ValueError: Некорректный JSON (orjson.JSONDecodeError)
+    """
+    return orjson.loads(await read_body(request, max_bytes))
+
+
+def dumps(obj: Any) -> bytes:
+    """Кодировать в JSON (UTF-8, datetime/UUID без промежуточных преобразований)"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+class LimitedJSONRequest(Request):
+    """Request, который читает тело с лимитом и разбирает JSON через orjson"""
+
+    max_bytes = API_MAX_BODY_BYTES
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            try:
+                self._body = await read_body(self, self.max_bytes)
+            except BodyTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e)) from e
+        return self._body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError - подкласс json.JSONDecodeError,
+            # FastAPI по-прежнему отвечает 422 на некорректный JSON
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class LimitedJSONRoute(APIRoute):
+    """Маршрут API: тела запросов читаются через LimitedJSONRequest"""
+
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+
+        async def handler(request: Request):
+            return await original_handler(LimitedJSONRequest(request.scope, request.receive))
+
+        return handler
@@ -0,0 +1,170 @@
+"""
+Keyword Matcher for Arenadata Feedback System
+Поиск всех ключевых слов в тексте за один проход
+"""
+
+import os
+import re
+from typing import Collection, Dict, Hashable, Iterable, Optional, Set
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - резервный вариант без C-расширения
+    ahocorasick = None
+
+# Режим поиска: 'compat' - подстроки, как раньше (метки не меняются),
+# 'token' - токены с нормализацией словоформ (см. token_index.TokenMatcher)
+MATCH_MODE = os.getenv("CLASSIFIER_MATCH_MODE", "compat")
+
+
+class KeywordMatcher:
+    """
+    Многошаблонный поиск ключевых слов
+
+    Ключевые слова объединяются в группы (например, уровни срочности).
+    Автомат строится один раз при создании объекта, после чего
+    все вхождения ищутся одним проходом по тексту. Семантика совпадает
+    с проверкой ``keyword in text`` для каждого слова.
+    """
+
+    def __init__(self, groups: Dict[Hashable, Iterable[str]]):
+        self.groups = list(groups)
+        self._order = {group: position for position, group in enumerate(self.groups)}
+        self._members = {group: frozenset(k for k in keywords if k) for group, keywords in groups.items()}
+
+        # keyword -> {группа: сколько раз слово указано в группе}
+        self._index: Dict[str, Dict[Hashable, int]] = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                counts = self._index.setdefault(keyword, {})
+                counts[group] = counts.get(group, 0) + 1
+
+        self._build()
+
+    def _build(self) -> None:
+        """Построить структуру поиска по self._index"""
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self._index:
+                self._automaton.add_word(keyword, keyword)
+            if self._index:
+                self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._pattern = re.compile(_trie_pattern(self._index)) if self._index else None
+            # Все ключевые слова, которые входят в данное (включая его самого)
+            self._contained = {
+                keyword: {other for other in self._index if other in keyword}
+                for keyword in self._index
+            }
+
+    def find(self, text: str) -> Set[str]:
+        """
+        Найти все ключевые слова, входящие в текст
+
+        Args:
+            text: Текст (регистр не меняется, приводите заранее)
+
+        Returns:
+            Множество найденных ключевых слов
+        """
+        if not text or not self._index:
+            return set()
+
+        if self._automaton is not None:
+            return {keyword for _, keyword in self._automaton.iter(text)}
+
+        # Регулярное выражение возвращает самое длинное слово в каждой позиции,
+        # более короткие слова, начинающиеся там же, входят в него как подстроки
+        found: Set[str] = set()
+        search = self._pattern.search
+        match = search(text)
+        while match:
+            found |= self._contained[match.group()]
+            match = search(text, match.start() + 1)
+        return found
+
+    def group_counts(self, hits: Iterable[str]) -> Dict[Hashable, int]:
+        """
+        Посчитать совпадения по группам (с учетом повторов слова в группе)
+
+        Args:
+            hits: Найденные ключевые слова
+
+        Returns:
+            Словарь {группа: количество совпадений}
+        """
+        counts = {group: 0 for group in self.groups}
+        for keyword in hits:
+            for group, multiplicity in self._index.get(keyword, {}).items():
+                counts[group] += multiplicity
+        return counts
+
+    def first_group(self, hits: Iterable[str], groups: Collection[Hashable]) -> Optional[Hashable]:
+        """
+        Первая в порядке объявления группа из `groups`, в которой есть совпадение
+
+        Args:
+            hits: Найденные ключевые слова
+            groups: Допустимые группы (лучше передавать множество)
+
+        Returns:
+            Группа или None, если совпадений нет
+        """
+        best = None
+        for keyword in hits:
+            for group in self._index.get(keyword, ()):
+                if group in groups:
+                    position = self._order[group]
+                    if best is None or position < best:
+                        best = position
+        return self.groups[best] if best is not None else None
+
+    def group_hits(self, hits: Set[str], group: Hashable) -> Set[str]:
+        """Найденные ключевые слова, относящиеся к группе"""
+        return hits & self._members[group]
+
+
+def make_matcher(groups: Dict[Hashable, Iterable[str]], mode: Optional[str] = None) -> KeywordMatcher:
+    """
+    Создать поисковик ключевых слов для режима классификации
+
+    Args:
+        groups: Группы ключевых слов
+        mode: 'compat' или 'token' (по умолчанию CLASSIFIER_MATCH_MODE)
+    """
+    mode = mode or MATCH_MODE
+    if mode == "token":
+        from app.services.token_index import TokenMatcher
+        return TokenMatcher(groups)
+    if mode != "compat":
+        raise ValueError(f"Неизвестный режим классификации: {mode}")
+    return KeywordMatcher(groups)
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Построить регулярное выражение в виде префиксного дерева
+
+    Ветви дерева различаются первым символом, поэтому в каждой позиции
+    выражение однозначно и жадно находит самое длинное ключевое слово.
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = "(?:" + body + ")?"
+        return body
+
+    return build(trie)
@@ -0,0 +1,154 @@
+"""
+Size-aware Classification Dispatch for Arenadata Feedback System
+Анализ срочности с учетом размера текста
+
+Короткие тексты анализируются прямо в event loop. Длинные (вставленные
+логи на мегабайты) уходят в пул процессов пакетного анализа, чтобы не
+останавливать остальные запросы воркера. Опционально длинный текст
+анализируется по выборке: начало, конец и строки, похожие на ошибки.
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+
+from app.services.batch import get_pool, sync_rules
+from app.services.urgency import UrgencyRules, analyze_urgency, get_urgency_rules
+
+# Жесткий лимит длины сообщения при отправке (символы, 0 - без лимита)
+FEEDBACK_MAX_MESSAGE_CHARS = int(os.getenv("FEEDBACK_MAX_MESSAGE_CHARS", "1000000"))
+# Тексты длиннее анализируются в пуле процессов
+CLASSIFY_INLINE_MAX_CHARS = int(os.getenv("CLASSIFY_INLINE_MAX_CHARS", "20000"))
+# Анализировать длинный текст по выборке, а не целиком
+CLASSIFY_OFFLOAD_SAMPLE = os.getenv("CLASSIFY_OFFLOAD_SAMPLE", "false").lower() == "true"
+CLASSIFY_SAMPLE_HEAD_CHARS = int(os.getenv("CLASSIFY_SAMPLE_HEAD_CHARS", "8000"))
+CLASSIFY_SAMPLE_TAIL_CHARS = int(os.getenv("CLASSIFY_SAMPLE_TAIL_CHARS", "4000"))
+CLASSIFY_SAMPLE_MAX_LINES = int(os.getenv("CLASSIFY_SAMPLE_MAX_LINES", "200"))
+
+# Признаки строк лога, которые стоит анализировать из середины текста
+# (ищутся в тексте в нижнем регистре: без IGNORECASE поиск в разы быстрее)
+_ERROR_MARK_RE = re.compile(
+    r"error|exception|traceback|fatal|critical|fail|panic|timeout|ошибк|сбой|авари|исключени"
+)
+
+
+class MessageTooLargeError(ValueError):
+    """Сообщение длиннее FEEDBACK_MAX_MESSAGE_CHARS"""
+
+
+class OffloadStats:
+    """Счетчики путей анализа для /metrics"""
+
+    PATHS = ("inline", "offload_full", "offload_sampled")
+
+    def __init__(self):
+        self.calls = {path: 0 for path in self.PATHS}
+        self.chars = {path: 0 for path in self.PATHS}
+        self.total_ms = {path: 0.0 for path in self.PATHS}
+        self.rejected_too_large = 0
+
+    def record(self, path: str, chars: int, elapsed: float) -> None:
+        self.calls[path] += 1
+        self.chars[path] += chars
+        self.total_ms[path] += elapsed * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inline_max_chars": CLASSIFY_INLINE_MAX_CHARS,
+            "max_message_chars": FEEDBACK_MAX_MESSAGE_CHARS,
+            "sample": CLASSIFY_OFFLOAD_SAMPLE,
+            "rejected_too_large": self.rejected_too_large,
+            "paths": {
+                path: {
+                    "calls": self.calls[path],
+                    "chars": self.chars[path],
+                    "avg_ms": round(self.total_ms[path] / self.calls[path], 2) if self.calls[path] else 0.0
+                }
+                for path in self.PATHS
+            }
+        }
+
+
+offload_stats = OffloadStats()
+
+
+def check_message_size(text: Optional[str]) -> None:
+    """
+    Проверить жесткий лимит длины сообщения
+
+    Raises:
+        MessageTooLargeError: Сообщение длиннее FEEDBACK_MAX_MESSAGE_CHARS
+    """
+    if text and FEEDBACK_MAX_MESSAGE_CHARS > 0 and len(text) > FEEDBACK_MAX_MESSAGE_CHARS:
+        offload_stats.rejected_too_large += 1
+        raise MessageTooLargeError(
+            f"Сообщение слишком длинное: {len(text)} символов (максимум {FEEDBACK_MAX_MESSAGE_CHARS})"
+        )
+
+
+def sample_text(text: str, head: int = CLASSIFY_SAMPLE_HEAD_CHARS, tail: int = CLASSIFY_SAMPLE_TAIL_CHARS,
+                max_lines: int = CLASSIFY_SAMPLE_MAX_LINES) -> str:
+    """
+    Выборка из длинного текста: начало, строки с ошибками из середины, конец
+
+    Описание проблемы обычно в начале или в конце, а из вставленного
+    лога для срочности важны только строки с ошибками.
+    """
+    if len(text) <= head + tail:
+        return text
+
+    middle_end = len(text) - tail
+    # Срочность считается по тексту в нижнем регистре, строки можно брать из него
+    middle = text[head:middle_end].lower()
+    lines = []
+    position = 0
+    while len(lines) < max_lines:
+        match = _ERROR_MARK_RE.search(middle, position)
+        if match is None:
+            break
+        # Строка целиком, следующий поиск - со следующей строки
+        line_start = middle.rfind("\n", 0, match.start()) + 1
+        line_end = middle.find("\n", match.end())
+        if line_end == -1:
+            line_end = len(middle)
+        lines.append(middle[line_start:line_end])
+        position = line_end + 1
+    return "\n".join([text[:head], *lines, text[middle_end:]])
+
+
+def analyze_large(text: str, sample: bool, rules_path: Optional[str] = None,
+                  rules_version: Optional[str] = None) -> dict:
+    """Анализ длинного текста (выполняется в дочернем процессе)"""
+    rules = sync_rules(rules_path, rules_version)
+    return analyze_urgency(sample_text(text) if sample else text, rules)
+
+
+async def analyze_urgency_sized(text: str, rules: Optional[UrgencyRules] = None) -> dict:
+    """
+    Анализ срочности с выбором пути по длине текста
+
+    Args:
+        text: Текст сообщения
+        rules: Набор правил (по умолчанию активный)
+
+    Returns:
+        Тот же результат, что и analyze_urgency
+    """
+    if rules is None:
+        rules = get_urgency_rules()
+
+    start = time.perf_counter()
+    if len(text) <= CLASSIFY_INLINE_MAX_CHARS:
+        result = analyze_urgency(text, rules)
+        offload_stats.record("inline", len(text), time.perf_counter() - start)
+        return result
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        get_pool(), analyze_large, text, CLASSIFY_OFFLOAD_SAMPLE, rules.path, rules.version
+    )
+    path = "offload_sampled" if CLASSIFY_OFFLOAD_SAMPLE else "offload_full"
+    offload_stats.record(path, len(text), time.perf_counter() - start)
+    return result
@@ -0,0 +1,57 @@
+"""
+Keyset Pagination for Arenadata Feedback System
+Курсоры для постраничного вывода по (created_at, id)
+
+Курсор - непрозрачная строка для клиента: позиция последней (или первой)
+строки страницы и направление. Следующая страница выбирается условием
+(created_at, id) < позиция по индексу, без OFFSET, поэтому глубокие
+страницы стоят столько же, сколько первая.
+"""
+
+import base64
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import orjson
+
+DIRECTIONS = ("next", "prev")
+
+
+class InvalidCursorError(ValueError):
+    """Курсор поврежден или создан не этим API"""
+
+
+class Cursor(NamedTuple):
+    """Позиция в списке, отсортированном по ([rank DESC,] created_at DESC, id DESC)"""
+    created_at: datetime
+    id: int
+    direction: str  # 'next' - строки дальше по сортировке, 'prev' - ближе к началу
+    rank: Optional[float] = None  # Релевантность для результатов поиска
+
+
+def encode_cursor(created_at: datetime, row_id: int, direction: str, rank: Optional[float] = None) -> str:
+    """Курсор для ссылки на следующую ('next') или предыдущую ('prev') страницу"""
+    position = [created_at.isoformat(), row_id, direction]
+    if rank is not None:
+        position.append(rank)
+    payload = orjson.dumps(position)
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """
+    Разобрать курсор из запроса
+
+    Raises:
+        InvalidCursorError: Курсор не разбирается
+    """
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, row_id, direction, *rank = orjson.loads(payload)
+        cursor = Cursor(datetime.fromisoformat(created_at), int(row_id), direction,
+                        float(rank[0]) if rank else None)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Некорректный курсор страницы") from e
+    if cursor.direction not in DIRECTIONS:
+        raise InvalidCursorError("Некорректный курсор страницы")
+    return cursor
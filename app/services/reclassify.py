@@ -0,0 +1,365 @@
+"""
+Reclassification Job for Arenadata Feedback System
+Пересчет urgency, category, tags и priority_score у сохраненных отзывов
+
+Запускается из админки (POST /api/admin/reclassify) или из командной строки:
+    python -m app.services.reclassify --batch-size 1000 --workers 4
+
+Строки читаются серверным курсором по возрастанию id, классифицируются
+пачками и записываются через UPDATE ... FROM (VALUES ...) вместе
+с контрольной точкой в backfill_jobs. После остановки или падения
+задача продолжается с последнего сохраненного id.
+"""
+
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import engine
+from app.services.batch import enrich_chunk, get_pool, shutdown_pool
+from app.services.classifier import classifier
+from app.services import stats_cache
+from app.services.keyword_matcher import MATCH_MODE
+from app.services.urgency import get_urgency_rules
+
+RECLASSIFY_BATCH_SIZE = int(os.getenv("RECLASSIFY_BATCH_SIZE", "1000"))
+RECLASSIFY_WORKERS = int(os.getenv("RECLASSIFY_WORKERS", "1"))
+# Пауза между пачками и ограничение скорости, чтобы не мешать живому трафику
+RECLASSIFY_PAUSE_MS = float(os.getenv("RECLASSIFY_PAUSE_MS", "100"))
+RECLASSIFY_MAX_ROWS_PER_SEC = float(os.getenv("RECLASSIFY_MAX_ROWS_PER_SEC", "0"))
+RECLASSIFY_LOCK_TIMEOUT_MS = int(os.getenv("RECLASSIFY_LOCK_TIMEOUT_MS", "2000"))
+
+JOB_NAME = "reclassify"
+# Ключ advisory lock: одновременно работает только одна задача (CLI или админка)
+_ADVISORY_LOCK_KEY = 730_600_801
+_LOCK_RETRIES = 5
+
+# Пересчитываемые колонки и их типы для VALUES
+_FIELDS = ["urgency", "urgency_confidence", "urgency_reason", "category", "tags", "priority_score"]
+_TYPES = {
+    "id": "integer",
+    "urgency": "varchar",
+    "urgency_confidence": "double precision",
+    "urgency_reason": "text",
+    "category": "varchar",
+    "tags": "varchar[]",
+    "priority_score": "integer"
+}
+
+
+class JobAlreadyRunningError(Exception):
+    """Задача пересчета уже выполняется в другом процессе или потоке"""
+
+
+def current_rules_version() -> str:
+    """Версия правил, от которой зависит результат пересчета"""
+    return f"urgency:{get_urgency_rules().version}/classifier:{classifier.rules_version}/match:{MATCH_MODE}"
+
+
+def get_job_status() -> Optional[Dict[str, Any]]:
+    """Состояние задачи пересчета (None, если еще не запускалась)"""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT * FROM backfill_jobs WHERE name = :name"), {"name": JOB_NAME}
+        ).mappings().first()
+        active = conn.execute(
+            text("SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND objid = :key)"),
+            {"key": _ADVISORY_LOCK_KEY}
+        ).scalar()
+
+    if row is None:
+        return None
+    status = dict(row)
+    status["active"] = bool(active)
+    status["current_rules_version"] = current_rules_version()
+    return status
+
+
+def request_stop() -> bool:
+    """
+    Попросить работающую задачу остановиться после текущей пачки
+
+    Returns:
+        True, если задача выполнялась
+    """
+    with engine.begin() as conn:
+        result = conn.execute(
+            text("UPDATE backfill_jobs SET status = 'stopping', updated_at = NOW() "
+                 "WHERE name = :name AND status = 'running'"),
+            {"name": JOB_NAME}
+        )
+    return result.rowcount > 0
+
+
+def build_update(rows: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Собрать UPDATE feedbacks ... FROM (VALUES ...) для пачки строк
+
+    Args:
+        rows: Словари с id и пересчитанными колонками
+
+    Returns:
+        SQL и параметры
+    """
+    columns = ["id"] + _FIELDS
+    params: Dict[str, Any] = {}
+    values = []
+    for i, row in enumerate(rows):
+        placeholders = []
+        for column in columns:
+            name = f"{column}_{i}"
+            params[name] = row[column]
+            placeholders.append(f"CAST(:{name} AS {_TYPES[column]})")
+        values.append("(" + ", ".join(placeholders) + ")")
+
+    sql = (
+        "UPDATE feedbacks AS f SET "
+        + ", ".join(f"{field} = v.{field}" for field in _FIELDS)
+        + " FROM (VALUES " + ", ".join(values) + ") AS v(" + ", ".join(columns) + ")"
+        + " WHERE f.id = v.id"
+    )
+    return sql, params
+
+
+def run_reclassify(batch_size: int = RECLASSIFY_BATCH_SIZE, workers: int = RECLASSIFY_WORKERS,
+                   pause_ms: float = RECLASSIFY_PAUSE_MS,
+                   max_rows_per_sec: float = RECLASSIFY_MAX_ROWS_PER_SEC,
+                   restart: bool = False,
+                   progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Пересчитать классификацию всех отзывов
+
+    Args:
+        batch_size: Строк в пачке (классификация и один UPDATE)
+        workers: Процессов для классификации (1 - в текущем процессе)
+        pause_ms: Пауза после каждой пачки
+        max_rows_per_sec: Ограничение скорости (0 - без ограничения)
+        restart: Начать заново, игнорируя контрольную точку
+        progress: Вызывается после каждой пачки с состоянием задачи
+
+    Returns:
+        Итоговое состояние задачи
+
+    Raises:
+        JobAlreadyRunningError: Задача уже выполняется
+    """
+    version = current_rules_version()
+
+    with engine.connect() as read_conn, engine.connect() as write_conn:
+        if not read_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ADVISORY_LOCK_KEY}).scalar():
+            raise JobAlreadyRunningError("Пересчет уже выполняется")
+        read_conn.commit()
+
+        try:
+            state = _start_job(write_conn, version, restart)
+            try:
+                state = _process(read_conn, write_conn, state, batch_size, workers,
+                                 pause_ms, max_rows_per_sec, progress)
+            except Exception as e:
+                write_conn.rollback()
+                _finish_job(write_conn, "failed", error=str(e))
+                raise
+            return state
+        finally:
+            read_conn.rollback()
+            read_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            read_conn.commit()
+
+
+def _start_job(conn, version: str, restart: bool) -> Dict[str, Any]:
+    """Создать задачу или продолжить с контрольной точки"""
+    job = conn.execute(
+        text("SELECT * FROM backfill_jobs WHERE name = :name FOR UPDATE"), {"name": JOB_NAME}
+    ).mappings().first()
+
+    # Продолжаем только незавершенный пересчет с теми же правилами
+    resume = (
+        job is not None and not restart
+        and job["status"] != "completed" and job["rules_version"] == version
+    )
+    last_id = job["last_id"] if resume else 0
+    total = conn.execute(text("SELECT count(*) FROM feedbacks WHERE id > :last_id"), {"last_id": last_id}).scalar()
+
+    if job is None:
+        conn.execute(text(
+            "INSERT INTO backfill_jobs (name, rules_version, status, last_id, processed, updated, "
+            "total_estimate, started_at, updated_at) "
+            "VALUES (:name, :version, 'running', 0, 0, 0, :total, NOW(), NOW())"
+        ), {"name": JOB_NAME, "version": version, "total": total})
+    elif resume:
+        conn.execute(text(
+            "UPDATE backfill_jobs SET status = 'running', error = NULL, finished_at = NULL, "
+            "total_estimate = processed + :total, updated_at = NOW() WHERE name = :name"
+        ), {"name": JOB_NAME, "total": total})
+    else:
+        conn.execute(text(
+            "UPDATE backfill_jobs SET rules_version = :version, status = 'running', last_id = 0, "
+            "processed = 0, updated = 0, total_estimate = :total, error = NULL, "
+            "started_at = NOW(), finished_at = NULL, updated_at = NOW() WHERE name = :name"
+        ), {"name": JOB_NAME, "version": version, "total": total})
+    conn.commit()
+
+    return dict(conn.execute(
+        text("SELECT * FROM backfill_jobs WHERE name = :name"), {"name": JOB_NAME}
+    ).mappings().one())
+
+
+def _finish_job(conn, status: str, error: Optional[str] = None) -> Dict[str, Any]:
+    state = conn.execute(text(
+        "UPDATE backfill_jobs SET status = :status, error = :error, finished_at = NOW(), "
+        "updated_at = NOW() WHERE name = :name RETURNING *"
+    ), {"name": JOB_NAME, "status": status, "error": error}).mappings().one()
+    conn.commit()
+    return dict(state)
+
+
+def _process(read_conn, write_conn, state: Dict[str, Any], batch_size: int, workers: int,
+             pause_ms: float, max_rows_per_sec: float,
+             progress: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+    # Серверный курсор: строки приходят порциями, таблица не читается в память целиком
+    result = read_conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(text(
+        "SELECT id, form_type, COALESCE(NULLIF(message, ''), problem_text, '') AS text, "
+        + ", ".join(_FIELDS) + " FROM feedbacks WHERE id > :last_id ORDER BY id"
+    ), {"last_id": state["last_id"]})
+    partitions = (list(partition) for partition in result.mappings().partitions(batch_size))
+
+    started = time.monotonic()
+    processed_here = 0
+    for rows, classifications in _classified(partitions, workers):
+        changed = [_changed(row, classification) for row, classification in zip(rows, classifications)]
+        changed = [row for row in changed if row is not None]
+
+        state = _write_batch(write_conn, changed, last_id=rows[-1]["id"], processed=len(rows))
+        processed_here += len(rows)
+        if progress is not None:
+            progress(state)
+        if state["status"] == "stopping":
+            return _finish_job(write_conn, "paused")
+
+        # Пауза и ограничение скорости
+        delay = pause_ms / 1000
+        if max_rows_per_sec > 0:
+            delay = max(delay, processed_here / max_rows_per_sec - (time.monotonic() - started))
+        if delay > 0:
+            time.sleep(delay)
+
+    return _finish_job(write_conn, "completed")
+
+
+def _classified(partitions, workers: int):
+    """Пачки строк вместе с результатами enrich_chunk, в исходном порядке"""
+    if workers <= 1:
+        for rows in partitions:
+            yield rows, enrich_chunk([(row["text"], row["form_type"]) for row in rows])
+        return
+
+    # Несколько пачек классифицируются параллельно, пока пишется текущая
+    rules = get_urgency_rules()
+    pool = get_pool()
+    in_flight: deque = deque()
+    for rows in partitions:
+        items = [(row["text"], row["form_type"]) for row in rows]
+        in_flight.append((rows, pool.submit(enrich_chunk, items, rules.path, rules.version)))
+        if len(in_flight) >= workers:
+            done_rows, future = in_flight.popleft()
+            yield done_rows, future.result()
+    while in_flight:
+        done_rows, future = in_flight.popleft()
+        yield done_rows, future.result()
+
+
+def _changed(row, classification: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Новые значения колонок или None, если классификация не изменилась"""
+    new = {field: classification[field] for field in _FIELDS}
+    new["tags"] = sorted(new["tags"]) or None
+
+    same = all(row[field] == new[field] for field in _FIELDS if field != "tags")
+    if same and set(row["tags"] or ()) == set(new["tags"] or ()):
+        return None
+    return {"id": row["id"], **new}
+
+
+def _write_batch(conn, changed: List[Dict[str, Any]], last_id: int, processed: int) -> Dict[str, Any]:
+    """UPDATE измененных строк и контрольная точка одной транзакцией"""
+    for attempt in range(_LOCK_RETRIES):
+        try:
+            # Не ждем долго строки, заблокированные живыми запросами
+            conn.execute(text(f"SET LOCAL lock_timeout = {int(RECLASSIFY_LOCK_TIMEOUT_MS)}"))
+            if changed:
+                sql, params = build_update(changed)
+                conn.execute(text(sql), params)
+            state = conn.execute(text(
+                "UPDATE backfill_jobs SET last_id = :last_id, processed = processed + :processed, "
+                "updated = updated + :updated, updated_at = NOW() WHERE name = :name RETURNING *"
+            ), {"name": JOB_NAME, "last_id": last_id, "processed": processed,
+                "updated": len(changed)}).mappings().one()
+            conn.commit()
+            if changed:
+                stats_cache.invalidate()
+            return dict(state)
+        except OperationalError as e:
+            conn.rollback()
+            if "lock timeout" not in str(e) or attempt == _LOCK_RETRIES - 1:
+                raise
+            time.sleep(0.5 * (attempt + 1))
+
+
+_thread: Optional[threading.Thread] = None
+
+
+def start_in_background(**options) -> None:
+    """
+    Запустить пересчет в фоновом потоке (для админки)
+
+    Raises:
+        JobAlreadyRunningError: Задача уже выполняется
+    """
+    global _thread
+
+    status = get_job_status()
+    if (_thread is not None and _thread.is_alive()) or (status is not None and status["active"]):
+        raise JobAlreadyRunningError("Пересчет уже выполняется")
+
+    _thread = threading.Thread(target=_run_quietly, kwargs=options, daemon=True)
+    _thread.start()
+
+
+def _run_quietly(**options) -> None:
+    try:
+        state = run_reclassify(**options)
+        print(f"Reclassification {state['status']}: {state['processed']} processed, {state['updated']} updated")
+    except Exception as e:
+        print(f"Reclassification failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пересчет классификации сохраненных отзывов")
+    parser.add_argument("--batch-size", type=int, default=RECLASSIFY_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=RECLASSIFY_WORKERS)
+    parser.add_argument("--pause-ms", type=float, default=RECLASSIFY_PAUSE_MS)
+    parser.add_argument("--max-rows-per-sec", type=float, default=RECLASSIFY_MAX_ROWS_PER_SEC)
+    parser.add_argument("--restart", action="store_true", help="Игнорировать контрольную точку")
+    args = parser.parse_args()
+
+    def report(state: Dict[str, Any]) -> None:
+        total = state["total_estimate"] or 0
+        print(f"\r{state['processed']}/{total} processed, {state['updated']} updated, "
+              f"last id {state['last_id']}", end="", flush=True)
+
+    try:
+        state = run_reclassify(args.batch_size, args.workers, args.pause_ms,
+                               args.max_rows_per_sec, args.restart, report)
+    finally:
+        shutdown_pool()
+    print(f"\nReclassification {state['status']} ({datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S} UTC)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""
+Analytics Rollups for Arenadata Feedback System
+Инкрементальные агрегаты отзывов по дням в таблице analytics
+
+Триггеры на feedbacks (16_analytics_rollups.sql) пишут изменения
+счетчиков по (день UTC, тип формы) в analytics_deltas - только INSERT,
+поэтому запись отзывов не ждет на общей строке сегодняшнего дня.
+Приложение раз в ROLLUP_FOLD_INTERVAL секунд сворачивает дельты пакетами
+по ROLLUP_FOLD_BATCH в строки analytics (metric_type = 'daily_stats'):
+одно обновление строки дня за пакет вместо обновления на каждый отзыв.
+
+Сверка (reconcile) пересчитывает дни по feedbacks и исправляет
+расхождения (ручные правки, потерянные дельты): последние
+ROLLUP_RECONCILE_DAYS дней раз в ROLLUP_RECONCILE_INTERVAL секунд.
+Полный пересчет всех дней отмечается в analytics_backfills; планировщик
+запускает его сам, если отметки нет (первый старт после миграции).
+Агрегаты готовы (ready), когда триггеры на месте и полный пересчет
+завершен; до этого дашборды читают другой источник (stats_views).
+Сворачивает и сверяет один воркер - тот, кто взял advisory lock.
+
+Пересчитать все дни вручную (например, после отключения триггеров):
+    python -m app.services.rollups --reconcile-all
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.services import stats_cache
+
+# Секунды между свертками дельт, 0 - не сворачивать
+ROLLUP_FOLD_INTERVAL = float(os.getenv("ROLLUP_FOLD_INTERVAL", "5"))
+# Дельт за одну транзакцию свертки
+ROLLUP_FOLD_BATCH = int(os.getenv("ROLLUP_FOLD_BATCH", "10000"))
+# Секунды между сверками с feedbacks, 0 - только вручную
+ROLLUP_RECONCILE_INTERVAL = float(os.getenv("ROLLUP_RECONCILE_INTERVAL", "3600"))
+ROLLUP_RECONCILE_DAYS = int(os.getenv("ROLLUP_RECONCILE_DAYS", "3"))
+
+METRIC_TYPE = "daily_stats"
+# Ключ pg_try_advisory_lock: свертка и сверка идут в одном воркере
+_ROLLUP_LOCK_KEY = 724002
+# Триггеры 16_analytics_rollups.sql: без них дельты не пишутся
+TRIGGERS = ("feedbacks_analytics_insert", "feedbacks_analytics_update", "feedbacks_analytics_delete")
+# Секунды, на которые запоминается состояние агрегатов (rollup_state)
+_STATE_CHECK_INTERVAL = 30.0
+
+# Счетчик -> выражение по строке feedbacks (как в feedbacks_analytics_delta())
+COUNTERS = {
+    "total_feedbacks": "COUNT(*)",
+    "critical_feedbacks": "COUNT(*) FILTER (WHERE urgency = 'high')",
+    "resolved_feedbacks": "COUNT(*) FILTER (WHERE status = 'resolved')",
+    "new_feedbacks": "COUNT(*) FILTER (WHERE status = 'new')",
+    "in_progress_feedbacks": "COUNT(*) FILTER (WHERE status = 'in_progress')",
+    "rejected_feedbacks": "COUNT(*) FILTER (WHERE status = 'rejected')",
+    "medium_feedbacks": "COUNT(*) FILTER (WHERE urgency = 'medium')",
+    "low_feedbacks": "COUNT(*) FILTER (WHERE urgency = 'low')",
+    "normal_feedbacks": "COUNT(*) FILTER (WHERE urgency = 'normal')",
+    "response_time_sum": "COALESCE(SUM(response_time_seconds) FILTER (WHERE status = 'resolved'), 0)",
+    "response_time_count": "COUNT(response_time_seconds) FILTER (WHERE status = 'resolved')",
+    "satisfaction_sum": "COALESCE(SUM(satisfaction_score) FILTER (WHERE satisfaction_score > 0), 0)",
+    "satisfaction_count": "COUNT(*) FILTER (WHERE satisfaction_score > 0)",
+}
+
+_COLUMNS = ", ".join(COUNTERS)
+
+
+def _averages(value) -> str:
+    """Средние (хранятся рядом с суммами) по выражениям value(счетчик)"""
+    return (
+        f"ROUND({value('response_time_sum')}::numeric / NULLIF({value('response_time_count')}, 0) / 60, 2), "
+        f"ROUND({value('satisfaction_sum')}::numeric / NULLIF({value('satisfaction_count')}, 0), 2)"
+    )
+
+
+def _plain(column: str) -> str:
+    return column
+
+
+def _added(column: str) -> str:
+    return f"(COALESCE(a.{column}, 0) + EXCLUDED.{column})"
+
+
+_FOLD_SQL = f"""
+WITH folded AS (
+    DELETE FROM analytics_deltas WHERE id IN (
+        SELECT id FROM analytics_deltas ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *
+), sums AS (
+    SELECT metric_date, form_type, {", ".join(f"SUM({c}) AS {c}" for c in COUNTERS)}
+    FROM folded
+    GROUP BY metric_date, form_type
+), upserted AS (
+    INSERT INTO analytics AS a (
+        metric_type, metric_date, form_type, {_COLUMNS},
+        avg_response_time_minutes, satisfaction_avg, updated_at
+    )
+    SELECT '{METRIC_TYPE}', metric_date, form_type, {_COLUMNS}, {_averages(_plain)}, NOW()
+    FROM sums
+    ON CONFLICT (metric_type, metric_date, form_type) DO UPDATE SET
+        {", ".join(f"{c} = {_added(c)}" for c in COUNTERS)},
+        (avg_response_time_minutes, satisfaction_avg) = ({_averages(_added)}),
+        updated_at = NOW()
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM folded), (SELECT COUNT(*) FROM upserted)
+"""
+
+# День UTC, как в триггере: верно для created_at TIMESTAMP (03_create_tables.sql)
+# и TIMESTAMP WITH TIME ZONE (app/models.py), не зависит от TimeZone сессии
+_UTC_DAY = "(created_at::timestamptz AT TIME ZONE 'UTC')::date"
+
+# Границы по created_at с запасом в сутки (любой часовой пояс сессии) -
+# для индекса, точные - по дню UTC
+_RECONCILE_SQL = f"""
+WITH fresh AS (
+    SELECT {_UTC_DAY} AS metric_date, form_type,
+        {", ".join(f"{expression} AS {c}" for c, expression in COUNTERS.items())}
+    FROM feedbacks
+    WHERE created_at >= :since AND created_at < :until
+        AND {_UTC_DAY} >= :first_day AND {_UTC_DAY} < :after_last_day
+    GROUP BY 1, 2
+), upserted AS (
+    INSERT INTO analytics AS a (
+        metric_type, metric_date, form_type, {_COLUMNS},
+        avg_response_time_minutes, satisfaction_avg, updated_at
+    )
+    SELECT '{METRIC_TYPE}', metric_date, form_type, {_COLUMNS}, {_averages(_plain)}, NOW()
+    FROM fresh
+    ON CONFLICT (metric_type, metric_date, form_type) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in COUNTERS)},
+        avg_response_time_minutes = EXCLUDED.avg_response_time_minutes,
+        satisfaction_avg = EXCLUDED.satisfaction_avg,
+        updated_at = NOW()
+    WHERE ({", ".join(f"a.{c}" for c in COUNTERS)}) IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in COUNTERS)})
+    RETURNING 1
+), removed AS (
+    DELETE FROM analytics a
+    WHERE a.metric_type = '{METRIC_TYPE}' AND a.metric_date >= :first_day AND a.metric_date < :after_last_day
+        AND NOT EXISTS (SELECT 1 FROM fresh f WHERE f.metric_date = a.metric_date AND f.form_type = a.form_type)
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM fresh), (SELECT COUNT(*) FROM upserted), (SELECT COUNT(*) FROM removed)
+"""
+
+
+_STATE_SQL = """
+SELECT
+    (SELECT COUNT(*) FROM pg_trigger
+     WHERE tgrelid = 'feedbacks'::regclass AND tgname = ANY(:triggers) AND tgenabled <> 'D'),
+    (SELECT completed_at FROM analytics_backfills WHERE metric_type = :metric_type)
+"""
+
+_BACKFILLED_SQL = """
+INSERT INTO analytics_backfills (metric_type, completed_at) VALUES (:metric_type, NOW())
+ON CONFLICT (metric_type) DO UPDATE SET completed_at = EXCLUDED.completed_at
+"""
+
+
+class RollupStats:
+    """Счетчики свертки и сверки для /metrics"""
+
+    def __init__(self):
+        self.folds = 0
+        self.deltas_folded = 0
+        self.rows_upserted = 0
+        self.reconciles = 0
+        self.rows_repaired = 0
+        self.lock_skips = 0
+        self.errors = 0
+        self.last_fold_ms = 0.0
+        self.last_reconcile_ms = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fold_interval_seconds": ROLLUP_FOLD_INTERVAL,
+            "reconcile_interval_seconds": ROLLUP_RECONCILE_INTERVAL,
+            "folds": self.folds,
+            "deltas_folded": self.deltas_folded,
+            "rows_upserted": self.rows_upserted,
+            "reconciles": self.reconciles,
+            "rows_repaired": self.rows_repaired,
+            "lock_skips": self.lock_skips,
+            "errors": self.errors,
+            "last_fold_ms": round(self.last_fold_ms, 1),
+            "last_reconcile_ms": round(self.last_reconcile_ms, 1),
+            "triggers": _state["triggers"],
+            "backfilled_at": _state["backfilled_at"].isoformat() if _state["backfilled_at"] else None
+        }
+
+
+rollup_stats = RollupStats()
+
+# Последнее прочитанное состояние агрегатов (rollup_state)
+_state: Dict[str, Any] = {"checked_at": None, "triggers": False, "backfilled_at": None}
+
+
+def rollup_state(max_age: float = _STATE_CHECK_INTERVAL) -> Dict[str, Any]:
+    """
+    Триггеры на feedbacks и время полного пересчета (не старше max_age секунд)
+
+    Returns:
+        {'triggers': все триггеры есть и включены, 'backfilled_at': datetime или None};
+        без миграции 16 - {'triggers': False, 'backfilled_at': None}
+    """
+    now = time.monotonic()
+    if _state["checked_at"] is None or now - _state["checked_at"] >= max_age:
+        try:
+            with engine.connect() as conn:
+                triggers, backfilled_at = conn.execute(
+                    text(_STATE_SQL), {"triggers": list(TRIGGERS), "metric_type": METRIC_TYPE}
+                ).one()
+            _state.update(triggers=triggers == len(TRIGGERS), backfilled_at=backfilled_at)
+        except DBAPIError:
+            # Нет analytics_backfills: миграция 16 не применена
+            _state.update(triggers=False, backfilled_at=None)
+        _state["checked_at"] = now
+    return {"triggers": _state["triggers"], "backfilled_at": _state["backfilled_at"]}
+
+
+def ready() -> bool:
+    """Агрегаты полны: триггеры пишут дельты и полный пересчет завершен"""
+    state = rollup_state()
+    return state["triggers"] and state["backfilled_at"] is not None
+
+
+@contextmanager
+def _rollup_lock(conn):
+    """True, если advisory lock взят (снимается на выходе), False - занят другим воркером"""
+    locked = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _ROLLUP_LOCK_KEY}).scalar()
+    conn.commit()
+    if not locked:
+        rollup_stats.lock_skips += 1
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        conn.rollback()
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _ROLLUP_LOCK_KEY})
+        conn.commit()
+
+
+def fold_deltas(batch: int = ROLLUP_FOLD_BATCH) -> Optional[Dict[str, int]]:
+    """
+    Свернуть накопленные дельты в analytics (пакет - одна транзакция)
+
+    Returns:
+        {'deltas': свернуто дельт, 'rows': обновлено строк analytics} или None (сворачивает другой воркер)
+    """
+    start = time.perf_counter()
+    folded = upserted = 0
+    with engine.connect() as conn, _rollup_lock(conn) as locked:
+        if not locked:
+            return None
+        while True:
+            deltas, rows = conn.execute(text(_FOLD_SQL), {"batch": batch}).one()
+            conn.commit()
+            folded += deltas
+            upserted += rows
+            if deltas < batch:
+                break
+    rollup_stats.folds += 1
+    rollup_stats.deltas_folded += folded
+    rollup_stats.rows_upserted += upserted
+    rollup_stats.last_fold_ms = (time.perf_counter() - start) * 1000
+    if upserted:
+        stats_cache.invalidate()
+    return {"deltas": folded, "rows": upserted}
+
+
+def _day_bound(day: date, shift: int) -> datetime:
+    """Полночь day со сдвигом shift суток, без часового пояса (сравнивается с created_at любого типа)"""
+    return datetime.combine(day + timedelta(days=shift), dt_time.min)
+
+
+def reconcile(first_day: Optional[date] = None, last_day: Optional[date] = None) -> Optional[Dict[str, int]]:
+    """
+    Пересчитать дни first_day..last_day (UTC, None - без границы) по feedbacks
+
+    Одна транзакция REPEATABLE READ: агрегаты считаются по снимку feedbacks,
+    и удаляются дельты этих дней, видимые в том же снимке (они уже учтены).
+    Дельты транзакций, завершившихся позже снимка, остаются и будут свернуты.
+    Пересчет всех дней (обе границы None) отмечается в analytics_backfills.
+
+    Returns:
+        {'rows': строк (день, тип формы) по feedbacks, 'repaired': исправлено строк analytics,
+         'removed': удалено строк без отзывов} или None (занято другим воркером)
+    """
+    start = time.perf_counter()
+    full = first_day is None and last_day is None
+    first_day = first_day or date(1970, 1, 1)
+    after_last_day = last_day + timedelta(days=1) if last_day else date(9999, 1, 1)
+    with engine.connect() as conn, _rollup_lock(conn) as locked:
+        if not locked:
+            return None
+        conn = conn.execution_options(isolation_level="REPEATABLE READ")
+        rows, repaired, removed = conn.execute(text(_RECONCILE_SQL), {
+            "since": _day_bound(first_day, -1),
+            "until": _day_bound(after_last_day, 1),
+            "first_day": first_day,
+            "after_last_day": after_last_day
+        }).one()
+        conn.execute(
+            text("DELETE FROM analytics_deltas WHERE metric_date >= :first_day AND metric_date < :after_last_day"),
+            {"first_day": first_day, "after_last_day": after_last_day}
+        )
+        if full:
+            conn.execute(text(_BACKFILLED_SQL), {"metric_type": METRIC_TYPE})
+        conn.commit()
+    if full:
+        # Перечитать состояние при следующей проверке
+        _state["checked_at"] = None
+    rollup_stats.reconciles += 1
+    rollup_stats.rows_repaired += repaired + removed
+    rollup_stats.last_reconcile_ms = (time.perf_counter() - start) * 1000
+    if repaired or removed:
+        stats_cache.invalidate()
+    return {"rows": rows, "repaired": repaired, "removed": removed}
+
+
+def reconcile_recent(days: int = ROLLUP_RECONCILE_DAYS) -> Optional[Dict[str, int]]:
+    """Сверить последние days дней (UTC), включая сегодняшний"""
+    today = datetime.now(timezone.utc).date()
+    return reconcile(today - timedelta(days=days - 1), today)
+
+
+def freshness(db: Session) -> Dict[str, Any]:
+    """Свежесть агрегатов: они полны до самой старой несвернутой дельты"""
+    oldest = db.execute(text("SELECT created_at FROM analytics_deltas ORDER BY id LIMIT 1")).scalar()
+    return {"source": "rollups", "as_of": oldest or datetime.now(timezone.utc)}
+
+
+_rollup_task: Optional[asyncio.Task] = None
+
+
+async def _roll_up_periodically() -> None:
+    reconciled_at = None
+    while True:
+        try:
+            state = await asyncio.to_thread(rollup_state)
+            if not state["triggers"]:
+                # Миграция 16 не применена или триггеры отключены: дельт нет,
+                # дашборды читают другой источник
+                pass
+            elif state["backfilled_at"] is None:
+                # Первый старт после миграции: все дни по feedbacks (None - идет в другом воркере)
+                if await asyncio.to_thread(reconcile) is not None:
+                    reconciled_at = time.monotonic()
+            else:
+                await asyncio.to_thread(fold_deltas)
+                if ROLLUP_RECONCILE_INTERVAL > 0 and (
+                    reconciled_at is None or time.monotonic() - reconciled_at >= ROLLUP_RECONCILE_INTERVAL
+                ):
+                    await asyncio.to_thread(reconcile_recent)
+                    reconciled_at = time.monotonic()
+        except Exception as e:
+            rollup_stats.errors += 1
+            print(f"Error rolling up analytics: {e}")
+        await asyncio.sleep(ROLLUP_FOLD_INTERVAL)
+
+
+def start_scheduler() -> None:
+    """Периодическая свертка дельт и сверка (при старте приложения)"""
+    global _rollup_task
+    if _rollup_task is None and ROLLUP_FOLD_INTERVAL > 0:
+        _rollup_task = asyncio.create_task(_roll_up_periodically())
+
+
+async def stop_scheduler() -> None:
+    global _rollup_task
+    if _rollup_task is not None:
+        _rollup_task.cancel()
+        try:
+            await _rollup_task
+        except asyncio.CancelledError:
+            pass
+        _rollup_task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Агрегаты отзывов по дням в analytics")
+    parser.add_argument("--reconcile-all", action="store_true", help="Пересчитать все дни по feedbacks")
+    parser.add_argument("--reconcile-days", type=int, metavar="N", help="Пересчитать последние N дней")
+    args = parser.parse_args()
+
+    if args.reconcile_all:
+        result = reconcile()
+    elif args.reconcile_days:
+        result = reconcile_recent(args.reconcile_days)
+    else:
+        result = fold_deltas()
+    if result is None:
+        print("Rollup is running in another process")
+    else:
+        print(", ".join(f"{name}: {value}" for name, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
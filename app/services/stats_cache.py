@@ -0,0 +1,71 @@
+"""
+Dashboard Stats Cache for Arenadata Feedback System
+Кэш статистики дашбордов (/admin, /api/admin/dashboard) и графиков аналитики
+
+Статистика считается по всей таблице feedbacks, а вкладки админки
+обновляются автоматически, поэтому результат хранится STATS_CACHE_TTL
+секунд отдельно для каждого фильтра form_type. Пересчитывает значение
+один запрос, остальные на это время получают прежнее (SingleFlightCache).
+
+Запись отзыва сбрасывает кэш после commit: сессии SQLAlchemy отмечают
+изменения Feedback (flush объектов и ORM insert/update/delete), записи
+через соединение без сессии вызывают invalidate() сами. Сброс действует
+в своем процессе; в других воркерах значение устаревает по TTL.
+Сбрасываются все фильтры сразу: средние и отзывы по дням в статистике
+считаются по всем типам форм.
+"""
+
+import os
+from typing import Any, Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Feedback
+from app.services.cache import SingleFlightCache
+
+# Секунды, 0 - без кэша (каждый запрос считает статистику)
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "15"))
+# Ключей много у графиков аналитики: по одному на диапазон дат и интервал
+STATS_CACHE_SIZE = int(os.getenv("STATS_CACHE_SIZE", "1000"))
+
+stats_cache = SingleFlightCache(ttl=STATS_CACHE_TTL, maxsize=STATS_CACHE_SIZE)
+
+_CHANGED = "feedbacks_changed"
+
+
+def cached(key: Hashable, compute: Callable[[], Any]) -> Any:
+    """Значение по ключу (имя дашборда или графика, параметры) из кэша или compute()"""
+    return stats_cache.get(key, compute)
+
+
+def invalidate() -> None:
+    """Сбросить статистику после записи отзывов"""
+    stats_cache.invalidate()
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flushed(session, flush_context) -> None:
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, Feedback):
+            session.info[_CHANGED] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_executed(orm_execute_state) -> None:
+    # insert(Feedback)/update(Feedback) через session.execute минуют flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        if any(mapper.class_ is Feedback for mapper in orm_execute_state.all_mappers):
+            orm_execute_state.session.info[_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session) -> None:
+    if session.info.pop(_CHANGED, False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session) -> None:
+    session.info.pop(_CHANGED, None)
@@ -0,0 +1,411 @@
+"""
+Stats Views for Arenadata Feedback System
+Статистика дашбордов и аналитики из дневных агрегатов
+
+Представления daily_stats_materialized, weekly_stats_materialized и
+category_stats_materialized (05_views_and_materialized.sql,
+15_stats_views_refresh.sql) обновляет планировщик приложения раз в
+STATS_VIEWS_REFRESH_INTERVAL секунд: REFRESH MATERIALIZED VIEW CONCURRENTLY
+через refresh_stats_view(), чтение представлений при этом не блокируется.
+Обновляет один воркер - тот, кто взял advisory lock; время обновления
+пишется в stats_view_refreshes, и остальные воркеры не обновляют
+представление, пока оно не устареет.
+
+Дашборды читают дневную статистику (около тысячи строк вместо таблицы
+feedbacks) из источника STATS_SOURCE и сообщают в ответе, на какой
+момент посчитаны данные (freshness):
+- rollups - инкрементальные агрегаты analytics (app/services/rollups.py),
+  когда они готовы (rollups.ready); до этого - как views, а в freshness
+  pending = 'rollups';
+- views - daily_stats_materialized (при STATS_VIEWS_REFRESH_INTERVAL=0
+  представления не обновляются и статистика считается по feedbacks);
+- feedbacks - каждый раз по таблице feedbacks.
+Представления обновляются при любом STATS_SOURCE, если интервал не 0.
+
+Обновить представления сейчас:
+    python -m app.services.stats_views
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Date, Integer, Numeric, String, column, func, literal, select, table, text
+from sqlalchemy.orm import Session
+
+from app.crud import STATS_DAYS, STATS_FORM_TYPES, STATS_STATUSES, get_feedback_series, get_stats, series_buckets
+from app.database import engine
+from app.models import Analytics
+from app.services import rollups, stats_cache
+
+# Откуда дашборды берут статистику: rollups, views или feedbacks
+STATS_SOURCE = os.getenv("STATS_SOURCE", "rollups")
+# Секунды между обновлениями представлений, 0 - не обновлять
+STATS_VIEWS_REFRESH_INTERVAL = float(os.getenv("STATS_VIEWS_REFRESH_INTERVAL", "300"))
+
+STATS_VIEWS = ("daily_stats_materialized", "weekly_stats_materialized", "category_stats_materialized")
+# Ключ pg_try_advisory_lock: обновление идет в одном воркере
+_REFRESH_LOCK_KEY = 724001
+_URGENCIES = ("high", "medium", "low", "normal", "critical")
+
+daily_stats = table(
+    "daily_stats_materialized",
+    column("date", Date),
+    column("form_type", String),
+    column("total_feedbacks", Integer),
+    column("critical_feedbacks", Integer),
+    column("high_feedbacks", Integer),
+    column("medium_feedbacks", Integer),
+    column("low_feedbacks", Integer),
+    column("normal_feedbacks", Integer),
+    column("new_feedbacks", Integer),
+    column("in_progress_feedbacks", Integer),
+    column("resolved_feedbacks", Integer),
+    column("rejected_feedbacks", Integer),
+    column("resolved_response_time_sum", Numeric),
+    column("resolved_response_time_count", Integer),
+    column("satisfaction_sum", Numeric),
+    column("satisfaction_count", Integer),
+)
+
+
+class RefreshStats:
+    """Счетчики обновлений для /metrics"""
+
+    def __init__(self):
+        self.refreshes = 0
+        self.lock_skips = 0
+        self.errors = 0
+        self.last_ms: Dict[str, float] = {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": use_views(),
+            "interval_seconds": STATS_VIEWS_REFRESH_INTERVAL,
+            "refreshes": self.refreshes,
+            "lock_skips": self.lock_skips,
+            "errors": self.errors,
+            "last_ms": {view: round(ms, 1) for view, ms in self.last_ms.items()}
+        }
+
+
+refresh_stats = RefreshStats()
+
+
+def use_views() -> bool:
+    """Представления обновляет планировщик, их можно читать"""
+    return STATS_VIEWS_REFRESH_INTERVAL > 0
+
+
+def _daily_source():
+    """
+    Дневная статистика с колонками daily_stats_materialized и ее свежесть
+
+    Неготовые агрегаты rollups заменяются представлениями или feedbacks.
+    None - статистика считается по feedbacks.
+    """
+    if STATS_SOURCE == "rollups" and rollups.ready():
+        source = select(
+            Analytics.metric_date.label("date"),
+            Analytics.form_type,
+            Analytics.total_feedbacks,
+            Analytics.critical_feedbacks.label("high_feedbacks"),
+            Analytics.medium_feedbacks,
+            Analytics.low_feedbacks,
+            Analytics.normal_feedbacks,
+            literal(0).label("critical_feedbacks"),
+            Analytics.new_feedbacks,
+            Analytics.in_progress_feedbacks,
+            Analytics.resolved_feedbacks,
+            Analytics.rejected_feedbacks,
+            Analytics.response_time_sum.label("resolved_response_time_sum"),
+            Analytics.response_time_count.label("resolved_response_time_count"),
+            Analytics.satisfaction_sum,
+            Analytics.satisfaction_count,
+        ).where(Analytics.metric_type == rollups.METRIC_TYPE).subquery("daily_stats")
+        return source, rollups.freshness
+    if STATS_SOURCE != "feedbacks" and use_views():
+        return daily_stats, view_freshness
+    return None
+
+
+def refresh_views(force: bool = False) -> Dict[str, Any]:
+    """
+    Обновить устаревшие представления (force - все), если обновление не идет в другом воркере
+
+    Returns:
+        {'locked': False, 'refreshed': {view: мс}} или {'locked': True, 'refreshed': {}}
+    """
+    refreshed: Dict[str, float] = {}
+    with engine.connect() as conn:
+        locked = not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": _REFRESH_LOCK_KEY}).scalar()
+        conn.commit()
+        if locked:
+            refresh_stats.lock_skips += 1
+            return {"locked": True, "refreshed": refreshed}
+        try:
+            # Обновлено другим воркером меньше интервала назад - пропускаем
+            due_age = STATS_VIEWS_REFRESH_INTERVAL * 0.9
+            ages = dict(conn.execute(text(
+                "SELECT view_name, EXTRACT(EPOCH FROM NOW() - refreshed_at) FROM stats_view_refreshes"
+            )).all())
+            conn.commit()
+            for view in STATS_VIEWS:
+                if not force and view in ages and ages[view] < due_age:
+                    continue
+                start = time.perf_counter()
+                conn.execute(text("SELECT refresh_stats_view(:view)"), {"view": view})
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                # NOW() - начало транзакции: данные представления не старше этого момента
+                conn.execute(text(
+                    "INSERT INTO stats_view_refreshes (view_name, refreshed_at, duration_ms) "
+                    "VALUES (:view, NOW(), :ms) ON CONFLICT (view_name) "
+                    "DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at, duration_ms = EXCLUDED.duration_ms"
+                ), {"view": view, "ms": int(elapsed_ms)})
+                conn.commit()
+                refreshed[view] = elapsed_ms
+                refresh_stats.refreshes += 1
+                refresh_stats.last_ms[view] = elapsed_ms
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _REFRESH_LOCK_KEY})
+            conn.commit()
+    if refreshed:
+        stats_cache.invalidate()
+    return {"locked": False, "refreshed": refreshed}
+
+
+def view_freshness(db: Session, view: str = "daily_stats_materialized") -> Dict[str, Any]:
+    """Свежесть данных из представления: время последнего обновления (None - еще не обновлялось)"""
+    refreshed_at = db.execute(
+        text("SELECT refreshed_at FROM stats_view_refreshes WHERE view_name = :view"), {"view": view}
+    ).scalar()
+    return {"source": "views", "as_of": refreshed_at}
+
+
+def live_freshness() -> Dict[str, Any]:
+    """Свежесть статистики, посчитанной по feedbacks"""
+    return {"source": "feedbacks", "as_of": datetime.now(timezone.utc)}
+
+
+def freshness_report(freshness: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Свежесть для ответа: возраст данных на момент ответа (значение могло прийти из кэша)
+
+    pending - источник STATS_SOURCE, который еще не готов и заменен source.
+    """
+    as_of = freshness["as_of"]
+    age = (datetime.now(timezone.utc) - as_of).total_seconds() if as_of else None
+    pending = STATS_SOURCE if STATS_SOURCE != freshness["source"] and STATS_SOURCE != "feedbacks" else None
+    return {**freshness, "age_seconds": round(age, 1) if age is not None else None, "pending": pending}
+
+
+def _total(source, name: str):
+    return func.coalesce(func.sum(source.c[name]), 0).label(name)
+
+
+def dashboard_stats(db: Session, form_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Статистика /api/admin/dashboard (поля как у crud.get_stats) и ее свежесть
+
+    Из дневных агрегатов (_daily_source), при STATS_SOURCE=feedbacks - по feedbacks.
+    """
+    daily = _daily_source()
+    if daily is None:
+        return {**get_stats(db=db, form_type=form_type), "freshness": live_freshness()}
+    source, freshness = daily
+
+    days = [(datetime.utcnow() - timedelta(days=i)).date() for i in range(STATS_DAYS - 1, -1, -1)]
+    statuses = [f"{status}_feedbacks" for status in STATS_STATUSES]
+    cells = db.execute(
+        select(
+            source.c.form_type,
+            _total(source, "total_feedbacks"),
+            _total(source, "high_feedbacks"),
+            *[_total(source, name) for name in statuses],
+            _total(source, "resolved_response_time_sum"),
+            _total(source, "resolved_response_time_count"),
+            _total(source, "satisfaction_sum"),
+            _total(source, "satisfaction_count"),
+        ).group_by(source.c.form_type)
+    ).all()
+    by_day = dict(db.execute(
+        select(source.c.date, func.sum(source.c.total_feedbacks))
+        .where(source.c.date >= days[0]).group_by(source.c.date)
+    ).all())
+    scoped = [row for row in cells if not form_type or row.form_type == form_type]
+
+    response_count = sum(row.resolved_response_time_count for row in cells)
+    avg_response = (
+        Decimal(sum(row.resolved_response_time_sum for row in cells)) / response_count if response_count else 0
+    )
+    satisfaction_count = sum(row.satisfaction_count for row in cells)
+    avg_satisfaction = Decimal(sum(row.satisfaction_sum for row in cells)) / satisfaction_count if satisfaction_count else 0
+
+    feedbacks_by_type = {}
+    if not form_type:
+        for ft in STATS_FORM_TYPES:
+            feedbacks_by_type[ft] = sum(row.total_feedbacks for row in cells if row.form_type == ft)
+
+    return {
+        'total_feedbacks': sum(row.total_feedbacks for row in scoped),
+        'critical_feedbacks': sum(row.high_feedbacks for row in scoped),
+        'resolved_feedbacks': sum(row.resolved_feedbacks for row in scoped),
+        'avg_response_time_minutes': round(avg_response / 60, 2) if avg_response else 0,
+        'satisfaction_avg': round(float(avg_satisfaction), 2) if avg_satisfaction else 0,
+        'feedbacks_by_type': feedbacks_by_type,
+        'feedbacks_by_status': {
+            status: sum(getattr(row, f"{status}_feedbacks") for row in scoped) for status in STATS_STATUSES
+        },
+        'recent_feedbacks_by_day': [int(by_day.get(d, 0)) for d in days],
+        'freshness': freshness(db)
+    }
+
+
+def feedback_series(db: Session, start, end, bucket: str = "day") -> Dict[str, Any]:
+    """
+    Отзывы по интервалам (как crud.get_feedback_series) и свежесть данных
+
+    Дни группируются в недели и месяцы тем же date_trunc.
+    """
+    daily = _daily_source()
+    if daily is None:
+        return {**get_feedback_series(db, start, end, bucket), "freshness": live_freshness()}
+    source, freshness = daily
+
+    buckets = series_buckets(start, end, bucket)
+    bucket_start = func.date(func.date_trunc(bucket, source.c.date))
+    rows = db.execute(
+        select(
+            bucket_start.label("bucket"),
+            source.c.form_type,
+            func.sum(source.c.total_feedbacks).label("total"),
+            func.sum(source.c.high_feedbacks).label("critical"),
+        ).where(
+            source.c.date >= buckets[0],
+            bucket_start <= buckets[-1]
+        ).group_by(bucket_start, source.c.form_type)
+    ).all() if buckets else []
+
+    total: Dict[Any, int] = {}
+    critical: Dict[Any, int] = {}
+    form_types = {ft: 0 for ft in STATS_FORM_TYPES}
+    for row in rows:
+        total[row.bucket] = total.get(row.bucket, 0) + int(row.total)
+        critical[row.bucket] = critical.get(row.bucket, 0) + int(row.critical)
+        if row.form_type in form_types:
+            form_types[row.form_type] += int(row.total)
+    return {
+        'buckets': buckets,
+        'total': [total.get(b, 0) for b in buckets],
+        'critical': [critical.get(b, 0) for b in buckets],
+        'form_types': form_types,
+        'freshness': freshness(db)
+    }
+
+
+def _distribution(key: str, counts: Dict[str, int], total: int) -> List[Dict[str, Any]]:
+    """Распределение для графика; отзывы без значения (или с другим) - 'unknown'"""
+    items = [{key: name, "count": count} for name, count in counts.items() if count]
+    other = total - sum(counts.values())
+    if other:
+        items.append({key: "unknown", "count": other})
+    return items
+
+
+def panel_data(db: Session) -> Optional[Dict[str, Any]]:
+    """
+    Счетчики и графики HTML-дашборда /admin из дневных агрегатов
+
+    None - дневных агрегатов нет (_daily_source), данные считаются по feedbacks.
+    """
+    daily_source = _daily_source()
+    if daily_source is None:
+        return None
+    source, freshness = daily_source
+
+    row = db.execute(select(
+        _total(source, "total_feedbacks"),
+        *[_total(source, f"{urgency}_feedbacks") for urgency in _URGENCIES],
+        *[_total(source, f"{status}_feedbacks") for status in STATS_STATUSES],
+    )).one()
+    form_types = db.execute(
+        select(source.c.form_type, func.sum(source.c.total_feedbacks))
+        .group_by(source.c.form_type)
+    ).all()
+    start_date = (datetime.utcnow() - timedelta(days=7)).date()
+    daily = db.execute(
+        select(source.c.date, func.sum(source.c.total_feedbacks))
+        .where(source.c.date >= start_date)
+        .group_by(source.c.date).order_by(source.c.date)
+    ).all()
+
+    total = int(row.total_feedbacks)
+    return {
+        "stats": {
+            "total_feedbacks": total,
+            "high_feedbacks": int(row.high_feedbacks),
+            "new_feedbacks": int(row.new_feedbacks),
+            "resolved_feedbacks": int(row.resolved_feedbacks)
+        },
+        "daily_feedbacks": [{"date": str(day), "count": int(count)} for day, count in daily],
+        "urgency_data": _distribution(
+            "urgency", {urgency: int(getattr(row, f"{urgency}_feedbacks")) for urgency in _URGENCIES}, total
+        ),
+        "form_types": [{"type": form_type, "count": int(count)} for form_type, count in form_types],
+        "status_data": _distribution(
+            "status", {status: int(getattr(row, f"{status}_feedbacks")) for status in STATS_STATUSES}, total
+        ),
+        "freshness": freshness(db)
+    }
+
+
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def _refresh_periodically() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(refresh_views)
+        except Exception as e:
+            refresh_stats.errors += 1
+            print(f"Error refreshing stats views: {e}")
+        await asyncio.sleep(STATS_VIEWS_REFRESH_INTERVAL)
+
+
+def start_scheduler() -> None:
+    """Периодическое обновление представлений (при старте приложения)"""
+    global _refresh_task
+    if _refresh_task is None and use_views():
+        _refresh_task = asyncio.create_task(_refresh_periodically())
+
+
+async def stop_scheduler() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обновление материализованных представлений статистики")
+    parser.add_argument("--due", action="store_true", help="Только устаревшие (как планировщик)")
+    args = parser.parse_args()
+
+    result = refresh_views(force=not args.due)
+    if result["locked"]:
+        print("Refresh is running in another process")
+    for view, ms in result["refreshed"].items():
+        print(f"Refreshed {view} in {ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Token Index for Arenadata Feedback System
+Поиск ключевых слов по токенам с нормализацией словоформ (стемминг)
+
+Текст разбивается на токены один раз, каждый токен приводится к основе
+(Snowball: русский для кириллицы, английский для латиницы). Ключевые
+слова и фразы заранее разложены в инвертированный индекс
+"основа первого токена -> фразы", поэтому стоимость поиска зависит
+от длины текста, а не от размера словаря. 'сломался', 'сломалось'
+и 'сломан' совпадают с одним ключевым словом 'сломалось'.
+"""
+
+import re
+from typing import Dict, List, Set, Tuple
+
+import snowballstemmer
+
+from app.services.keyword_matcher import KeywordMatcher
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_CYRILLIC_RE = re.compile(r"[а-я]")
+_LATIN_RE = re.compile(r"^[a-z]+$")
+
+_russian = snowballstemmer.stemmer("russian")
+_english = snowballstemmer.stemmer("english")
+
+# Кэш основ: в текстах много повторов, а обычный dict.get заметно
+# дешевле вызова функции с lru_cache на каждом токене
+STEM_CACHE_SIZE = 200_000
+_stem_cache: Dict[str, str] = {}
+
+
+def stem(token: str) -> str:
+    """
+    Основа токена
+
+    Смешанные токены и токены с цифрами ('v2', '500', 'p0') не меняются.
+    """
+    cached = _stem_cache.get(token)
+    if cached is not None:
+        return cached
+
+    if _CYRILLIC_RE.search(token):
+        result = _russian.stemWord(token) if token.isalpha() else token
+    elif _LATIN_RE.match(token):
+        result = _english.stemWord(token)
+    else:
+        result = token
+
+    if len(_stem_cache) >= STEM_CACHE_SIZE:
+        _stem_cache.clear()
+    _stem_cache[token] = result
+    return result
+
+
+def tokenize(text: str) -> List[str]:
+    """Токены текста в нижнем регистре, 'ё' приводится к 'е'"""
+    return _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+def stems(text: str) -> List[str]:
+    """Основы всех токенов текста по порядку"""
+    get = _stem_cache.get
+    return [get(token) or stem(token) for token in tokenize(text)]
+
+
+class TokenMatcher(KeywordMatcher):
+    """
+    Поиск ключевых слов по основам токенов
+
+    Интерфейс совпадает с KeywordMatcher: find() возвращает исходные
+    ключевые слова, поэтому group_counts/first_group/group_hits
+    и вся логика классификатора работают без изменений.
+    Вес ключевого слова в группе - число его повторов в списке группы.
+    """
+
+    def _build(self) -> None:
+        # основа первого токена -> [(основы остальных токенов, ключевые слова)]
+        self._heads: Dict[str, List[Tuple[Tuple[str, ...], List[str]]]] = {}
+        phrases: Dict[Tuple[str, ...], List[str]] = {}
+        for keyword in self._index:
+            key = tuple(stems(keyword))
+            if key:
+                phrases.setdefault(key, []).append(keyword)
+
+        for key, keywords in phrases.items():
+            self._heads.setdefault(key[0], []).append((key[1:], keywords))
+
+    def find(self, text: str) -> Set[str]:
+        """
+        Найти ключевые слова, основы токенов которых идут в тексте подряд
+
+        Args:
+            text: Текст (регистр не важен)
+
+        Returns:
+            Множество найденных ключевых слов (в исходном написании)
+        """
+        if not text or not self._heads:
+            return set()
+
+        found: Set[str] = set()
+        text_stems = stems(text)
+        heads = self._heads
+        for position, token_stem in enumerate(text_stems):
+            candidates = heads.get(token_stem)
+            if candidates is None:
+                continue
+            for tail, keywords in candidates:
+                if not tail or tuple(text_stems[position + 1:position + 1 + len(tail)]) == tail:
+                    found.update(keywords)
+        return found
@@ -0,0 +1,199 @@
+"""
+Urgency Analysis Service for Arenadata Feedback System
+Определение срочности по версионируемым правилам из urgency_rules.json
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.services.cache import TTLCache, text_digest
+from app.services.keyword_matcher import make_matcher
+
+# Файл с правилами и период проверки его изменений (секунды)
+RULES_PATH = os.getenv(
+    "URGENCY_RULES_PATH",
+    os.path.join(os.path.dirname(__file__), "urgency_rules.json")
+)
+RULES_CHECK_INTERVAL = float(os.getenv("URGENCY_RULES_CHECK_INTERVAL", "30"))
+
+# Кэш результатов: повторные и одинаковые тексты не сканируются заново
+urgency_cache = TTLCache(
+    maxsize=int(os.getenv("CLASSIFY_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("CLASSIFY_CACHE_TTL", "300"))
+)
+
+
+class UrgencyRules:
+    """Скомпилированный набор правил срочности (после создания не меняется)"""
+
+    def __init__(self, version: str, keywords: Dict[str, list], path: Optional[str] = None,
+                 source_mtime: Optional[float] = None):
+        self.version = version
+        self.keywords = keywords
+        self.path = path
+        self.source_mtime = source_mtime
+        self.matcher = make_matcher(keywords)
+        # Ключ кэша результатов: правленый файл без смены version дает другой digest
+        self.digest = text_digest(json.dumps(keywords, ensure_ascii=False, sort_keys=True))
+        self.compiled_at = datetime.utcnow()
+
+    def metadata(self) -> Dict[str, Any]:
+        """Версия и время компиляции правил для ответа API"""
+        return {
+            "version": self.version,
+            "compiled_at": self.compiled_at.isoformat() + "Z"
+        }
+
+
+def load_rules(path: str = RULES_PATH) -> UrgencyRules:
+    """
+    Загрузить и скомпилировать правила из JSON файла
+
+    Args:
+        path: Путь к файлу правил
+
+    Returns:
+        Скомпилированные правила
+    """
+    source_mtime = os.path.getmtime(path)
+    with open(path, encoding="utf-8") as rules_file:
+        data = json.load(rules_file)
+
+    keywords = data["keywords"]
+    for level in ("high", "medium", "low"):
+        if not isinstance(keywords.get(level), list):
+            raise ValueError(f"В правилах срочности нет списка '{level}'")
+
+    # Порядок уровней важен: при равенстве очков побеждает более срочный
+    ordered = {level: keywords[level] for level in ("high", "medium", "low")}
+    return UrgencyRules(str(data["version"]), ordered, path=path, source_mtime=source_mtime)
+
+
+# Активные правила: ссылка заменяется целиком, запросы в работе
+# дорабатывают на том объекте, который успели получить
+_active_rules = load_rules()
+_reload_lock = threading.Lock()
+_last_check = time.monotonic()
+
+
+def get_urgency_rules() -> UrgencyRules:
+    """
+    Получить активные правила
+
+    Не чаще RULES_CHECK_INTERVAL проверяет, изменился ли файл правил,
+    и при изменении перекомпилирует их в фоновом потоке.
+    """
+    global _last_check
+
+    now = time.monotonic()
+    if RULES_CHECK_INTERVAL > 0 and now - _last_check >= RULES_CHECK_INTERVAL:
+        _last_check = now
+        rules = _active_rules
+        try:
+            changed = os.path.getmtime(rules.path) != rules.source_mtime
+        except OSError:
+            changed = False
+        if changed and not _reload_lock.locked():
+            threading.Thread(target=_reload_quietly, daemon=True).start()
+
+    return _active_rules
+
+
+def reload_urgency_rules(path: Optional[str] = None) -> UrgencyRules:
+    """
+    Перекомпилировать правила и атомарно подменить активный набор
+
+    Args:
+        path: Путь к файлу правил (по умолчанию текущий)
+
+    Returns:
+        Новые активные правила
+    """
+    global _active_rules
+
+    with _reload_lock:
+        rules = load_rules(path or _active_rules.path or RULES_PATH)
+        _active_rules = rules
+    return rules
+
+
+def _reload_quietly():
+    """Фоновая перезагрузка: ошибки в файле не ломают текущие правила"""
+    try:
+        rules = reload_urgency_rules()
+        print(f"Urgency rules reloaded: version {rules.version}")
+    except Exception as e:
+        print(f"Error reloading urgency rules: {e}")
+
+
+def analyze_urgency(text: str, rules: Optional[UrgencyRules] = None) -> dict:
+    """
+    Анализирует текст и определяет уровень срочности
+
+    Args:
+        text: Текст сообщения от клиента
+        rules: Набор правил (по умолчанию активный)
+
+    Returns:
+        dict: Уровень срочности и уверенность
+    """
+    if rules is None:
+        rules = get_urgency_rules()
+
+    # Приводим текст к нижнему регистру для анализа
+    text_lower = text.lower()
+
+    # Результат зависит только от текста в нижнем регистре, его длины и содержимого правил
+    cache_key = (rules.digest, len(text), text_digest(text_lower))
+    cached = urgency_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+
+    result = _score_urgency(text, text_lower, rules)
+    urgency_cache.set(cache_key, result)
+    return dict(result)
+
+
+def _score_urgency(text: str, text_lower: str, rules: UrgencyRules) -> dict:
+    """Подсчет признаков срочности без кэша"""
+    # Считаем совпадения для каждого уровня срочности
+    urgency_scores = rules.matcher.group_counts(rules.matcher.find(text_lower))
+
+    # Определяем уровень срочности
+    total_score = sum(urgency_scores.values())
+
+    if total_score == 0:
+        # Если ключевых слов нет, определяем по длине и общим признакам
+        if len(text) > 200:  # Длинные сообщения обычно более срочные
+            return {'urgency': 'medium', 'confidence': 0.3, 'reason': 'Длинное сообщение'}
+        else:
+            return {'urgency': 'low', 'confidence': 0.2, 'reason': 'Нет явных признаков срочности'}
+
+    # Находим уровень с максимальным счетом
+    max_urgency = max(urgency_scores, key=urgency_scores.get)
+    max_score = urgency_scores[max_urgency]
+    confidence = max_score / total_score
+
+    # Дополнительные правила для уточнения
+    if max_urgency == 'high' and confidence > 0.4:
+        return {
+            'urgency': 'high',
+            'confidence': confidence,
+            'reason': f'Найдены {max_score} критичных признаков'
+        }
+    elif max_urgency == 'medium' and confidence > 0.3:
+        return {
+            'urgency': 'medium',
+            'confidence': confidence,
+            'reason': f'Найдены {max_score} признаков проблем'
+        }
+    else:
+        return {
+            'urgency': 'low',
+            'confidence': confidence,
+            'reason': f'Найдены {max_score} признаков улучшений'
+        }
@@ -0,0 +1,87 @@
+"""
+Benchmark: данные графиков аналитики (/api/admin/analytics/data)
+
+Сравнивает прежнюю реализацию (запрос по дням и отдельный запрос числа
+срочных отзывов на каждый день) с crud.get_feedback_series (один запрос
+с COUNT(*) FILTER на весь диапазон) для periods week/month/year:
+время, число SQL-запросов и совпадение чисел по дням. Кэш stats_cache
+здесь не участвует. Нужна БД из DATABASE_URL; объем данных - benchmarks.seed.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.bench_analytics
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func
+
+from app.crud import get_feedback_series
+from app.database import SessionLocal, engine
+from app.models import Feedback
+
+PERIOD_DAYS = {"week": 7, "month": 30, "year": 365}
+
+
+def legacy_series(db, start):
+    """Прежний get_analytics_data: {дата: (total, critical)}"""
+    daily_data = db.query(
+        func.date(Feedback.created_at).label('date'),
+        func.count(Feedback.id).label('count')
+    ).filter(Feedback.created_at >= start).group_by(func.date(Feedback.created_at)).order_by('date').all()
+    series = {}
+    for date, count in daily_data:
+        high_count = db.query(Feedback).filter(
+            func.date(Feedback.created_at) == date,
+            Feedback.urgency == 'high'
+        ).count()
+        series[date] = (count, high_count)
+    return series
+
+
+def timed(compute):
+    """(результат, мс, число SQL-запросов)"""
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        start = time.perf_counter()
+        result = compute()
+        return result, (time.perf_counter() - start) * 1000, statements[0]
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--periods", nargs="+", default=list(PERIOD_DAYS), choices=list(PERIOD_DAYS))
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"{'period':<8}{'before, ms':>12}{'queries':>9}{'after, ms':>12}{'queries':>9}"
+              f"{'week, ms':>10}{'month, ms':>11}  same")
+        for period in args.periods:
+            end = datetime.utcnow().date()
+            start = end - timedelta(days=PERIOD_DAYS[period] - 1)
+            legacy, legacy_ms, legacy_queries = timed(lambda: legacy_series(db, start))
+            series, ms, queries = timed(lambda: get_feedback_series(db, start, end, "day"))
+            _, week_ms, _ = timed(lambda: get_feedback_series(db, start, end, "week"))
+            _, month_ms, _ = timed(lambda: get_feedback_series(db, start, end, "month"))
+            current = {
+                day: (total, critical)
+                for day, total, critical in zip(series["buckets"], series["total"], series["critical"]) if total
+            }
+            print(f"{period:<8}{legacy_ms:>12.0f}{legacy_queries:>9}{ms:>12.0f}{queries:>9}"
+                  f"{week_ms:>10.0f}{month_ms:>11.0f}  {current == legacy}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
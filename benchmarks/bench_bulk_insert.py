@@ -0,0 +1,79 @@
+"""
+Benchmark: вставка отзывов по одной (crud.create_feedback) и пакетами
+(crud.bulk_create_feedbacks, многострочный INSERT ... RETURNING)
+
+Запуск (из корня репозитория, нужна БД из DATABASE_URL):
+    python -m benchmarks.bench_bulk_insert [rows]
+"""
+
+import sys
+import time
+import uuid
+
+from app.crud import bulk_create_feedbacks, create_feedback
+from app.database import SessionLocal
+from app.models import Feedback
+from app.schemas import FeedbackCreate
+
+BENCH_CLIENT_ID = "benchmark-bulk-insert"
+
+
+def make_rows(count: int) -> list:
+    return [
+        {
+            "uuid": uuid.uuid4(),
+            "form_type": ("tech", "business", "exec")[i % 3],
+            "client_id": BENCH_CLIENT_ID,
+            "client_name": f"Клиент {i}",
+            "client_email": f"client{i}@example.com",
+            "problem_text": f"Тикет {i}: не работает выгрузка отчета, ошибка 500 при экспорте",
+            "urgency": "high",
+            "category": "bug",
+            "tags": ["legacy"],
+            "priority_score": 90,
+            "form_data": {"source": "benchmark", "n": i}
+        }
+        for i in range(count)
+    ]
+
+
+def bench_single(db, rows: list) -> float:
+    start = time.perf_counter()
+    for row in rows:
+        data = {key: value for key, value in row.items() if key not in ("uuid", "priority_score")}
+        create_feedback(db, FeedbackCreate(**data))
+    return time.perf_counter() - start
+
+
+def bench_bulk(db, rows: list, batch_size: int = 1000) -> float:
+    start = time.perf_counter()
+    for offset in range(0, len(rows), batch_size):
+        results = bulk_create_feedbacks(db, rows[offset:offset + batch_size])
+        assert all("id" in result for result in results)
+    return time.perf_counter() - start
+
+
+def cleanup(db):
+    db.query(Feedback).filter(Feedback.client_id == BENCH_CLIENT_ID).delete()
+    db.commit()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        single = bench_single(db, make_rows(count))
+        cleanup(db)
+        bulk = bench_bulk(db, make_rows(count))
+        cleanup(db)
+    finally:
+        db.close()
+
+    print(f"rows: {count}")
+    print(f"single insert (add/commit/refresh): {count / single:>10.0f} rows/sec")
+    print(f"bulk INSERT ... RETURNING:          {count / bulk:>10.0f} rows/sec  ({single / bulk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: total для списков отзывов, count() против count_feedbacks
+
+Для типичных фильтров сравнивает полный count() и count_feedbacks
+(точный подсчет до COUNT_EXACT_LIMIT строк, дальше оценка планировщика):
+время и ошибку оценки. Нужна БД из DATABASE_URL; объем данных -
+benchmarks.seed.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.bench_counts
+"""
+
+import time
+
+from app.crud import _filter_feedbacks, count_feedbacks
+from app.database import SessionLocal
+from app.models import Feedback
+
+FILTERS = [
+    {},
+    {"urgency": "high"},
+    {"status": "new", "urgency": "high"},
+    {"form_type": "exec", "status": "resolved", "urgency": "low"},
+    {"client_email": "user5@client5.example.com"},
+]
+
+
+def timed(func, repeat: int = 5):
+    """Результат и медиана времени вызова (мс)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, sorted(timings)[len(timings) // 2]
+
+
+def main():
+    db = SessionLocal()
+    try:
+        print(f"{'filters':<48}{'count(), ms':>12}{'cheap, ms':>11}{'total':>10}{'cheap':>10}{'mode':>11}")
+        for filters in FILTERS:
+            exact, exact_ms = timed(lambda: _filter_feedbacks(db.query(Feedback.id), **filters).count())
+            (total, is_exact), cheap_ms = timed(lambda: count_feedbacks(db, **filters))
+            name = ", ".join(f"{k}={v}" for k, v in filters.items()) or "(all)"
+            mode = "exact" if is_exact else "estimated"
+            print(f"{name:<48}{exact_ms:>12.1f}{cheap_ms:>11.1f}{exact:>10}{total:>10}{mode:>11}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
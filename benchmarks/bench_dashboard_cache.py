@@ -0,0 +1,112 @@
+"""
+Benchmark: вкладки админки, опрашивающие /api/admin/dashboard
+
+--tabs потоков в течение --seconds секунд запрашивают дашборд (TestClient),
+раз в --write-interval секунд один отзыв меняет статус (сброс кэша).
+Сравнивает STATS_CACHE_TTL=0 (без кэша) и кэш с --ttl: запросы в секунду,
+задержка, число пересчетов статистики и SQL-запросов к БД.
+Нужна БД из DATABASE_URL; объем данных - benchmarks.seed.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.bench_dashboard_cache --tabs 16
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+
+from app.crud import update_feedback
+from app.database import SessionLocal, engine
+from app.main import app
+from app.models import Feedback
+from app.schemas import FeedbackUpdate
+from app.services.stats_cache import stats_cache
+
+
+def poll(client: TestClient, until: float) -> list:
+    """Запрашивать дашборд до until; времена ответов в мс"""
+    timings = []
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        client.get("/api/admin/dashboard").raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def write_periodically(feedback_id: int, interval: float, until: float, stop: threading.Event) -> int:
+    """Менять статус отзыва раз в interval секунд; число записей"""
+    writes = 0
+    statuses = ("in_progress", "new")
+    while not stop.wait(interval) and time.perf_counter() < until:
+        db = SessionLocal()
+        try:
+            update_feedback(db, feedback_id, FeedbackUpdate(status=statuses[writes % 2]))
+        finally:
+            db.close()
+        writes += 1
+    return writes
+
+
+def run(client: TestClient, ttl: float, tabs: int, seconds: float, write_interval: float, feedback_id: int):
+    stats_cache.ttl = ttl
+    stats_cache.clear()
+    recomputes = stats_cache.compute_count
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    stop = threading.Event()
+    until = time.perf_counter() + seconds
+    try:
+        with ThreadPoolExecutor(tabs + 1) as pool:
+            writer = pool.submit(write_periodically, feedback_id, write_interval, until, stop)
+            results = list(pool.map(lambda _: poll(client, until), range(tabs)))
+            stop.set()
+            writes = writer.result()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    timings = sorted(ms for tab in results for ms in tab)
+    print(f"{'off' if ttl <= 0 else f'{ttl:g}s':>6}{len(timings) / seconds:>10.1f}"
+          f"{timings[len(timings) // 2]:>9.1f}{timings[int(len(timings) * 0.95)]:>9.1f}"
+          f"{stats_cache.compute_count - recomputes if ttl > 0 else len(timings):>11}"
+          f"{statements[0]:>12}{writes:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tabs", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--ttl", type=float, default=15)
+    parser.add_argument("--write-interval", type=float, default=5, help="Секунды между записями отзыва")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        feedback_id = db.execute(select(Feedback.id).order_by(Feedback.id.desc()).limit(1)).scalar_one()
+        status = db.get(Feedback, feedback_id).status
+    finally:
+        db.close()
+
+    with TestClient(app) as client:
+        print(f"{'cache':>6}{'req/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'recomputes':>11}{'statements':>12}{'writes':>8}")
+        try:
+            for ttl in (0, args.ttl):
+                run(client, ttl, args.tabs, args.seconds, args.write_interval, feedback_id)
+        finally:
+            db = SessionLocal()
+            try:
+                update_feedback(db, feedback_id, FeedbackUpdate(status=status))
+            finally:
+                db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: разбор тел запросов и кодирование ответов (json vs orjson)
+
+Сравнивает время и пик памяти (tracemalloc) для типичного отзыва,
+отзыва с вставленным логом, экспорта 10000 отзывов и чтения тела
+больше лимита (буферизация целиком против read_body с лимитом).
+БД не нужна.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.bench_json_body
+"""
+
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+
+from benchmarks.corpus import build_corpus
+from app.services.json_body import BodyTooLargeError, dumps, read_body
+
+CHUNK = 64 * 1024
+
+
+def measure(func, min_time: float = 0.5):
+    """Среднее время вызова (мс) и пик памяти одного вызова (КБ)"""
+    func()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    calls = 0
+    start = time.perf_counter()
+    while calls < 3 or time.perf_counter() - start < min_time:
+        func()
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1000, peak / 1024
+
+
+def export_rows(count: int = 10000) -> list:
+    """Строки экспорта с теми же типами, что и колонки feedbacks"""
+    created = datetime(2024, 1, 1)
+    return [
+        {
+            "id": i, "uuid": uuid.UUID(int=i), "form_type": "tech", "client_id": f"client-{i % 50}",
+            "client_name": "ООО Ромашка", "client_email": f"user{i}@example.com", "client_role": "technical",
+            "problem_text": "Не работает выгрузка отчета после обновления, ошибка 500", "message": None,
+            "urgency": "high", "urgency_confidence": 0.75, "urgency_reason": "Найдены 3 критичных признаков",
+            "category": "bug", "tags": ["tech", "urgent"], "status": "new", "assigned_to": None,
+            "priority_score": 90, "form_data": {"product": "ADB", "version": "6.2"},
+            "created_at": created + timedelta(minutes=i), "updated_at": created + timedelta(minutes=i),
+            "resolved_at": None, "response_time_seconds": None, "satisfaction_score": None
+        }
+        for i in range(count)
+    ]
+
+
+def chunked_request(size: int) -> Request:
+    """Запрос без Content-Length, тело приходит чанками по 64 КБ"""
+    chunks = [b"a" * CHUNK] * (size // CHUNK)
+
+    async def receive():
+        if chunks:
+            return {"type": "http.request", "body": chunks.pop(), "more_body": bool(chunks)}
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    return Request({"type": "http", "method": "POST", "headers": []}, receive)
+
+
+def read_whole(size: int) -> None:
+    asyncio.run(chunked_request(size).body())
+
+
+def read_limited(size: int) -> None:
+    try:
+        asyncio.run(read_body(chunked_request(size), max_bytes=1024 * 1024))
+    except BodyTooLargeError:
+        pass
+
+
+def main():
+    corpus = build_corpus(per_class=1)
+    typical = json.dumps({"form_type": "tech", "message": corpus["paragraph"][0][0]}, ensure_ascii=False).encode()
+    log_text = corpus["log_50kb"][0][0] * 18  # ~900 КБ
+    large = json.dumps({"form_type": "tech", "message": log_text}, ensure_ascii=False).encode()
+    rows = export_rows()
+
+    cases = [
+        (f"decode typical ({len(typical)} B)",
+         lambda: json.loads(typical.decode("utf-8")), lambda: orjson.loads(typical)),
+        (f"decode large ({len(large) // 1024} KB)",
+         lambda: json.loads(large.decode("utf-8")), lambda: orjson.loads(large)),
+        ("encode export (10000 rows)",
+         lambda: json.dumps(jsonable_encoder({"feedbacks": rows}), ensure_ascii=False).encode("utf-8"),
+         lambda: dumps({"feedbacks": rows})),
+        ("read 8 MB body (limit 1 MB)",
+         lambda: read_whole(8 * 1024 * 1024), lambda: read_limited(8 * 1024 * 1024)),
+    ]
+
+    print(f"{'case':<32}{'before, ms':>12}{'after, ms':>12}{'before, KB':>14}{'after, KB':>12}")
+    for name, before, after in cases:
+        before_ms, before_kb = measure(before)
+        after_ms, after_kb = measure(after)
+        print(f"{name:<32}{before_ms:>12.3f}{after_ms:>12.3f}{before_kb:>14.0f}{after_kb:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
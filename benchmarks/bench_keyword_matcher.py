@@ -0,0 +1,112 @@
+"""
+Benchmark: поиск ключевых слов в классификаторе
+Сравнение однопроходного KeywordMatcher с прежними циклами `keyword in text`
+
+Запуск (из корня репозитория):
+    python -m benchmarks.bench_keyword_matcher
+"""
+
+import re
+import time
+
+from app.services.urgency import get_urgency_rules
+from app.services.classifier import classifier
+
+
+# Прежние реализации (до KeywordMatcher) для сравнения результатов и скорости
+def legacy_urgency_scores(text: str) -> dict:
+    text_lower = text.lower()
+    scores = {'high': 0, 'medium': 0, 'low': 0}
+    for level, keywords in get_urgency_rules().keywords.items():
+        for keyword in keywords:
+            if keyword in text_lower:
+                scores[level] += 1
+    return scores
+
+
+def current_urgency_scores(text: str) -> dict:
+    matcher = get_urgency_rules().matcher
+    return matcher.group_counts(matcher.find(text.lower()))
+
+
+def legacy_classify(text: str, form_type: str) -> tuple:
+    text_lower = text.lower()
+
+    urgency = None
+    for level in ('high', 'medium', 'low'):
+        if any(keyword in text_lower for keyword in classifier.urgency_keywords[level]):
+            urgency = level
+            break
+    if urgency is None:
+        urgency = {'tech': 'medium', 'business': 'normal', 'exec': 'high'}.get(form_type, 'normal')
+
+    category = 'other'
+    for name, keywords in classifier.category_keywords.items():
+        if name != 'other' and any(keyword in text_lower for keyword in keywords):
+            category = name
+            break
+
+    tags = re.findall(r'#(\w+)', text)
+    tags.extend(keyword for keyword in classifier.tech_keywords if keyword in text_lower)
+    tags.extend(re.findall(r'v\d+\.\d+(\.\d+)?', text_lower))
+    return urgency, category, sorted(set(tags))
+
+
+def current_classify(text: str, form_type: str) -> tuple:
+    hits = classifier.find_keywords(text)
+    return (
+        classifier._urgency_from_hits(hits, form_type),
+        classifier._category_from_hits(hits),
+        sorted(classifier._tags_from_hits(text, hits))
+    )
+
+
+SAMPLES = {
+    'short': "Не работает выгрузка отчета, срочно!",
+    'typical': (
+        "Добрый день! После обновления на v2.3.1 периодически падает загрузка данных "
+        "в PostgreSQL через REST API, в логах timeout и connection refused. "
+        "Хотелось бы получить рекомендации по настройке. #adb #etl"
+    ),
+    # Лог без явных ошибок, проблема описана в конце: старые циклы сканируют текст целиком
+    'info_log_50kb': "\n".join(
+        f"2024-01-01 12:00:{i % 60:02d} INFO worker-{i} batch id={i * 7} status ok duration={i % 17}ms"
+        for i in range(600)
+    ) + "\nПосле этого выгрузка перестала идти, данные не загружаются",
+    # Плотный stack trace: старые циклы быстро выходят на первом совпадении
+    'stack_trace_50kb': "\n".join(
+        f"2024-01-01 12:00:{i % 60:02d} ERROR worker-{i} Traceback (most recent call last): "
+        f"File \"/opt/app/service.py\", line {i}, in process; ConnectionError: timeout after {i % 30}s"
+        for i in range(350)
+    )
+}
+
+
+def measure(func, *args, repeat: int = 200) -> float:
+    """Среднее время вызова в микросекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    print(f"{'sample':<18}{'size':>8}  {'function':<16}{'legacy, us':>12}{'matcher, us':>13}{'speedup':>9}")
+    for name, text in SAMPLES.items():
+        # Результаты должны совпадать с прежней реализацией
+        assert legacy_urgency_scores(text) == current_urgency_scores(text), name
+        for form_type in ('tech', 'business', 'exec'):
+            assert legacy_classify(text, form_type) == current_classify(text, form_type), name
+
+        rows = [
+            ('analyze_urgency', legacy_urgency_scores, current_urgency_scores),
+            ('classifier', lambda t: legacy_classify(t, 'tech'), lambda t: current_classify(t, 'tech'))
+        ]
+        for label, legacy, current in rows:
+            legacy_us = measure(legacy, text)
+            current_us = measure(current, text)
+            print(f"{name:<18}{len(text):>8}  {label:<16}{legacy_us:>12.1f}{current_us:>13.1f}{legacy_us / current_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
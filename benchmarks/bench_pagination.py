@@ -0,0 +1,63 @@
+"""
+Benchmark: постраничный вывод отзывов, OFFSET против курсора (keyset)
+
+Время получения страницы на разной глубине через crud.get_feedbacks
+(skip/limit) и crud.get_feedbacks_keyset (курсор на ту же позицию).
+Нужна БД из DATABASE_URL; объем данных - benchmarks.seed.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.bench_pagination
+"""
+
+import argparse
+import time
+
+from app.crud import get_feedbacks, get_feedbacks_keyset
+from app.database import SessionLocal
+from app.services.pagination import encode_cursor
+
+
+def timed(func, repeat: int = 5) -> float:
+    """Медиана времени вызова (мс)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--pages", default="1,100,1000,10000")
+    parser.add_argument("--form-type", default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"{'page':>8}{'offset, ms':>14}{'keyset, ms':>14}")
+        for page in map(int, args.pages.split(",")):
+            skip = (page - 1) * args.limit
+            run_offset = lambda: get_feedbacks(db, skip=skip, limit=args.limit, form_type=args.form_type)
+            offset_ms = timed(run_offset)
+
+            # Курсор на ту же позицию: последняя строка предыдущей страницы
+            cursor = None
+            if skip:
+                anchor = get_feedbacks(db, skip=skip - 1, limit=1, form_type=args.form_type)[0]
+                cursor = encode_cursor(anchor.created_at, anchor.id, "next")
+            run_keyset = lambda: get_feedbacks_keyset(db, cursor=cursor, limit=args.limit, form_type=args.form_type)
+            keyset_ms = timed(run_keyset)
+
+            # Обе страницы должны совпадать
+            assert [f.id for f in run_offset()] == [f.id for f in run_keyset()[0]], f"page {page} differs"
+            print(f"{page:>8}{offset_ms:>14.1f}{keyset_ms:>14.1f}")
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
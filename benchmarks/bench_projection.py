@@ -0,0 +1,75 @@
+"""
+Benchmark: страницы списка отзывов, полные ORM-объекты против FeedbackSummary
+
+Время и пик памяти (tracemalloc) страницы из --limit строк: запрос
+(get_feedbacks_keyset), схема ответа и кодирование в JSON, как в
+GET /api/admin/feedbacks с view=full и view=summary.
+Нужна БД из DATABASE_URL; объем данных - benchmarks.seed.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.bench_projection
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from app.crud import get_feedbacks_keyset
+from app.database import SessionLocal
+from app.schemas import Feedback, FeedbackSummary
+from app.services.json_body import dumps
+
+VIEWS = {"full": Feedback, "summary": FeedbackSummary}
+
+
+def render_page(db, view: str, cursor, limit: int):
+    """Страница списка как в ответе API: строки, схема, JSON"""
+    rows, next_cursor, _ = get_feedbacks_keyset(db, cursor=cursor, limit=limit, summary=view == "summary")
+    schema = VIEWS[view]
+    body = dumps([schema.model_validate(row).model_dump() for row in rows])
+    return body, next_cursor
+
+
+def measure(db, view: str, cursor, limit: int, repeat: int):
+    """Медиана времени (мс), пик памяти (КБ) и размер ответа (КБ)"""
+    timings = []
+    for _ in range(repeat):
+        # Новая сессия на каждый запрос, как в get_db: identity map пустая
+        db.expunge_all()
+        start = time.perf_counter()
+        render_page(db, view, cursor, limit)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    db.expunge_all()
+    tracemalloc.start()
+    body, _ = render_page(db, view, cursor, limit)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return sorted(timings)[len(timings) // 2], peak / 1024, len(body) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=3, help="Сколько страниц подряд от начала списка")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"{'page':>6}{'view':>9}{'ms':>10}{'peak, KB':>12}{'body, KB':>12}")
+        cursor = None
+        for page in range(1, args.pages + 1):
+            for view in VIEWS:
+                ms, peak_kb, body_kb = measure(db, view, cursor, args.limit, args.repeat)
+                print(f"{page:>6}{view:>9}{ms:>10.1f}{peak_kb:>12.0f}{body_kb:>12.0f}")
+            _, cursor = render_page(db, "summary", cursor, args.limit)
+            if cursor is None:
+                break
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: параллельное взятие отзывов из очереди (FOR UPDATE SKIP LOCKED)
+
+--agents потоков, у каждого своя сессия, по --rounds раз берут по --n
+отзывов через crud.claim_feedbacks. Печатает пропускную способность,
+задержку вызова и проверяет, что ни один отзыв не выдан дважды.
+Взятые отзывы в конце возвращаются в очередь.
+Нужна БД из DATABASE_URL; объем данных - benchmarks.seed.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.bench_queue_claim --agents 32
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from app.crud import claim_feedbacks
+from app.database import SessionLocal, engine
+
+AGENT_PREFIX = "bench-agent-"
+
+
+def run_agent(agent: int, rounds: int, n: int):
+    """Взять rounds раз по n отзывов; (id отзывов, времена вызовов в мс)"""
+    db = SessionLocal()
+    claimed, timings = [], []
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            claimed += [feedback.id for feedback in claim_feedbacks(db, f"{AGENT_PREFIX}{agent}", n)]
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        db.close()
+    return claimed, timings
+
+
+def release_claims() -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE feedbacks SET assigned_to = NULL, status = 'new' WHERE assigned_to LIKE :prefix"),
+            {"prefix": AGENT_PREFIX + "%"}
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--n", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.agents) as pool:
+            results = list(pool.map(lambda agent: run_agent(agent, args.rounds, args.n), range(args.agents)))
+        elapsed = time.perf_counter() - started
+    finally:
+        release_claims()
+
+    claimed = [feedback_id for ids, _ in results for feedback_id in ids]
+    timings = sorted(ms for _, agent_timings in results for ms in agent_timings)
+    print(f"agents {args.agents}, claims {len(timings)} x n={args.n} in {elapsed:.2f}s "
+          f"({len(timings) / elapsed:.0f} claims/s)")
+    print(f"latency p50 {timings[len(timings) // 2]:.1f} ms, p95 {timings[int(len(timings) * 0.95)]:.1f} ms")
+    print(f"feedbacks {len(claimed)}, duplicates {len(claimed) - len(set(claimed))}")
+
+
+if __name__ == "__main__":
+    main()
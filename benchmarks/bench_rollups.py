@@ -0,0 +1,131 @@
+"""
+Benchmark: инкрементальные агрегаты analytics (app/services/rollups.py)
+
+1. Чтение: статистика дашборда по feedbacks (crud.get_stats) и по
+   analytics (stats_views.dashboard_stats при STATS_SOURCE=rollups) -
+   время и совпадение чисел.
+2. Запись: вставка отзывов по одной строке и пакетом, обновление статуса
+   - с триггерами feedbacks_analytics_* и без них. Все в транзакции,
+   которая откатывается; триггеры отключаются ALTER TABLE ... DISABLE
+   TRIGGER внутри нее (нужны права владельца feedbacks).
+3. Свертка: сколько идет fold_deltas для дельт пакетной вставки.
+
+Нужна БД из DATABASE_URL с миграцией 16_analytics_rollups.sql и
+заполненными агрегатами:
+    python -m benchmarks.seed --rows 1000000
+    python -m app.services.rollups --reconcile-all
+    python -m benchmarks.bench_rollups [--rows 1000]
+"""
+
+import argparse
+import time
+
+from sqlalchemy import text
+
+from app.crud import get_stats
+from app.database import SessionLocal, engine
+from app.services import rollups, stats_views
+
+BENCH_CLIENT_ID = "benchmark-rollups"
+_TRIGGERS = ("feedbacks_analytics_insert", "feedbacks_analytics_update", "feedbacks_analytics_delete")
+
+_INSERT_ONE = text(
+    "INSERT INTO feedbacks (uuid, form_type, client_id, client_name, client_email, problem_text, urgency, status) "
+    "VALUES (gen_random_uuid(), :form_type, :client_id, 'Клиент', 'client@example.com', "
+    "'Не работает выгрузка отчета', :urgency, 'new')"
+)
+_INSERT_BATCH = text(
+    "INSERT INTO feedbacks (uuid, form_type, client_id, client_name, client_email, problem_text, urgency, status) "
+    "SELECT gen_random_uuid(), (ARRAY['tech', 'business', 'exec'])[n % 3 + 1], :client_id, 'Клиент', "
+    "'client@example.com', 'Не работает выгрузка отчета', (ARRAY['high', 'medium', 'low'])[n % 3 + 1], 'new' "
+    "FROM generate_series(1, :rows) n"
+)
+_RESOLVE = text(
+    "UPDATE feedbacks SET status = 'resolved', response_time_seconds = 600 WHERE client_id = :client_id"
+)
+
+
+def bench_reads(repeat: int) -> None:
+    db = SessionLocal()
+    try:
+        for name, compute in (
+            ("feedbacks", lambda: get_stats(db=db)),
+            ("analytics", lambda: stats_views.dashboard_stats(db, None)),
+        ):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                compute()
+            print(f"  {name:<10} {(time.perf_counter() - start) / repeat * 1000:9.1f} мс")
+        rolled = stats_views.dashboard_stats(db, None)
+        rolled.pop("freshness")
+        print(f"  совпадает с feedbacks: {rolled == get_stats(db=db)}")
+    finally:
+        db.close()
+
+
+def bench_writes(rows: int, triggers: bool) -> dict:
+    """Время операций записи в откатываемой транзакции"""
+    timings = {}
+    with engine.connect() as conn:
+        try:
+            if not triggers:
+                for trigger in _TRIGGERS:
+                    conn.execute(text(f"ALTER TABLE feedbacks DISABLE TRIGGER {trigger}"))
+            params = {"client_id": BENCH_CLIENT_ID}
+
+            start = time.perf_counter()
+            for i in range(rows):
+                conn.execute(_INSERT_ONE, {
+                    **params, "form_type": ("tech", "business", "exec")[i % 3], "urgency": "high"
+                })
+            timings["по одной"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            conn.execute(_INSERT_BATCH, {**params, "rows": rows})
+            timings["пакетом"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            conn.execute(_RESOLVE, params)
+            timings["update статуса"] = time.perf_counter() - start
+        finally:
+            conn.rollback()
+    return timings
+
+
+def bench_fold(rows: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(_INSERT_BATCH, {"client_id": BENCH_CLIENT_ID, "rows": rows})
+    try:
+        start = time.perf_counter()
+        folded = rollups.fold_deltas()
+        print(f"  fold_deltas: {folded} за {(time.perf_counter() - start) * 1000:.1f} мс")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM feedbacks WHERE client_id = :client_id"), {"client_id": BENCH_CLIENT_ID})
+        rollups.fold_deltas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="строк в каждой операции записи")
+    parser.add_argument("--repeat", type=int, default=3, help="повторов чтения")
+    args = parser.parse_args()
+
+    print("Статистика дашборда:")
+    bench_reads(args.repeat)
+
+    print(f"Запись {args.rows} отзывов:")
+    plain = bench_writes(args.rows, triggers=False)
+    with_rollups = bench_writes(args.rows, triggers=True)
+    for name, seconds in plain.items():
+        print(
+            f"  {name:<15} без триггеров {seconds * 1000:9.1f} мс, "
+            f"с триггерами {with_rollups[name] * 1000:9.1f} мс"
+        )
+
+    print("Свертка дельт:")
+    bench_fold(args.rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: crud.get_stats, отдельные запросы против одного прохода
+
+Сравнивает прежнюю реализацию (около 17 запросов: итоги, средние,
+по типам, по статусам и по каждому из 7 дней) с текущей crud.get_stats
+(матрица form_type x status с COUNT(*) FILTER и запрос по дням) и
+проверяет, что результаты совпадают. Нужна БД из DATABASE_URL; объем данных -
+benchmarks.seed.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.bench_stats
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, event, func
+from sqlalchemy.orm import Session
+
+from app.crud import get_stats
+from app.database import SessionLocal, engine
+from app.models import Feedback
+
+
+def legacy_get_stats(db: Session, form_type: Optional[str] = None) -> Dict[str, Any]:
+    """crud.get_stats до перехода на один запрос"""
+    query = db.query(Feedback)
+    if form_type:
+        query = query.filter(Feedback.form_type == form_type)
+
+    total = query.count()
+    critical = query.filter(Feedback.urgency == 'high').count()
+    resolved = query.filter(Feedback.status == 'resolved').count()
+    avg_response = db.query(func.avg(Feedback.response_time_seconds)).filter(
+        and_(Feedback.response_time_seconds.isnot(None), Feedback.status == 'resolved')
+    ).scalar() or 0
+    avg_satisfaction = db.query(func.avg(Feedback.satisfaction_score)).filter(
+        and_(Feedback.satisfaction_score.isnot(None), Feedback.satisfaction_score > 0)
+    ).scalar() or 0
+
+    feedbacks_by_type = {}
+    if not form_type:
+        for ft in ['tech', 'business', 'exec']:
+            feedbacks_by_type[ft] = db.query(Feedback).filter(Feedback.form_type == ft).count()
+    feedbacks_by_status = {}
+    for status in ['new', 'in_progress', 'resolved', 'rejected']:
+        feedbacks_by_status[status] = query.filter(Feedback.status == status).count()
+    recent_feedbacks_by_day = []
+    for i in range(6, -1, -1):
+        date = datetime.utcnow() - timedelta(days=i)
+        recent_feedbacks_by_day.append(db.query(Feedback).filter(
+            func.date(Feedback.created_at) == date.date()
+        ).count())
+
+    return {
+        'total_feedbacks': total,
+        'critical_feedbacks': critical,
+        'resolved_feedbacks': resolved,
+        'avg_response_time_minutes': round(avg_response / 60, 2) if avg_response else 0,
+        'satisfaction_avg': round(float(avg_satisfaction), 2) if avg_satisfaction else 0,
+        'feedbacks_by_type': feedbacks_by_type,
+        'feedbacks_by_status': feedbacks_by_status,
+        'recent_feedbacks_by_day': recent_feedbacks_by_day
+    }
+
+
+def timed(func, repeat: int):
+    """Медиана времени вызова (мс) и число запросов к БД за вызов"""
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        timings = []
+        for _ in range(repeat):
+            statements.clear()
+            start = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return sorted(timings)[len(timings) // 2], len(statements), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"{'form_type':<12}{'before, ms':>12}{'queries':>9}{'after, ms':>12}{'queries':>9}  same")
+        for form_type in (None, "tech"):
+            before_ms, before_queries, before = timed(lambda: legacy_get_stats(db, form_type), args.repeat)
+            after_ms, after_queries, after = timed(lambda: get_stats(db, form_type), args.repeat)
+            print(f"{form_type or 'all':<12}{before_ms:>12.0f}{before_queries:>9}"
+                  f"{after_ms:>12.0f}{after_queries:>9}  {before == after}")
+            if before != after:
+                print("  before:", before)
+                print("  after: ", after)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: поиск по подстрокам (compat) и по индексу основ токенов (token)
+
+Сравнивает время поиска на корпусе benchmarks/corpus.py для текущего
+словаря классификатора и словаря, увеличенного в 10 раз, и долю
+совпадения меток (срочность, категория) между режимами.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.bench_token_index
+"""
+
+import random
+import time
+
+from benchmarks.corpus import build_corpus
+from app.schemas import FeedbackCreate
+from app.services.classifier import FeedbackClassifier
+from app.services.keyword_matcher import make_matcher
+
+_SYLLABLES_RU = ["ка", "ро", "ми", "те", "ла", "ну", "ски", "про", "вер", "ган", "дор", "лек"]
+_SYLLABLES_EN = ["ka", "ro", "mi", "te", "la", "nu", "ski", "pro", "ver", "gan", "dor", "lex"]
+
+# Словоформы, которые подстроками не ловятся без ручных вариантов
+INFLECTIONS = [
+    "Кластер сломался ночью", "Ошибки при загрузке", "Экспорт падает с ошибкой",
+    "Сервис недоступен второй день", "Отчеты не формируются", "Всё зависает",
+]
+
+
+def classifier_groups(classifier: FeedbackClassifier) -> dict:
+    return {
+        **{('urgency', level): classifier.urgency_keywords[level] for level in ('high', 'medium', 'low')},
+        **{('category', name): keywords for name, keywords in classifier.category_keywords.items()},
+        ('tag', 'tech'): classifier.tech_keywords
+    }
+
+
+def scaled_groups(groups: dict, factor: int, seed: int = 11) -> dict:
+    """Словарь в factor раз больше: исходные слова + синтетические слова и фразы"""
+    rng = random.Random(seed)
+
+    def word() -> str:
+        syllables = _SYLLABLES_RU if rng.random() < 0.6 else _SYLLABLES_EN
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+    scaled = {}
+    for group, keywords in groups.items():
+        extra = [
+            " ".join(word() for _ in range(rng.choice((1, 1, 1, 2, 3))))
+            for _ in range(len(keywords) * (factor - 1))
+        ]
+        scaled[group] = list(keywords) + extra
+    return scaled
+
+
+def measure(func, texts: list, min_time: float = 0.5) -> float:
+    """Среднее время вызова в микросекундах"""
+    calls = 0
+    start = time.perf_counter()
+    while calls < len(texts) or time.perf_counter() - start < min_time:
+        func(texts[calls % len(texts)])
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    corpus = build_corpus()
+    base = classifier_groups(FeedbackClassifier("compat"))
+    dictionaries = {"1x": base, "10x": scaled_groups(base, 10)}
+
+    print(f"{'dictionary':<12}{'keywords':>10}{'mode':>8}{'build, ms':>11}", end="")
+    print("".join(f"{name + ', us':>16}" for name in corpus))
+    for label, groups in dictionaries.items():
+        keywords = sum(len(words) for words in groups.values())
+        for mode in ("compat", "token"):
+            start = time.perf_counter()
+            matcher = make_matcher(groups, mode)
+            build_ms = (time.perf_counter() - start) * 1000
+            # Режим compat ищет в тексте, уже приведенном к нижнему регистру
+            find = (lambda text, m=matcher: m.find(text.lower())) if mode == "compat" else matcher.find
+            timings = [measure(find, [text for text, _ in samples]) for samples in corpus.values()]
+            print(f"{label:<12}{keywords:>10}{mode:>8}{build_ms:>11.1f}", end="")
+            print("".join(f"{timing:>16.1f}" for timing in timings))
+
+    # Совпадение меток между режимами на корпусе
+    compat, token = FeedbackClassifier("compat"), FeedbackClassifier("token")
+    same = total = 0
+    for samples in corpus.values():
+        for text, form_type in samples:
+            feedback = FeedbackCreate(form_type=form_type, problem_text=text)
+            a, b = compat.classify_feedback(feedback), token.classify_feedback(feedback)
+            same += (a['urgency'], a['category']) == (b['urgency'], b['category'])
+            total += 1
+    print(f"\nLabels equal (urgency, category): {same}/{total}")
+
+    print("\nInflected forms (compat -> token urgency):")
+    for text in INFLECTIONS:
+        print(f"  {text:<36}{compat.classify_urgency(text, 'business'):>8} -> {token.classify_urgency(text, 'business')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Генерируемый корпус отзывов для бенчмарков
+
+Русские и английские тексты реалистичных размеров: от одной строки
+до вставленных логов на 50 КБ. Генерация детерминирована (seed),
+поэтому результаты разных запусков сравнимы между собой.
+"""
+
+import random
+from typing import Dict, List, Tuple
+
+SEED = 20240101
+
+FORM_TYPES = ("tech", "business", "exec")
+
+_RU_PROBLEMS = [
+    "не работает выгрузка отчета", "упал кластер после обновления", "данные не загружаются в витрину",
+    "зависло окно авторизации", "ошибка 500 при экспорте", "медленно работает поиск по каталогу",
+    "сбой при импорте справочников", "отчет не формируется к утру", "потеря данных после рестарта",
+]
+_RU_CONTEXT = [
+    "Добрый день!", "Коллеги, подскажите.", "Повторяется уже третий день.", "Очень срочно, горит дедлайн.",
+    "Хотелось бы улучшить интерфейс.", "Предложение: добавить фильтр по дате.", "Спасибо за быстрый ответ.",
+    "Используем PostgreSQL и Kafka через REST API.", "Версия v2.3.1, до обновления все было хорошо.",
+    "Прошу рассмотреть как можно скорее.", "Влияет на работу отдела продаж.", "#adb #etl",
+]
+_EN_PROBLEMS = [
+    "export fails with timeout", "cluster crashed after upgrade", "dashboard is slow to load",
+    "authentication error on login", "data corruption after restore", "bug in the scheduler",
+    "feature request: dark theme", "API returns 503 under load", "backup job failed overnight",
+]
+_EN_CONTEXT = [
+    "Hi team,", "This is urgent and blocking our release.", "It would be nice to improve this.",
+    "Running Hadoop and Spark on v3.1.", "Happened again this morning.", "Thanks in advance.",
+    "Logs attached below.", "Our customers are complaining.", "Minor issue, no rush.", "#spark",
+]
+
+
+def _sentence(rng: random.Random, lang: str) -> str:
+    problems, context = (_RU_PROBLEMS, _RU_CONTEXT) if lang == "ru" else (_EN_PROBLEMS, _EN_CONTEXT)
+    return f"{rng.choice(context)} {rng.choice(problems).capitalize()}. {rng.choice(context)}"
+
+
+def _text(rng: random.Random, lang: str, size: int) -> str:
+    parts, length = [], 0
+    while length < size:
+        sentence = _sentence(rng, lang)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:size]
+
+
+def _log(rng: random.Random, size: int, error_ratio: float) -> str:
+    """Вставленный лог: в основном INFO, часть строк с ошибками и stack trace"""
+    lines, length, i = [], 0, 0
+    while length < size:
+        if rng.random() < error_ratio:
+            line = (f"2024-01-01 12:{i // 60 % 60:02d}:{i % 60:02d} ERROR worker-{i % 16} "
+                    f"ConnectionError: timeout after {rng.randint(1, 30)}s in /opt/app/service.py line {i}")
+        else:
+            line = (f"2024-01-01 12:{i // 60 % 60:02d}:{i % 60:02d} INFO worker-{i % 16} "
+                    f"batch id={i * 7} status ok duration={rng.randint(1, 900)}ms")
+        lines.append(line)
+        length += len(line) + 1
+        i += 1
+    return "\n".join(lines)
+
+
+def build_corpus(per_class: int = 20) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Сгенерировать корпус по классам размеров
+
+    Args:
+        per_class: Текстов в каждом классе
+
+    Returns:
+        {класс: [(текст, тип формы), ...]}
+    """
+    rng = random.Random(SEED)
+    corpus: Dict[str, List[Tuple[str, str]]] = {
+        "one_liner": [], "paragraph": [], "long_5kb": [], "log_50kb": []
+    }
+    for i in range(per_class):
+        lang = "ru" if i % 3 else "en"
+        form_type = FORM_TYPES[i % 3]
+        corpus["one_liner"].append((_sentence(rng, lang)[:120], form_type))
+        corpus["paragraph"].append((_text(rng, lang, 600), form_type))
+        corpus["long_5kb"].append((_text(rng, lang, 5 * 1024), form_type))
+        # Описание проблемы и вставленный лог; половина логов почти без ошибок
+        log = _log(rng, 50 * 1024, error_ratio=0.02 if i % 2 else 0.3)
+        corpus["log_50kb"].append((f"{_sentence(rng, lang)}\n{log}\n{_sentence(rng, lang)}", form_type))
+    return corpus
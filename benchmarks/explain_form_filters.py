@@ -0,0 +1,91 @@
+"""
+Проверка планов фильтров по полям форм (form_data) через EXPLAIN
+
+Для каждого набора условий строит запрос так же, как GET /api/admin/feedbacks
+(form_filters.form_data_conditions), и проверяет по EXPLAIN, что условие
+разрешается индексом: GIN idx_feedbacks_form_data для @> и @@, btree
+idx_feedbacks_form_<field> для полей из --promote. Индексный путь
+проверяется с enable_seqscan = off (доступен ли индекс для условия вообще),
+рядом печатается план по умолчанию и время выполнения.
+Нужна БД из DATABASE_URL с синтетическими отзывами benchmarks.seed (он же
+добавляет поля product и version в form_configs).
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.explain_form_filters --promote version
+"""
+
+import argparse
+import json
+import sys
+
+from app.database import SessionLocal
+from app.models import Feedback
+from app.services import form_filters
+
+CASES = [
+    ["product=ADB"],
+    ["product=ADB", "version=6.1"],
+    ["product=ADB|ADH"],
+    ["product=ADS", "version!=6.1"],
+    ["version=9.9"],
+    ["version=6.1|6.2", "product=ADB"],
+]
+
+
+def plan_of(db, query, analyze: bool = False) -> dict:
+    compiled = query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"render_postcompile": True})
+    options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+    return db.connection().exec_driver_sql(f"EXPLAIN ({options}) {compiled}", compiled.params).scalar()[0]
+
+
+def index_names(node: dict) -> set:
+    """Индексы, которые использует план (рекурсивно по узлам)"""
+    names = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", []):
+        names |= index_names(child)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--promote", action="append", default=[], metavar="FIELD",
+                        help="Создать индекс по form_data ->> FIELD и проверить его условия")
+    args = parser.parse_args()
+
+    for field in args.promote:
+        form_filters.create_field_index(field)
+        form_filters.FORM_DATA_INDEXED_FIELDS.add(field)
+
+    db = SessionLocal()
+    failed = 0
+    try:
+        for conditions in CASES:
+            # Условия на вынесенные поля идут по их btree-индексу, остальные - по GIN;
+            # при смешанных условиях планировщику достаточно любого из них
+            fields = {filter_.field for filter_ in form_filters.parse_filters(conditions)}
+            promoted = fields & form_filters.FORM_DATA_INDEXED_FIELDS
+            expected = {form_filters.field_index_name(field) for field in promoted}
+            if fields - promoted:
+                expected.add("idx_feedbacks_form_data")
+            where = form_filters.form_data_conditions(db, conditions)
+            query = db.query(Feedback.id).filter(*where)
+
+            default = plan_of(db, query, analyze=True)
+            db.connection().exec_driver_sql("SET LOCAL enable_seqscan = off")
+            forced = index_names(plan_of(db, query)["Plan"])
+            db.rollback()
+
+            ok = bool(expected & forced)
+            failed += not ok
+            used = ", ".join(sorted(index_names(default["Plan"]))) or default["Plan"]["Node Type"]
+            print(f"{'OK  ' if ok else 'FAIL'} {json.dumps(conditions, ensure_ascii=False):<40} "
+                  f"index path: {', '.join(sorted(forced)) or '-':<40} "
+                  f"default: {used} ({default['Execution Time']:.1f} ms, {default['Plan']['Actual Rows']} rows)")
+    finally:
+        db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
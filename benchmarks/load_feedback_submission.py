@@ -0,0 +1,62 @@
+"""
+Load test: параллельная отправка отзывов в POST /api/feedback
+
+Запуск против работающего сервера:
+    python -m benchmarks.load_feedback_submission --url http://localhost:8000 \
+        --total 2000 --concurrency 50
+
+--idempotency отправляет уникальный Idempotency-Key в каждом запросе
+(стоимость сохранения ключа на горячем пути).
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+
+async def run(url: str, total: int, concurrency: int, idempotency: bool = False) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=url, timeout=60.0,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def submit(i: int) -> None:
+            nonlocal errors
+            async with semaphore:
+                headers = {"Idempotency-Key": str(uuid.uuid4())} if idempotency else {}
+                start = time.perf_counter()
+                response = await client.post("/api/feedback", headers=headers, json={
+                    "form_type": ("tech", "business", "exec")[i % 3],
+                    "message": f"Нагрузочный тест {i}: не работает выгрузка, ошибка 500"
+                })
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(submit(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"requests: {total}, concurrency: {concurrency}, errors: {errors}")
+    print(f"throughput: {total / elapsed:.0f} req/s, p50: {p50:.1f} ms, p99: {p99:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--total", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--idempotency", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.total, args.concurrency, args.idempotency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Синтетические отзывы для бенчмарков запросов к БД
+
+Строки вставляются одним INSERT ... SELECT generate_series и помечены
+client_id = 'bench-seed', поэтому их можно добавить до нужного объема
+и удалить, не трогая настоящие данные. Поля product и version из их
+form_data добавляются в form_configs неактивными (section_name
+'bench-seed'), чтобы по ним работали фильтры form_field.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.seed --rows 1000000
+    python -m benchmarks.seed --drop
+"""
+
+import argparse
+import json
+import time
+
+from sqlalchemy import text
+
+from app.database import engine
+
+SEED_CLIENT_ID = "bench-seed"
+
+_INSERT = text("""
+    INSERT INTO feedbacks (
+        uuid, form_type, client_id, client_name, client_email, problem_text,
+        urgency, urgency_confidence, category, tags, status, priority_score,
+        form_data, created_at, updated_at, resolved_at, response_time_seconds, satisfaction_score
+    )
+    SELECT
+        gen_random_uuid(),
+        (ARRAY['tech', 'business', 'exec'])[1 + i % 3],
+        :client_id,
+        'Клиент ' || (i % 5000),
+        'user' || (i % 20000) || '@client' || (i % 300) || '.example.com',
+        (ARRAY[
+            'Не работает выгрузка отчета после обновления, ошибка 500',
+            'Медленно работает поиск по каталогу, хотелось бы ускорить',
+            'Кластер упал ночью, данные не загружаются в витрину',
+            'Предложение: добавить фильтр по дате в интерфейс',
+            'Export fails with timeout on large tables',
+            'Вопрос по документации к REST API'
+        ])[1 + i % 6] || ' #' || i,
+        (ARRAY['high', 'medium', 'low', 'normal'])[1 + (i / 3) % 4],
+        0.5,
+        (ARRAY['bug', 'performance', 'feature', 'security', 'other'])[1 + (i / 7) % 5],
+        ARRAY['tech'],
+        (ARRAY['new', 'in_progress', 'resolved', 'rejected'])[1 + (i / 11) % 4],
+        i % 100,
+        jsonb_build_object('product', (ARRAY['ADB', 'ADH', 'ADQM', 'ADS'])[1 + i % 4],
+                           'version', '6.' || (i % 5)),
+        NOW() - make_interval(secs => i * 30),
+        NOW() - make_interval(secs => i * 30),
+        CASE WHEN (i / 11) % 4 = 2 THEN NOW() - make_interval(secs => i * 30 - 7200) END,
+        CASE WHEN (i / 11) % 4 = 2 THEN 60 + i % 5000 END,
+        CASE WHEN (i / 11) % 4 = 2 THEN 1 + i % 5 END
+    FROM generate_series(:start, :stop) AS i
+""")
+
+
+# Поля form_data синтетических отзывов для фильтров form_field (benchmarks.explain_form_filters)
+_SEED_FIELDS = [
+    ("product", "select", "Продукт", ["ADB", "ADH", "ADQM", "ADS"]),
+    ("version", "text", "Версия", None),
+]
+
+
+def ensure_form_fields() -> None:
+    """Добавить поля синтетических отзывов в form_configs (неактивными: в формах их нет)"""
+    with engine.begin() as conn:
+        for form_type in ("tech", "business", "exec"):
+            for order, (name, field_type, label, options) in enumerate(_SEED_FIELDS, start=1000):
+                conn.execute(text("""
+                    INSERT INTO form_configs (form_type, section_name, field_order, field_type, field_label,
+                                              field_name, options, is_active)
+                    SELECT :form_type, :section, :order, :field_type, :label, :name, CAST(:options AS jsonb), false
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM form_configs WHERE form_type = :form_type AND field_name = :name
+                    )
+                """), {
+                    "form_type": form_type, "section": SEED_CLIENT_ID, "order": order, "field_type": field_type,
+                    "label": label, "name": name, "options": json.dumps(options, ensure_ascii=False) if options else None
+                })
+
+
+def seeded_rows() -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT count(*) FROM feedbacks WHERE client_id = :client_id"),
+            {"client_id": SEED_CLIENT_ID}
+        ).scalar()
+
+
+def ensure_rows(rows: int, batch: int = 200_000) -> int:
+    """
+    Досоздать синтетические отзывы до rows штук
+
+    Returns:
+        Сколько строк вставлено
+    """
+    ensure_form_fields()
+    existing = seeded_rows()
+    for start in range(existing, rows, batch):
+        with engine.begin() as conn:
+            conn.execute(_INSERT, {"client_id": SEED_CLIENT_ID, "start": start, "stop": min(start + batch, rows) - 1})
+    if rows > existing:
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE feedbacks"))
+    return max(0, rows - existing)
+
+
+def drop_rows() -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM feedbacks WHERE client_id = :client_id"), {"client_id": SEED_CLIENT_ID})
+        conn.execute(text("DELETE FROM form_configs WHERE section_name = :section"), {"section": SEED_CLIENT_ID})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетические отзывы для бенчмарков")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--drop", action="store_true", help="Удалить синтетические отзывы")
+    args = parser.parse_args()
+
+    if args.drop:
+        drop_rows()
+        print("Seed rows deleted")
+        return
+    started = time.perf_counter()
+    inserted = ensure_rows(args.rows)
+    print(f"Inserted {inserted} rows in {time.perf_counter() - started:.1f}s, seeded total {seeded_rows()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Benchmark suite: горячий путь классификации и приема отзывов
+
+Измеряет ops/sec и p99 для analyze_urgency, FeedbackClassifier.classify_feedback,
+extract_tags, calculate_priority_score на корпусе benchmarks/corpus.py
+и полный запрос POST /api/feedback через TestClient (нужна БД из DATABASE_URL).
+Кэши результатов на время замеров отключаются.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.suite --save-baseline      # сохранить базовую линию
+    python -m benchmarks.suite                      # сравнить, exit code 1 при регрессии
+    python -m benchmarks.suite --only analyze_urgency --no-api --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import build_corpus
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "suite.json")
+BENCH_MARKER = "[benchmark-suite]"
+
+
+def measure(func: Callable[[], object], min_time: float, min_ops: int) -> Dict[str, float]:
+    """
+    Вызывать func не меньше min_ops раз и не меньше min_time секунд
+
+    Returns:
+        ops_per_sec, p50_us и p99_us
+    """
+    latencies: List[float] = []
+    started = time.perf_counter()
+    while len(latencies) < min_ops or time.perf_counter() - started < min_time:
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "ops_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p99_us": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 1)
+    }
+
+
+def _cycle(items: list) -> Callable[[], object]:
+    """Следующий элемент корпуса при каждом вызове"""
+    state = {"i": 0}
+
+    def next_item():
+        item = items[state["i"] % len(items)]
+        state["i"] += 1
+        return item
+    return next_item
+
+
+def function_benchmarks(corpus: Dict[str, list]) -> Dict[str, Callable[[], object]]:
+    """Бенчмарки функций классификации: {имя/класс текста: вызов}"""
+    from app.schemas import FeedbackCreate
+    from app.services.classifier import classifier
+    from app.services.urgency import analyze_urgency, get_urgency_rules
+
+    rules = get_urgency_rules()
+    benches: Dict[str, Callable[[], object]] = {}
+    for size_class, samples in corpus.items():
+        feedbacks = [FeedbackCreate(form_type=form_type, problem_text=text) for text, form_type in samples]
+        next_text, next_feedback = _cycle([text for text, _ in samples]), _cycle(feedbacks)
+
+        benches[f"analyze_urgency/{size_class}"] = lambda n=next_text: analyze_urgency(n(), rules)
+        benches[f"classify_feedback/{size_class}"] = lambda n=next_feedback: classifier.classify_feedback(n())
+        benches[f"extract_tags/{size_class}"] = lambda n=next_text: classifier.extract_tags(n())
+
+    combos = _cycle([
+        (urgency, category, form_type)
+        for urgency in ("critical", "high", "medium", "low", "normal")
+        for category in ("bug", "performance", "feature", "security", "other")
+        for form_type in ("tech", "business", "exec")
+    ])
+    benches["calculate_priority_score"] = lambda: classifier.calculate_priority_score(*combos())
+    return benches
+
+
+def api_benchmarks(corpus: Dict[str, list], client) -> Dict[str, Callable[[], object]]:
+    """
+    Полный запрос POST /api/feedback (валидация, классификация, запись в БД)
+
+    client должен быть открыт (with TestClient(app)): иначе каждый запрос
+    идет в новом event loop, а пул asyncpg привязан к одному.
+    """
+    benches: Dict[str, Callable[[], object]] = {}
+    for size_class in ("one_liner", "paragraph", "long_5kb"):
+        next_sample = _cycle(corpus[size_class])
+
+        def post(n=next_sample):
+            text, form_type = n()
+            response = client.post("/api/feedback", json={
+                "form_type": form_type, "message": f"{BENCH_MARKER} {text}"
+            })
+            assert response.status_code < 400, response.text
+        benches[f"api_feedback/{size_class}"] = post
+    return benches
+
+
+def cleanup_api_rows() -> None:
+    from app.database import SessionLocal
+    from app.models import Feedback
+
+    db = SessionLocal()
+    try:
+        db.query(Feedback).filter(Feedback.message.startswith(BENCH_MARKER)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float,
+            p99_threshold: float) -> List[str]:
+    """
+    Регрессии относительно базовой линии
+
+    Регрессия: ops/sec упал больше чем на threshold или p99 вырос
+    больше чем на p99_threshold (хвост шумнее среднего).
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: ops/sec {base['ops_per_sec']} -> {result['ops_per_sec']}")
+        if result["p99_us"] > base["p99_us"] * (1 + p99_threshold):
+            regressions.append(f"{name}: p99 {base['p99_us']} us -> {result['p99_us']} us")
+    return regressions
+
+
+def run(only: Optional[List[str]], with_api: bool, min_time: float, min_ops: int) -> Dict[str, dict]:
+    from app.services.classifier import classification_cache
+    from app.services.urgency import urgency_cache
+
+    corpus = build_corpus()
+    benches = function_benchmarks(corpus)
+    if only:
+        benches = {name: func for name, func in benches.items() if name.split("/")[0] in only}
+    with_api = with_api and (not only or "api_feedback" in only)
+
+    # Замеряем саму классификацию, а не попадания в кэш
+    caches = (urgency_cache, classification_cache)
+    saved_sizes = [cache.maxsize for cache in caches]
+    for cache in caches:
+        cache.clear()
+        cache.maxsize = 0
+
+    results = {}
+    with contextlib.ExitStack() as stack:
+        if with_api:
+            from fastapi.testclient import TestClient
+            from app.main import app
+
+            stack.callback(cleanup_api_rows)
+            benches.update(api_benchmarks(corpus, stack.enter_context(TestClient(app))))
+        stack.callback(_restore, caches, saved_sizes)
+
+        print(f"{'benchmark':<36}{'ops/sec':>12}{'p50, us':>12}{'p99, us':>12}")
+        for name, func in benches.items():
+            func()  # прогрев
+            results[name] = measure(func, min_time, min_ops)
+            r = results[name]
+            print(f"{name:<36}{r['ops_per_sec']:>12.1f}{r['p50_us']:>12.1f}{r['p99_us']:>12.1f}")
+    return results
+
+
+def _restore(caches, sizes) -> None:
+    for cache, size in zip(caches, sizes):
+        cache.maxsize = size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки классификации и приема отзывов")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Файл базовой линии (JSON)")
+    parser.add_argument("--save-baseline", action="store_true", help="Сохранить результаты как базовую линию")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Допустимое падение ops/sec (доля)")
+    parser.add_argument("--p99-threshold", type=float, default=0.5, help="Допустимый рост p99 (доля)")
+    parser.add_argument("--only", help="Через запятую: analyze_urgency,classify_feedback,...")
+    parser.add_argument("--no-api", action="store_true", help="Без POST /api/feedback (не нужна БД)")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Секунд на каждый бенчмарк")
+    parser.add_argument("--min-ops", type=int, default=200, help="Минимум вызовов на бенчмарк")
+    args = parser.parse_args()
+
+    only = args.only.split(",") if args.only else None
+    results = run(only, not args.no_api, args.min_time, args.min_ops)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results
+            }, f, indent=2)
+        print(f"Baseline saved: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline first")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold, args.p99_threshold)
+    if regressions:
+        print(f"\nRegressions (ops/sec -{args.threshold:.0%}, p99 +{args.p99_threshold:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()